@@ -16,6 +16,8 @@ from app.models.personal import Personal
 from app.models.asistencia import Asistencia
 from app.models.usuario import Usuario
 from app.models.auditlog import AuditLog
+from app.models.ratelimit import RateLimitContador
+from app.models.estado_runtime import EstadoRuntime
 
 # this is the Alembic Config object
 config = context.config
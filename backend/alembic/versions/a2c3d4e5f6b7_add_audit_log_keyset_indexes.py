@@ -0,0 +1,52 @@
+"""add_audit_log_keyset_indexes
+
+Revision ID: a2c3d4e5f6b7
+Revises: f4b7c8d9e0a1
+Create Date: 2026-10-19 00:00:01.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a2c3d4e5f6b7'
+down_revision: Union[str, Sequence[str], None] = 'f4b7c8d9e0a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDICES = {
+    'ix_audit_log_fecha_id': ['fecha', 'id'],
+    'ix_audit_log_accion_fecha': ['accion', 'fecha', 'id'],
+    'ix_audit_log_entidad_fecha': ['entidad', 'fecha', 'id'],
+    'ix_audit_log_usuario_fecha': ['usuario', 'fecha', 'id'],
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema - idempotente: indices para paginacion por cursor y filtros del audit log."""
+    conn = op.get_bind()
+    existentes = {i['name'] for i in inspect(conn).get_indexes('audit_log')}
+    concurrente = conn.dialect.name == 'postgresql'
+
+    with op.get_context().autocommit_block():
+        for nombre, columnas in INDICES.items():
+            if nombre not in existentes:
+                op.create_index(nombre, 'audit_log', columnas, unique=False,
+                                postgresql_concurrently=concurrente)
+        # (fecha, id) reemplaza al indice simple sobre fecha
+        if 'ix_audit_log_fecha' in existentes:
+            op.drop_index('ix_audit_log_fecha', table_name='audit_log',
+                          postgresql_concurrently=concurrente)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    concurrente = op.get_bind().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        op.create_index('ix_audit_log_fecha', 'audit_log', ['fecha'], unique=False,
+                        postgresql_concurrently=concurrente)
+        for nombre in INDICES:
+            op.drop_index(nombre, table_name='audit_log', postgresql_concurrently=concurrente)
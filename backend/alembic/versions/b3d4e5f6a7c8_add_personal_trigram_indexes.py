@@ -0,0 +1,42 @@
+"""add_personal_trigram_indexes
+
+Revision ID: b3d4e5f6a7c8
+Revises: a2c3d4e5f6b7
+Create Date: 2026-10-19 00:00:02.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3d4e5f6a7c8'
+down_revision: Union[str, Sequence[str], None] = 'a2c3d4e5f6b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Las expresiones deben coincidir con las de GET /api/personal/buscar
+INDICES = {
+    'ix_personal_nombre_completo_trgm': "(nombre || ' ' || apellido) gin_trgm_ops",
+    'ix_personal_documento_trgm': "documento gin_trgm_ops",
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema - idempotente: pg_trgm + indices GIN para la busqueda (solo PostgreSQL)."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    with op.get_context().autocommit_block():
+        for nombre, expresion in INDICES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {nombre} ON personal USING gin ({expresion})")
+
+
+def downgrade() -> None:
+    """Downgrade schema (la extension pg_trgm se conserva)."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    with op.get_context().autocommit_block():
+        for nombre in INDICES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {nombre}")
@@ -0,0 +1,38 @@
+"""add_rate_limit_table
+
+Revision ID: c4e5f6a7b8d9
+Revises: b3d4e5f6a7c8
+Create Date: 2026-10-19 00:00:03.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e5f6a7b8d9'
+down_revision: Union[str, Sequence[str], None] = 'b3d4e5f6a7c8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - idempotente: no crea la tabla si ya existe."""
+    conn = op.get_bind()
+    if not inspect(conn).has_table('rate_limit'):
+        op.create_table(
+            'rate_limit',
+            sa.Column('clave', sa.String(length=100), nullable=False),
+            sa.Column('ventana', sa.Integer(), nullable=False),
+            sa.Column('actual', sa.Integer(), nullable=False),
+            sa.Column('previo', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('clave'),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('rate_limit')
@@ -0,0 +1,38 @@
+"""add_estado_runtime_table
+
+Revision ID: d5f6a7b8c9e0
+Revises: c4e5f6a7b8d9
+Create Date: 2026-10-19 00:00:04.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5f6a7b8c9e0'
+down_revision: Union[str, Sequence[str], None] = 'c4e5f6a7b8d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - idempotente: no crea la tabla si ya existe."""
+    conn = op.get_bind()
+    if not inspect(conn).has_table('estado_runtime'):
+        op.create_table(
+            'estado_runtime',
+            sa.Column('clave', sa.String(length=50), nullable=False),
+            sa.Column('valor', sa.Text(), nullable=True),
+            sa.Column('version', sa.Integer(), nullable=False),
+            sa.Column('fecha_actualizacion', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('clave'),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('estado_runtime')
@@ -0,0 +1,50 @@
+"""add_asistencia_personal_fecha_index
+
+Revision ID: f4b7c8d9e0a1
+Revises: e3a1b2c4d5e6
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy import inspect
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4b7c8d9e0a1'
+down_revision: Union[str, Sequence[str], None] = 'e3a1b2c4d5e6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX_NAME = 'ix_asistencia_personal_fecha'
+
+
+def upgrade() -> None:
+    """Upgrade schema - idempotente: indice compuesto (personal_id, fecha_hora) INCLUDE (tipo)."""
+    conn = op.get_bind()
+    indices = [i['name'] for i in inspect(conn).get_indexes('asistencia')]
+    if INDEX_NAME in indices:
+        return
+
+    if conn.dialect.name == 'postgresql':
+        # CONCURRENTLY no puede ejecutarse dentro de una transaccion
+        with op.get_context().autocommit_block():
+            op.create_index(
+                INDEX_NAME, 'asistencia', ['personal_id', 'fecha_hora'],
+                unique=False,
+                postgresql_include=['tipo'],
+                postgresql_concurrently=True,
+            )
+    else:
+        op.create_index(INDEX_NAME, 'asistencia', ['personal_id', 'fecha_hora'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    conn = op.get_bind()
+    if conn.dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.drop_index(INDEX_NAME, table_name='asistencia', postgresql_concurrently=True)
+    else:
+        op.drop_index(INDEX_NAME, table_name='asistencia')
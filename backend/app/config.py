@@ -15,12 +15,71 @@ class Settings(BaseSettings):
 
     # Database - PostgreSQL, viene obligatoriamente del .env
     database_url: str
+    # Intentos de conexion al arrancar (1 = no bloquear el arranque si la BD esta caida)
+    db_reintentos_inicio: int = 1
+    db_espera_reintento: float = 3.0
+    db_connect_timeout: int = 5
+    # Pool de conexiones por worker (el engine async tiene otro pool con los mismos valores)
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 30.0  # segundos esperando una conexion libre antes de fallar
+    db_pool_recycle: int = -1  # segundos de vida de una conexion (-1 = sin reciclar)
+    db_pool_pre_ping: bool = True
+    # Checkouts que retienen la conexion mas que esto se registran con la ruta que la tenia
+    db_checkout_lento_ms: int = 1000
+    # Replica de lectura para reportes y exportaciones (vacio = todo a la primaria)
+    database_replica_url: str = ""
+    # Si la replica no responde, segundos leyendo de la primaria antes de reintentar
+    replica_reintento_segundos: float = 30.0
+    # Tras una escritura el cliente lee de la primaria durante estos segundos (lag de replicacion)
+    replica_lectura_propia_segundos: int = 10
 
     # API
     api_host: str = "0.0.0.0"
     api_port: int = 8000
     api_reload: bool = True
     api_key: str = ""
+    # Clave para firmar tokens (CSRF y sesion); debe ser igual en todos los workers/replicas
+    secret_key: str = ""
+    # True = las rutas /api/ exigen token de sesion (Authorization: Bearer) o API key
+    requerir_sesion: bool = False
+    # Token Bearer para /metrics (vacio = sin autenticacion, restringir por red)
+    metrics_token: str = ""
+    # Perfil SQL por request: se registra un warning al superar cualquiera de estos umbrales
+    sql_umbral_consultas: int = 50
+    sql_umbral_ms: int = 500
+    sql_umbral_repeticion: int = 10  # misma sentencia N veces = posible N+1
+    # Cada cuantos segundos un worker trae los cambios de estado_runtime hechos por otros
+    estado_refresco_segundos: float = 2.0
+    # Storage de los limites de slowapi: "memory://" (por proceso) o "redis://host:6379" (compartido)
+    rate_limit_storage_uri: str = "memory://"
+    # Rate limit de login: "memoria" (por proceso) o "db" (tabla rate_limit, compartida entre workers)
+    login_rate_backend: str = "memoria"
+    # Executor dedicado para bcrypt: hilos y operaciones en cola antes de responder 503
+    hash_workers: int = 2
+    hash_max_pendientes: int = 32
+
+    # Eventos en vivo (SSE): cola por cliente (eventos), heartbeat y conexiones por worker
+    eventos_buffer_cliente: int = 256
+    eventos_heartbeat_segundos: float = 15.0
+    eventos_max_clientes: int = 200
+    # Monitor de salud (/health/ready): cada cuanto se mide la BD y el dispositivo, y desde
+    # que ocupacion del pool (en_uso / (size + overflow)) la instancia deja de estar lista
+    salud_intervalo_segundos: float = 5.0
+    salud_intervalo_dispositivo: float = 30.0
+    salud_pool_saturado: float = 0.9
+    # Spool local de ingesta (write-ahead log): los marcajes se escriben aqui con fsync antes
+    # de ir a la BD. Ventana de agrupacion del fsync, tamano de segmento, marcajes por lote
+    # al reproducir y cada cuanto se reintenta lo pendiente si la BD no estaba disponible
+    spool_directorio: str = "./spool"
+    spool_fsync_ventana_ms: float = 2.0
+    spool_segmento_max_bytes: int = 16 * 1024 * 1024
+    spool_lote: int = 500
+    spool_intervalo_segundos: float = 5.0
+    # Respuestas /api de al menos estos bytes se comprimen con gzip si el cliente lo acepta
+    gzip_minimo_bytes: int = 1024
+    # Frontend: index + bundles con hash en /assets (False = archivos sueltos de /static, para desarrollo)
+    assets_empaquetar: bool = True
 
     # CORS
     cors_origins: str = "http://localhost:8000"
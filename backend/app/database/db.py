@@ -1,27 +1,202 @@
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import declarative_base, sessionmaker, Session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from app.config import settings
+from app.services.metrics import metricas, db_pool_espera, db_pool_retencion, db_lecturas
+from fastapi import Request
+from app.services import sql_profiler
+import threading
 import time
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-def _crear_engine(max_retries=5, retry_delay=3):
-    """Crea el engine PostgreSQL con reintentos (para esperar que el contenedor inicie)"""
-    for intento in range(max_retries):
+class _MedirEspera:
+    """
+    Mide cuanto espera cada checkout por una conexion libre. Los eventos del pool
+    avisan cuando la conexion ya se entrego, no cuando empezo la espera.
+    """
+    etiqueta = ""
+
+    def _do_get(self):
+        inicio = time.perf_counter()
         try:
-            eng = create_engine(
-                settings.database_url,
-                echo=False,
-                pool_size=10,
-                max_overflow=20,
-                pool_pre_ping=True,
+            return super()._do_get()
+        finally:
+            db_pool_espera.observar(time.perf_counter() - inicio, engine=self.etiqueta)
+
+
+class PoolInstrumentado(_MedirEspera, QueuePool):
+    etiqueta = "sync"
+
+
+class PoolAsyncInstrumentado(_MedirEspera, AsyncAdaptedQueuePool):
+    etiqueta = "async"
+
+
+class PoolReplica(_MedirEspera, QueuePool):
+    etiqueta = "replica"
+
+
+class PoolAsyncReplica(_MedirEspera, AsyncAdaptedQueuePool):
+    etiqueta = "async_replica"
+
+
+def _opciones_pool() -> dict:
+    return {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+
+def _observar_checkouts(engine, etiqueta: str):
+    """Eventos del pool: cuanto retiene cada checkout la conexion y que ruta la tenia"""
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_conn, registro, proxy):
+        registro.info["checkout"] = (time.perf_counter(), sql_profiler.ruta_actual())
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_conn, registro):
+        inicio, ruta = registro.info.pop("checkout", (None, None))
+        if inicio is None:
+            return
+        segundos = time.perf_counter() - inicio
+        db_pool_retencion.observar(segundos, engine=etiqueta)
+        if segundos * 1000 >= settings.db_checkout_lento_ms:
+            logger.warning(
+                f"Conexion de BD retenida {segundos * 1000:.0f}ms por {ruta or 'tarea fuera de request'} "
+                f"(engine {etiqueta})"
             )
-            with eng.connect() as conn:
+
+
+# Los engines se crean en el primer uso: importar este modulo no abre conexiones
+_engine = None
+_async_engine = None
+_replica = None
+_async_replica = None
+_lock_engine = threading.Lock()
+# Hasta cuando (time.monotonic) se lee de la primaria porque la replica no respondio
+_replica_caida_hasta = 0.0
+
+# Driver async equivalente a cada URL sync
+DRIVERS_ASYNC = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgresql+psycopg": "postgresql+psycopg_async",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def url_async(url: str) -> str:
+    """Misma BD con driver async (postgresql:// -> postgresql+asyncpg://)"""
+    esquema, separador, resto = url.partition("://")
+    return f"{DRIVERS_ASYNC.get(esquema, esquema)}{separador}{resto}"
+
+
+def _crear_engine(url: str, poolclass):
+    connect_args = {}
+    if url.startswith("postgresql"):
+        # Acotar cuanto bloquea un intento contra un servidor que no responde
+        connect_args["connect_timeout"] = settings.db_connect_timeout
+    eng = create_engine(url, echo=False, poolclass=poolclass, connect_args=connect_args, **_opciones_pool())
+    sql_profiler.instrumentar(eng)
+    _observar_checkouts(eng, poolclass.etiqueta)
+    return eng
+
+
+def _crear_engine_async(url: str, poolclass):
+    connect_args = {}
+    if url.startswith("postgresql"):
+        # asyncpg llama `timeout` a lo que psycopg2 llama connect_timeout
+        connect_args["timeout"] = settings.db_connect_timeout
+    eng = create_async_engine(
+        url_async(url), echo=False, poolclass=poolclass, connect_args=connect_args, **_opciones_pool()
+    )
+    sql_profiler.instrumentar(eng.sync_engine)
+    _observar_checkouts(eng.sync_engine, poolclass.etiqueta)
+    return eng
+
+
+def get_engine():
+    """Engine de la app, creado la primera vez que se necesita (create_engine no conecta)"""
+    global _engine
+    if _engine is None:
+        with _lock_engine:
+            if _engine is None:
+                _engine = _crear_engine(settings.database_url, PoolInstrumentado)
+    return _engine
+
+
+def get_async_engine():
+    """
+    Engine async para rutas de solo lectura: mientras espera a la BD libera el event
+    loop en vez de ocupar un hilo del threadpool. Misma configuracion de pool que el sync.
+    """
+    global _async_engine
+    if _async_engine is None:
+        with _lock_engine:
+            if _async_engine is None:
+                _async_engine = _crear_engine_async(settings.database_url, PoolAsyncInstrumentado)
+    return _async_engine
+
+
+def get_engine_replica():
+    """Engine de la replica de lectura (settings.database_replica_url)"""
+    global _replica
+    if _replica is None:
+        with _lock_engine:
+            if _replica is None:
+                _replica = _crear_engine(settings.database_replica_url, PoolReplica)
+    return _replica
+
+
+def get_async_engine_replica():
+    global _async_replica
+    if _async_replica is None:
+        with _lock_engine:
+            if _async_replica is None:
+                _async_replica = _crear_engine_async(settings.database_replica_url, PoolAsyncReplica)
+    return _async_replica
+
+
+async def cerrar_engine_async():
+    """Cierra las conexiones de los pools async (al apagar la app)"""
+    global _async_engine, _async_replica
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        AsyncSessionLocal.reiniciar()
+    if _async_replica is not None:
+        await _async_replica.dispose()
+        _async_replica = None
+
+
+def cerrar_engine():
+    """Cierra las conexiones de los pools (al apagar la app)"""
+    global _engine, _replica
+    if _engine is not None:
+        _engine.dispose()
+        _engine = None
+        SessionLocal.reiniciar()
+    if _replica is not None:
+        _replica.dispose()
+        _replica = None
+
+
+def esperar_bd(max_retries: int = 1, retry_delay: float = 3) -> bool:
+    """Verifica la conexion con reintentos (para esperar que el contenedor inicie)"""
+    for intento in range(max_retries):
+        try:
+            with get_engine().connect() as conn:
                 conn.execute(text("SELECT 1"))
-            logger.info("Conexion a PostgreSQL exitosa")
-            return eng
+            logger.info("Conexion a la BD exitosa")
+            return True
         except Exception as e:
             if intento < max_retries - 1:
                 logger.warning(
@@ -31,22 +206,81 @@ def _crear_engine(max_retries=5, retry_delay=3):
                 time.sleep(retry_delay)
             else:
                 logger.warning(f"No se pudo conectar tras {max_retries} intentos, continuando...")
-                return create_engine(
-                    settings.database_url,
-                    echo=False,
-                    pool_size=10,
-                    max_overflow=20,
-                    pool_pre_ping=True,
-                )
+    return False
+
+
+def preparar_bd(max_retries: int = 1, retry_delay: float = 3) -> bool:
+    """Espera la BD y crea las tablas faltantes; False si la BD no respondio"""
+    if not esperar_bd(max_retries, retry_delay):
+        return False
+    Base.metadata.create_all(bind=get_engine())
+    return True
+
+
+class _FabricaSesiones:
+    """sessionmaker que crea el engine al abrir la primera sesion"""
+
+    def __init__(self):
+        self._fabrica = None
+
+    def __call__(self, **kwargs):
+        if self._fabrica is None:
+            self._fabrica = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+        return self._fabrica(**kwargs)
+
+    def reiniciar(self):
+        self._fabrica = None
+
+
+class _FabricaSesionesAsync(_FabricaSesiones):
+    """async_sessionmaker que crea el engine async al abrir la primera sesion"""
 
+    def __call__(self, **kwargs):
+        if self._fabrica is None:
+            self._fabrica = async_sessionmaker(
+                get_async_engine(), class_=AsyncSession, autoflush=False, expire_on_commit=False
+            )
+        return self._fabrica(**kwargs)
 
-engine = _crear_engine()
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = _FabricaSesiones()
+AsyncSessionLocal = _FabricaSesionesAsync()
 
 Base = declarative_base()
 
 
+def __getattr__(nombre):
+    # Compatibilidad: `from app.database.db import engine` crea el engine recien ahi
+    if nombre == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+
+
+def pools_activos() -> list:
+    """(etiqueta, pool) de cada engine ya creado; leerlos no hace checkout de conexiones"""
+    pools = [eng.pool for eng in (_engine, _replica) if eng is not None]
+    pools += [eng.sync_engine.pool for eng in (_async_engine, _async_replica) if eng is not None]
+    return [(pool.etiqueta, pool) for pool in pools if isinstance(pool, QueuePool)]
+
+
+@metricas.colector
+def _metricas_pool():
+    """Estado de los pools de conexiones al momento del scrape"""
+    pools = [({"engine": etiqueta}, pool) for etiqueta, pool in pools_activos()]
+    if not pools:
+        return []
+    return [
+        ("db_pool_size", "gauge", "Conexiones permanentes del pool",
+         [(e, p.size()) for e, p in pools]),
+        ("db_pool_checked_out", "gauge", "Conexiones en uso",
+         [(e, p.checkedout()) for e, p in pools]),
+        ("db_pool_checked_in", "gauge", "Conexiones libres en el pool",
+         [(e, p.checkedin()) for e, p in pools]),
+        ("db_pool_overflow", "gauge", "Conexiones por encima de pool_size (negativo = sin abrir)",
+         [(e, p.overflow()) for e, p in pools]),
+    ]
+
+
 def get_db():
     """Dependency para obtener sesion de BD en rutas"""
     db = SessionLocal()
@@ -54,3 +288,87 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """Dependency de sesion async para rutas `async def` de solo lectura"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# ============ LECTURAS EN LA REPLICA ============
+# Cookie que dejan las mutaciones: mientras exista, ese cliente lee de la primaria
+COOKIE_ESCRITURA = "escritura_reciente"
+
+
+def _motivo_primaria(request: Request) -> str:
+    """Por que esta lectura va a la primaria ("" = puede ir a la replica)"""
+    if not settings.database_replica_url:
+        return "sin_replica"
+    if request.headers.get("x-consistencia") == "primaria" or COOKIE_ESCRITURA in request.cookies:
+        return "escritura_reciente"
+    if time.monotonic() < _replica_caida_hasta:
+        return "replica_caida"
+    return ""
+
+
+def _replica_fallo(e: Exception):
+    global _replica_caida_hasta
+    _replica_caida_hasta = time.monotonic() + settings.replica_reintento_segundos
+    db_lecturas.inc(destino="primaria", motivo="replica_caida")
+    logger.warning(
+        f"Replica no disponible, lecturas a la primaria por {settings.replica_reintento_segundos}s: {e}"
+    )
+
+
+def get_db_lectura(request: Request):
+    """
+    Dependency para rutas de solo lectura (reportes, exportaciones): sesion en la
+    replica si esta configurada. Va a la primaria si no hay replica, si la replica no
+    responde, o si el cliente acaba de escribir (cookie escritura_reciente o
+    X-Consistencia: primaria) y necesita leer lo que escribio.
+    """
+    motivo = _motivo_primaria(request)
+    conexion = None
+    if not motivo:
+        try:
+            # Conectar ahora (pre_ping incluido) para caer a la primaria antes de la ruta
+            conexion = get_engine_replica().connect()
+        except Exception as e:
+            _replica_fallo(e)
+    if conexion is None:
+        if motivo:
+            db_lecturas.inc(destino="primaria", motivo=motivo)
+        yield from get_db()
+        return
+    db_lecturas.inc(destino="replica", motivo="")
+    db = Session(bind=conexion, autoflush=False, info={"replica": True})
+    try:
+        yield db
+    finally:
+        db.close()
+        conexion.close()
+
+
+async def get_async_db_lectura(request: Request):
+    """get_db_lectura para rutas async"""
+    motivo = _motivo_primaria(request)
+    conexion = None
+    if not motivo:
+        try:
+            conexion = await get_async_engine_replica().connect()
+        except Exception as e:
+            _replica_fallo(e)
+    if conexion is None:
+        if motivo:
+            db_lecturas.inc(destino="primaria", motivo=motivo)
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+    db_lecturas.inc(destino="replica", motivo="")
+    try:
+        async with AsyncSession(bind=conexion, autoflush=False, expire_on_commit=False,
+                                info={"replica": True}) as db:
+            yield db
+    finally:
+        await conexion.close()
@@ -0,0 +1,178 @@
+"""
+Middleware ASGI unico para las rutas de la API.
+Reemplaza las cuatro capas @app.middleware("http") (autenticacion, CSRF, manejo de
+errores y log de requests): cada BaseHTTPMiddleware envolvia request y response de
+nuevo; aqui se hace todo en una sola pasada sobre el scope.
+"""
+from starlette.responses import JSONResponse
+from app.config import settings
+from app.services.csrf_service import csrf_service
+from app.services.session_service import session_service
+from app.services.metrics import http_duracion, http_requests
+from app.database.db import COOKIE_ESCRITURA
+from app.services import sql_profiler
+import gzip
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Rutas que no requieren autenticacion
+RUTAS_PUBLICAS = frozenset({
+    "/", "/health", "/health/live", "/health/ready", "/api/docs", "/api/redoc", "/openapi.json", "/api/auth/login",
+    "/api/auth/registro", "/api/auth/check", "/api/sucursal", "/api/csrf-token",
+    "/metrics",  # protegido por su propio token (settings.metrics_token)
+})
+# Mutaciones publicas excluidas de CSRF
+RUTAS_SIN_CSRF = frozenset({"/api/auth/login", "/api/auth/registro"})
+METODOS_CSRF = frozenset({"POST", "PUT", "DELETE"})
+METODOS_ESCRITURA = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+# Tipos de respuesta de /api que vale la pena comprimir
+TIPOS_COMPRIMIBLES = (b"application/json", b"text/")
+NIVEL_GZIP = 6  # mejor relacion tamano/CPU para JSON repetitivo
+
+
+def _comprimir(inicio: dict, mensaje: dict) -> bool:
+    """Solo cuerpos completos (no streaming), sobre el umbral y sin codificacion previa"""
+    if mensaje.get("more_body") or len(mensaje.get("body", b"")) < settings.gzip_minimo_bytes:
+        return False
+    headers = dict(inicio.get("headers", []))
+    return (b"content-encoding" not in headers
+            and headers.get(b"content-type", b"").startswith(TIPOS_COMPRIMIBLES))
+
+
+def _gzip(inicio: dict, mensaje: dict) -> tuple[dict, dict]:
+    cuerpo = gzip.compress(mensaje["body"], NIVEL_GZIP, mtime=0)
+    headers = []
+    for nombre, valor in inicio.get("headers", []):
+        if nombre == b"content-length":
+            continue
+        if nombre == b"etag" and not valor.startswith(b"W/"):
+            # Un ETag fuerte identifica bytes exactos: la variante gzip lleva el suyo
+            valor = valor[:-1] + b'-gzip"'
+        headers.append((nombre, valor))
+    headers += [(b"content-encoding", b"gzip"), (b"content-length", str(len(cuerpo)).encode()),
+                (b"vary", b"Accept-Encoding")]
+    return {**inicio, "headers": headers}, {**mensaje, "body": cuerpo}
+
+
+def _headers(scope) -> dict[bytes, bytes]:
+    """Solo los headers que usa el middleware (nombres ya vienen en minusculas)"""
+    buscados = (b"authorization", b"x-api-key", b"x-csrf-token", b"x-sql-profile", b"accept-encoding")
+    return {k: v for k, v in scope["headers"] if k in buscados}
+
+
+class MiddlewareApi:
+    """
+    Autenticacion (sesion o API key), CSRF, errores 500, timing, perfil SQL, marca de
+    lectura propia (replica) y gzip de respuestas /api en una sola capa
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        ruta = scope["path"]
+        inicio = time.perf_counter()
+        headers = _headers(scope)
+        respuesta = {"status": 500, "iniciada": False}
+        perfil, token_perfil = sql_profiler.iniciar(ruta)
+        mostrar_perfil = False
+        # Con replica: tras escribir, el cliente lee de la primaria hasta que la replica alcance
+        marcar_escritura = bool(settings.database_replica_url) and scope["method"] in METODOS_ESCRITURA
+        acepta_gzip = ruta.startswith("/api/") and b"gzip" in headers.get(b"accept-encoding", b"")
+        inicio_pendiente = []  # con gzip posible, el start espera al primer bloque del cuerpo
+
+        async def enviar(message):
+            if message["type"] == "http.response.start":
+                respuesta["status"] = message["status"]
+                respuesta["iniciada"] = True
+                extra = []
+                if mostrar_perfil:
+                    extra.append((b"x-sql-profile", perfil.encabezado().encode()))
+                if marcar_escritura and message["status"] < 400:
+                    extra.append((b"set-cookie", (
+                        f"{COOKIE_ESCRITURA}=1; Max-Age={settings.replica_lectura_propia_segundos}; "
+                        "Path=/; HttpOnly; SameSite=Lax"
+                    ).encode()))
+                if extra:
+                    message["headers"] = list(message.get("headers", [])) + extra
+                if acepta_gzip:
+                    inicio_pendiente.append(message)
+                    return
+            elif inicio_pendiente and message["type"] == "http.response.body":
+                inicio = inicio_pendiente.pop()
+                if _comprimir(inicio, message):
+                    inicio, message = _gzip(inicio, message)
+                await send(inicio)
+            await send(message)
+
+        try:
+            rechazo = await self._verificar(scope, ruta, headers)
+            # Perfil en la respuesta: opt-in con X-SQL-Profile y solo para sesiones admin
+            principal = scope["state"]["principal"]
+            mostrar_perfil = b"x-sql-profile" in headers and principal is not None and principal.es_admin
+            if rechazo is not None:
+                await rechazo(scope, receive, enviar)
+            else:
+                await self.app(scope, receive, enviar)
+        except Exception as e:
+            logger.error(f"Error no manejado en {scope['method']} {ruta}: {e}")
+            if respuesta["iniciada"]:
+                raise
+            await JSONResponse(
+                status_code=500, content={"detail": "Error interno del servidor"}
+            )(scope, receive, enviar)
+        finally:
+            sql_profiler.terminar(perfil, token_perfil)
+
+        duracion = time.perf_counter() - inicio
+        # Plantilla de la ruta (/api/personal/{personal_id}), no el path: cardinalidad acotada
+        plantilla = getattr(scope.get("route"), "path", "sin_ruta")
+        http_duracion.observar(duracion, method=scope["method"], route=plantilla)
+        http_requests.inc(method=scope["method"], route=plantilla, status=respuesta["status"])
+
+        if ruta.startswith("/api/"):
+            duration_ms = round(duracion * 1000)
+            ip = scope["client"][0] if scope.get("client") else "-"
+            logger.info(f"{scope['method']} {ruta} -> {respuesta['status']} ({duration_ms}ms) [{ip}]")
+        self._revisar_perfil(perfil, scope["method"], plantilla)
+
+    def _revisar_perfil(self, perfil, metodo: str, plantilla: str):
+        """Log si el request supera los umbrales de consultas, tiempo en BD o repeticion"""
+        repetidas = perfil.repetidas(settings.sql_umbral_repeticion)
+        if (perfil.consultas < settings.sql_umbral_consultas
+                and perfil.segundos * 1000 < settings.sql_umbral_ms and not repetidas):
+            return
+        logger.warning(f"SQL pesado en {metodo} {plantilla}: {perfil.encabezado()}")
+        for sentencia, veces in repetidas[:3]:
+            logger.warning(f"  posible N+1 ({veces}x): {sentencia}")
+
+    async def _verificar(self, scope, ruta: str, headers: dict[bytes, bytes]):
+        """None si el request puede seguir; si no, la respuesta de rechazo"""
+        # El principal sale del cache del servicio: sin consulta a BD en el caso comun
+        principal = None
+        autorizacion = headers.get(b"authorization", b"").decode("latin-1")
+        if autorizacion.startswith("Bearer "):
+            principal = await session_service.autenticar_async(autorizacion[7:])
+        scope.setdefault("state", {})["principal"] = principal
+
+        es_publica = ruta in RUTAS_PUBLICAS or ruta.startswith(("/static", "/assets/"))
+        if not es_publica and principal is None:
+            api_key = headers.get(b"x-api-key", b"").decode("latin-1")
+            api_key_valida = bool(settings.api_key) and api_key == settings.api_key
+            if (settings.api_key or settings.requerir_sesion) and not api_key_valida:
+                return JSONResponse(
+                    status_code=401,
+                    content={"detail": "Sesion o API Key invalida o no proporcionada"}
+                )
+
+        if scope["method"] in METODOS_CSRF and ruta not in RUTAS_SIN_CSRF:
+            error = csrf_service.verificar(headers.get(b"x-csrf-token", b"").decode("latin-1"))
+            if error:
+                return JSONResponse(status_code=403, content={"detail": error})
+        return None
@@ -1,11 +1,21 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from datetime import datetime
 from app.database.db import Base
 
 class Asistencia(Base):
     """Modelo para registros de asistencia (entrada/salida)"""
     __tablename__ = "asistencia"
-    
+    __table_args__ = (
+        # Consultas por empleado + rango de fechas (reportes, dashboard, sync).
+        # En PostgreSQL incluye `tipo` para que el indice sea cubriente.
+        Index(
+            "ix_asistencia_personal_fecha",
+            "personal_id",
+            "fecha_hora",
+            postgresql_include=["tipo"],
+        ),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     personal_id = Column(Integer, ForeignKey("personal.id"), index=True)
     user_id = Column(Integer, index=True)  # ID del dispositivo ZKTeco
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
 from datetime import datetime
 from app.database.db import Base
 
@@ -6,6 +6,13 @@ from app.database.db import Base
 class AuditLog(Base):
     """Registro de cambios realizados en el sistema"""
     __tablename__ = "audit_log"
+    __table_args__ = (
+        # Paginacion por cursor (fecha, id) y filtros por accion/entidad/usuario
+        Index("ix_audit_log_fecha_id", "fecha", "id"),
+        Index("ix_audit_log_accion_fecha", "accion", "fecha", "id"),
+        Index("ix_audit_log_entidad_fecha", "entidad", "fecha", "id"),
+        Index("ix_audit_log_usuario_fecha", "usuario", "fecha", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     accion = Column(String(50), nullable=False)  # crear, actualizar, desactivar, login, sync
@@ -14,4 +21,4 @@ class AuditLog(Base):
     detalle = Column(Text, nullable=True)
     usuario = Column(String(100), nullable=True)  # quien realizo la accion
     ip = Column(String(50), nullable=True)
-    fecha = Column(DateTime, default=datetime.utcnow, index=True)
+    fecha = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from datetime import datetime
+from app.database.db import Base
+
+
+class EstadoRuntime(Base):
+    """Estado mutable compartido entre workers/replicas (config del dispositivo, versiones de caches)"""
+    __tablename__ = "estado_runtime"
+
+    clave = Column(String(50), primary_key=True)  # ej: "zkteco_config", "roster"
+    valor = Column(Text, nullable=True)  # JSON; None para claves que solo versionan
+    version = Column(Integer, nullable=False, default=1)  # sube en cada escritura
+    fecha_actualizacion = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
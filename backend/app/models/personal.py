@@ -6,6 +6,8 @@ from app.database.db import Base
 class Personal(Base):
     """Modelo para datos del personal"""
     __tablename__ = "personal"
+    # Busqueda: indices GIN trigram (pg_trgm) sobre nombre || ' ' || apellido y documento,
+    # creados solo en PostgreSQL por la migracion b3d4e5f6a7c8.
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, unique=True, index=True)  # ID en dispositivo ZKTeco (= id)
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, String
+from app.database.db import Base
+
+
+class RateLimitContador(Base):
+    """Contadores de ventana deslizante compartidos entre workers (login, etc.)"""
+    __tablename__ = "rate_limit"
+
+    clave = Column(String(100), primary_key=True)  # ej: "login:192.168.1.10"
+    ventana = Column(Integer, nullable=False)  # indice de ventana (epoch // segundos)
+    actual = Column(Integer, nullable=False, default=0)
+    previo = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,134 @@
+"""
+Rutas del historial de cambios (audit log)
+"""
+from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, text, tuple_
+from app.database.db import get_async_db
+from app.models.auditlog import AuditLog
+from app.services.audit_service import audit_service
+from typing import Literal, Optional
+from datetime import datetime
+import base64
+import logging
+import time
+
+logger = logging.getLogger("auditlog")
+
+router = APIRouter(prefix="/api/audit-log", tags=["Audit Log"])
+
+TOTAL_CACHE_TTL = 30  # segundos
+TOTAL_CACHE_MAX = 256
+
+# Conteos exactos cacheados por combinacion de filtros: {filtros: (timestamp, total)}
+_cache_totales: dict[tuple, tuple[float, int]] = {}
+
+
+def _codificar_cursor(fecha: datetime, id_: int) -> str:
+    return base64.urlsafe_b64encode(f"{fecha.isoformat()}|{id_}".encode()).decode().rstrip("=")
+
+
+def _decodificar_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        fecha_str, id_str = base64.urlsafe_b64decode(cursor + relleno).decode().split("|", 1)
+        return datetime.fromisoformat(fecha_str), int(id_str)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor invalido")
+
+
+async def _contar_exacto(db: AsyncSession, filtros: tuple, condiciones: list) -> int:
+    total = await db.scalar(select(func.count(AuditLog.id)).where(*condiciones))
+    if len(_cache_totales) >= TOTAL_CACHE_MAX:
+        _cache_totales.clear()
+    _cache_totales[filtros] = (time.monotonic(), total)
+    return total
+
+
+async def _contar_aprox(db: AsyncSession, filtros: tuple, condiciones: list) -> int:
+    """
+    Sin filtros en PostgreSQL usa la estimacion del planner (pg_class.reltuples).
+    En otro caso devuelve el conteo exacto cacheado por TOTAL_CACHE_TTL segundos.
+    """
+    if not any(filtros) and db.bind.dialect.name == "postgresql":
+        estimado = await db.scalar(text(
+            "SELECT reltuples::bigint FROM pg_class WHERE relname = 'audit_log'"
+        ))
+        if estimado is not None and estimado >= 0:
+            return int(estimado)
+
+    cacheado = _cache_totales.get(filtros)
+    if cacheado and time.monotonic() - cacheado[0] < TOTAL_CACHE_TTL:
+        return cacheado[1]
+    return await _contar_exacto(db, filtros, condiciones)
+
+
+@router.get("/estado")
+def estado_audit_log():
+    """Contadores del escritor de audit log (pendientes, escritos, descartados, fallidos)"""
+    return audit_service.stats()
+
+
+@router.get("")
+async def obtener_audit_log(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    accion: Optional[str] = None,
+    entidad: Optional[str] = None,
+    usuario: Optional[str] = None,
+    total: Literal["ninguno", "aprox", "exacto"] = "aprox",
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Registros del historial de cambios, del mas reciente al mas antiguo.
+    Paginacion por cursor sobre (fecha, id): pasar `siguiente_cursor` de la respuesta anterior.
+    """
+    limit = max(1, min(limit, 200))
+
+    condiciones = []
+    if accion:
+        condiciones.append(AuditLog.accion == accion)
+    if entidad:
+        condiciones.append(AuditLog.entidad == entidad)
+    if usuario:
+        condiciones.append(AuditLog.usuario == usuario)
+    filtros = (accion, entidad, usuario)
+
+    pagina = select(AuditLog).where(*condiciones)
+    if cursor:
+        fecha_cursor, id_cursor = _decodificar_cursor(cursor)
+        pagina = pagina.where(tuple_(AuditLog.fecha, AuditLog.id) < tuple_(fecha_cursor, id_cursor))
+
+    # Pedir uno extra para saber si hay pagina siguiente sin contar
+    registros = (await db.scalars(
+        pagina.order_by(AuditLog.fecha.desc(), AuditLog.id.desc()).limit(limit + 1)
+    )).all()
+    hay_mas = len(registros) > limit
+    registros = registros[:limit]
+    siguiente = _codificar_cursor(registros[-1].fecha, registros[-1].id) if hay_mas else None
+
+    if total == "exacto":
+        valor_total = await _contar_exacto(db, filtros, condiciones)
+    elif total == "aprox":
+        valor_total = await _contar_aprox(db, filtros, condiciones)
+    else:
+        valor_total = None
+
+    return {
+        "total": valor_total,
+        "total_tipo": None if total == "ninguno" else total,
+        "siguiente_cursor": siguiente,
+        "registros": [
+            {
+                "id": r.id,
+                "accion": r.accion,
+                "entidad": r.entidad,
+                "entidad_id": r.entidad_id,
+                "detalle": r.detalle,
+                "usuario": r.usuario,
+                "ip": r.ip,
+                "fecha": r.fecha.isoformat() if r.fecha else None,
+            }
+            for r in registros
+        ]
+    }
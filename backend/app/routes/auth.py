@@ -6,70 +6,43 @@ from sqlalchemy.orm import Session
 from pydantic import BaseModel, field_validator
 from app.database.db import get_db
 from app.models.usuario import Usuario
-from passlib.context import CryptContext
-import hashlib
-import hmac
+from app.services.audit_service import audit_service
+from app.services.session_service import session_service, requiere_admin
+from app.services.rate_limiter import SlidingWindowLimiter, crear_backend
+from app.services.password_service import (
+    password_service, necesita_rehash, SobrecargaHash,
+)
+from app.config import settings
+from fastapi.concurrency import run_in_threadpool
 import re
 import logging
 
 router = APIRouter(prefix="/api/auth", tags=["Auth"])
 logger = logging.getLogger("auth")
 
-_pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 MIN_PASSWORD_LENGTH = 8
 LOGIN_MAX_ATTEMPTS = 5
 LOGIN_WINDOW_SECONDS = 60
 
-# Rate limiting simple: {ip: [timestamp, timestamp, ...]}
-_login_attempts: dict[str, list[float]] = {}
+# Rate limiting por IP: ventana deslizante con memoria fija por clave (ver settings.login_rate_backend)
+_login_limiter = SlidingWindowLimiter(
+    LOGIN_MAX_ATTEMPTS, LOGIN_WINDOW_SECONDS, crear_backend(settings.login_rate_backend)
+)
 
 
 def _check_rate_limit(ip: str) -> bool:
     """Retorna True si el IP excedio el limite de intentos"""
-    import time
-    now = time.time()
-    attempts = _login_attempts.get(ip, [])
-    # Limpiar intentos fuera de la ventana
-    attempts = [t for t in attempts if now - t < LOGIN_WINDOW_SECONDS]
-    _login_attempts[ip] = attempts
-    return len(attempts) >= LOGIN_MAX_ATTEMPTS
+    return _login_limiter.excedido(f"login:{ip}")
 
 
 def _record_attempt(ip: str):
     """Registra un intento de login"""
-    import time
-    if ip not in _login_attempts:
-        _login_attempts[ip] = []
-    _login_attempts[ip].append(time.time())
-
-
-def hash_password(password: str) -> str:
-    """Hash con bcrypt"""
-    return _pwd_context.hash(password)
-
-
-def verify_password(password: str, stored_hash: str) -> bool:
-    """Verifica password. Soporta bcrypt (nuevo) y SHA-256+salt (legado)."""
-    if stored_hash.startswith("$2b$") or stored_hash.startswith("$2a$"):
-        return _pwd_context.verify(password, stored_hash)
-    # Legado: salt:sha256hex
-    try:
-        salt, hashed = stored_hash.split(":", 1)
-        computed = hashlib.sha256(f"{salt}{password}".encode()).hexdigest()
-        return hmac.compare_digest(computed, hashed)
-    except Exception:
-        return False
+    _login_limiter.registrar(f"login:{ip}")
 
 
-def _registrar_audit(db: Session, accion: str, entidad: str, entidad_id: int = None, detalle: str = None):
-    """Registra una entrada en el audit log"""
-    from app.models.auditlog import AuditLog
-    try:
-        db.add(AuditLog(accion=accion, entidad=entidad, entidad_id=entidad_id, detalle=detalle))
-        db.commit()
-    except Exception:
-        pass
+def _registrar_audit(accion: str, entidad: str, entidad_id: int = None, detalle: str = None):
+    """Encola una entrada en el audit log (se escribe por lotes en segundo plano)"""
+    audit_service.registrar(accion, entidad, entidad_id, detalle)
 
 
 USERNAME_REGEX = re.compile(r"^[a-zA-Z0-9_.\-]+$")
@@ -138,30 +111,68 @@ class RegistroRequest(BaseModel):
         return v
 
 
+def _buscar_usuario_activo(db: Session, username: str):
+    return db.query(Usuario).filter(
+        Usuario.username == username,
+        Usuario.activo == True
+    ).first()
+
+
+def _guardar_hash(db: Session, usuario: Usuario, nuevo_hash: str):
+    usuario.password_hash = nuevo_hash
+    db.commit()
+
+
+async def _verificar(password: str, stored_hash: str) -> bool:
+    """Verifica en el executor de hashing; 503 si esta saturado"""
+    try:
+        return await password_service.verificar(password, stored_hash)
+    except SobrecargaHash:
+        raise HTTPException(status_code=503, detail="Servidor ocupado, intenta de nuevo")
+
+
+async def _hashear(password: str) -> str:
+    try:
+        return await password_service.hash(password)
+    except SobrecargaHash:
+        raise HTTPException(status_code=503, detail="Servidor ocupado, intenta de nuevo")
+
+
+# Endpoints async: bcrypt corre en el executor dedicado y la BD en el threadpool,
+# asi el event loop nunca queda bloqueado por el hashing
 @router.post("/login")
-def login(request: Request, data: LoginRequest, db: Session = Depends(get_db)):
+async def login(request: Request, data: LoginRequest, db: Session = Depends(get_db)):
     """Iniciar sesion"""
     ip = request.client.host if request.client else "unknown"
 
     # Rate limiting: max 5 intentos por minuto por IP
-    if _check_rate_limit(ip):
+    if await run_in_threadpool(_check_rate_limit, ip):
         logger.warning(f"Rate limit excedido para IP {ip} (login '{data.username}')")
         raise HTTPException(status_code=429, detail="Demasiados intentos. Espera 1 minuto.")
 
-    usuario = db.query(Usuario).filter(
-        Usuario.username == data.username,
-        Usuario.activo == True
-    ).first()
+    usuario = await run_in_threadpool(_buscar_usuario_activo, db, data.username)
 
-    if not usuario or not verify_password(data.password, usuario.password_hash):
-        _record_attempt(ip)
+    if not usuario or not await _verificar(data.password, usuario.password_hash):
+        await run_in_threadpool(_record_attempt, ip)
         logger.warning(f"Login fallido para '{data.username}' desde {ip}")
         raise HTTPException(status_code=401, detail="Usuario o password incorrectos")
 
+    # Hash legado (SHA-256) u obsoleto: migrar a bcrypt aprovechando el password en claro
+    if necesita_rehash(usuario.password_hash):
+        try:
+            nuevo_hash = await password_service.hash(data.password)
+            await run_in_threadpool(_guardar_hash, db, usuario, nuevo_hash)
+            logger.info(f"Password de '{data.username}' migrado a bcrypt")
+        except SobrecargaHash:
+            pass  # se reintenta en el proximo login
+
+    token = await run_in_threadpool(session_service.emitir, usuario)
     logger.info(f"Login exitoso: '{data.username}' (id={usuario.id}) desde {ip}")
-    _registrar_audit(db, "login", "usuario", usuario.id, f"{data.username} desde {ip}")
+    _registrar_audit("login", "usuario", usuario.id, f"{data.username} desde {ip}")
     return {
         "status": "ok",
+        "token": token,
+        "expira_en": session_service.max_edad,
         "usuario": {
             "id": usuario.id,
             "username": usuario.username,
@@ -171,10 +182,7 @@ def login(request: Request, data: LoginRequest, db: Session = Depends(get_db)):
     }
 
 
-@router.post("/registro")
-def registro(request: Request, data: RegistroRequest, db: Session = Depends(get_db)):
-    """Registrar nuevo usuario del sistema"""
-    ip = request.client.host if request.client else "unknown"
+def _crear_usuario(db: Session, data: "RegistroRequest", password_hash: str, ip: str) -> Usuario:
     existente = db.query(Usuario).filter(Usuario.username == data.username).first()
     if existente:
         logger.warning(f"Registro fallido: username '{data.username}' duplicado desde {ip}")
@@ -182,16 +190,32 @@ def registro(request: Request, data: RegistroRequest, db: Session = Depends(get_
 
     nuevo = Usuario(
         username=data.username,
-        password_hash=hash_password(data.password),
+        password_hash=password_hash,
         nombre=data.nombre,
         rol=data.rol,
     )
     db.add(nuevo)
     db.commit()
     db.refresh(nuevo)
+    return nuevo
+
+
+@router.post("/registro")
+async def registro(request: Request, data: RegistroRequest, db: Session = Depends(get_db)):
+    """Registrar nuevo usuario del sistema"""
+    ip = request.client.host if request.client else "unknown"
+    existente = await run_in_threadpool(
+        lambda: db.query(Usuario.id).filter(Usuario.username == data.username).first()
+    )
+    if existente:
+        logger.warning(f"Registro fallido: username '{data.username}' duplicado desde {ip}")
+        raise HTTPException(status_code=400, detail="El username ya existe")
+
+    password_hash = await _hashear(data.password)
+    nuevo = await run_in_threadpool(_crear_usuario, db, data, password_hash, ip)
 
     logger.info(f"Usuario registrado: '{data.username}' (id={nuevo.id}, rol={data.rol}) desde {ip}")
-    _registrar_audit(db, "registro", "usuario", nuevo.id, f"{data.username} ({data.rol}) desde {ip}")
+    _registrar_audit("registro", "usuario", nuevo.id, f"{data.username} ({data.rol}) desde {ip}")
     return {
         "status": "ok",
         "mensaje": f"Usuario '{data.username}' creado exitosamente",
@@ -227,22 +251,38 @@ class CambiarPasswordRequest(BaseModel):
 
 
 @router.put("/cambiar-password")
-def cambiar_password(request: Request, data: CambiarPasswordRequest, db: Session = Depends(get_db)):
+async def cambiar_password(request: Request, data: CambiarPasswordRequest, db: Session = Depends(get_db)):
     """Cambiar password de un usuario"""
     ip = request.client.host if request.client else "unknown"
-    usuario = db.query(Usuario).filter(
-        Usuario.username == data.username,
-        Usuario.activo == True
-    ).first()
-    if not usuario or not verify_password(data.password_actual, usuario.password_hash):
+    usuario = await run_in_threadpool(_buscar_usuario_activo, db, data.username)
+    if not usuario or not await _verificar(data.password_actual, usuario.password_hash):
         logger.warning(f"Cambio de password fallido para '{data.username}' desde {ip}")
         raise HTTPException(status_code=401, detail="Usuario o password actual incorrecto")
 
-    usuario.password_hash = hash_password(data.password_nuevo)
-    db.commit()
+    nuevo_hash = await _hashear(data.password_nuevo)
+    await run_in_threadpool(_guardar_hash, db, usuario, nuevo_hash)
+    # Los tokens emitidos con el password anterior dejan de ser validos
+    session_service.invalidar(usuario.id)
+    token = await run_in_threadpool(session_service.emitir, usuario)
     logger.info(f"Password cambiado para '{data.username}' desde {ip}")
-    _registrar_audit(db, "cambiar_password", "usuario", usuario.id, f"{data.username} desde {ip}")
-    return {"status": "ok", "mensaje": "Password actualizado correctamente"}
+    _registrar_audit("cambiar_password", "usuario", usuario.id, f"{data.username} desde {ip}")
+    return {
+        "status": "ok",
+        "mensaje": "Password actualizado correctamente",
+        "token": token,
+    }
+
+
+@router.get("/stats/hash")
+def estadisticas_hash():
+    """Latencia (histograma) y saturacion del executor de hashing de passwords"""
+    return password_service.stats()
+
+
+@router.get("/stats/sesiones")
+def estadisticas_sesiones():
+    """Hits/misses del cache de principales de sesion"""
+    return session_service.stats()
 
 
 @router.get("/usuarios")
@@ -263,7 +303,8 @@ def listar_usuarios(db: Session = Depends(get_db)):
 
 
 @router.delete("/usuarios/{usuario_id}")
-def desactivar_usuario(usuario_id: int, request: Request, db: Session = Depends(get_db)):
+def desactivar_usuario(usuario_id: int, request: Request, db: Session = Depends(get_db),
+                       _admin=Depends(requiere_admin)):
     """Desactiva un usuario del sistema"""
     ip = request.client.host if request.client else "unknown"
     usuario = db.query(Usuario).filter(Usuario.id == usuario_id).first()
@@ -280,6 +321,7 @@ def desactivar_usuario(usuario_id: int, request: Request, db: Session = Depends(
 
     usuario.activo = False
     db.commit()
+    session_service.invalidar(usuario_id)
     logger.info(f"Usuario desactivado: '{usuario.username}' (id={usuario_id}) desde {ip}")
-    _registrar_audit(db, "desactivar", "usuario", usuario_id, f"{usuario.username} desde {ip}")
+    _registrar_audit("desactivar", "usuario", usuario_id, f"{usuario.username} desde {ip}")
     return {"status": "ok", "mensaje": f"Usuario '{usuario.username}' desactivado"}
@@ -0,0 +1,26 @@
+"""
+Rutas de eventos en vivo (Server-Sent Events)
+"""
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from app.services.eventos import broker_eventos
+
+router = APIRouter(prefix="/api/eventos", tags=["Eventos"])
+
+
+@router.get("/asistencia")
+async def eventos_asistencia():
+    """
+    Stream SSE de la asistencia: `asistencia` (marcajes nuevos), `asistencia_editada`
+    (dias reemplazados a mano), `resumen_dia` (marcajes y presentes de cada dia afectado)
+    y `resync` (recargar la vista completa). Un comentario de heartbeat mantiene la
+    conexion abierta cuando no hay novedades.
+    """
+    if broker_eventos.lleno():
+        raise HTTPException(status_code=503, detail="Demasiadas conexiones de eventos abiertas")
+    return StreamingResponse(
+        broker_eventos.flujo(),
+        media_type="text/event-stream",
+        # Sin buffering en proxies (nginx) para que cada evento llegue al momento
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
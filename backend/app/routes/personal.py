@@ -1,17 +1,28 @@
 """
 Rutas CRUD para gestionar Personal
 """
-from fastapi import APIRouter, HTTPException, Depends, Request
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Depends, Request, File, UploadFile
+from fastapi.responses import StreamingResponse, JSONResponse, Response, ORJSONResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from app.database.db import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_, case, func, literal_column, select, insert, update
+from sqlalchemy.exc import IntegrityError
+from app.database.db import get_db, get_async_db, get_db_lectura, get_async_db_lectura
 from app.models.personal import Personal
-from pydantic import BaseModel, field_validator
+from app.services.audit_service import audit_service
+from app.services.roster_cache import roster_cache, RegistroRoster
+from app.services.importacion import leer_archivo, ArchivoInvalido
+from app.services.zkteco_service import zkteco_service
+from app.services.eventos import broker_eventos
+from pydantic import BaseModel, ValidationError, field_validator
 from typing import List, Optional, Literal
 from datetime import datetime, date, timedelta
 from calendar import monthrange
 from collections import defaultdict
+from itertools import islice
+from decimal import Decimal
+import hashlib
 import re
 import io
 import csv
@@ -22,14 +33,9 @@ logger = logging.getLogger("personal")
 router = APIRouter(prefix="/api/personal", tags=["Personal"])
 
 
-def registrar_audit(db: Session, accion: str, entidad: str, entidad_id: int = None, detalle: str = None):
-    """Registra una entrada en el audit log"""
-    from app.models.auditlog import AuditLog
-    try:
-        db.add(AuditLog(accion=accion, entidad=entidad, entidad_id=entidad_id, detalle=detalle))
-        db.commit()
-    except Exception:
-        pass  # No falla la operación principal si falla el audit
+def registrar_audit(accion: str, entidad: str, entidad_id: int = None, detalle: str = None):
+    """Encola una entrada en el audit log (se escribe por lotes en segundo plano)"""
+    audit_service.registrar(accion, entidad, entidad_id, detalle)
 
 # Valores permitidos
 PUESTOS_VALIDOS = {"cajero", "mesero", "cocinero", "lavaplatos", "servidora", "guardia", "despacho", "otros"}
@@ -240,9 +246,10 @@ def crear_personal(personal: PersonalCreate, db: Session = Depends(get_db)):
         nuevo_personal.user_id = nuevo_personal.id
         db.commit()
         db.refresh(nuevo_personal)
+        roster_cache.invalidar()
 
         logger.info(f"Personal creado: id={nuevo_personal.id} '{personal.nombre} {personal.apellido}' doc={personal.documento}")
-        registrar_audit(db, "crear", "personal", nuevo_personal.id, f"{personal.nombre} {personal.apellido} ({personal.documento})")
+        registrar_audit("crear", "personal", nuevo_personal.id, f"{personal.nombre} {personal.apellido} ({personal.documento})")
         return nuevo_personal
     except HTTPException:
         raise
@@ -251,24 +258,117 @@ def crear_personal(personal: PersonalCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 # READ - Obtener todos los registros
+CAMPOS_PERSONAL = tuple(PersonalResponse.model_fields)
+
+
+async def version_roster(db: AsyncSession) -> str:
+    """
+    Version del roster derivada de la BD: cambia con cualquier alta, edicion o baja.
+    Es una sola agregacion indexada, mucho mas barata que serializar la lista.
+    """
+    total, max_id, max_act = (await db.execute(select(
+        func.count(Personal.id), func.max(Personal.id), func.max(Personal.fecha_actualizacion)
+    ))).one()
+    return f"{total}-{max_id}-{max_act.isoformat() if max_act else ''}"
+
+
+def _etag_coincide(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match", "")
+    # El middleware marca la variante gzip de un ETag fuerte como "...-gzip"
+    candidatos = {c.strip().replace('-gzip"', '"') for c in if_none_match.split(",")}
+    return "*" in candidatos or etag in candidatos
+
+
+def _etag_fuerte(*partes) -> str:
+    return f'"{hashlib.sha1("|".join(map(str, partes)).encode()).hexdigest()[:20]}"'
+
+
+# Las respuestas con ETag de datos se revalidan siempre (304 si la version no cambio)
+HEADERS_REVALIDAR = {"Cache-Control": "private, no-cache"}
+
+
+async def _version_asistencia(db: AsyncSession, desde: datetime, hasta: datetime,
+                              personal_id: Optional[int] = None) -> str:
+    """
+    Version de los marcajes de un rango. count + suma de ids + ultimo fecha_creacion
+    cambia con altas, bajas y con el reemplazo que hace asistencia-manual.
+    """
+    from app.models.asistencia import Asistencia
+
+    if personal_id is None:
+        # Mismo conjunto que el dashboard (personal activo): usa el indice compuesto
+        filtro = Asistencia.personal_id.in_(select(Personal.id).where(Personal.activo == True))
+    else:
+        filtro = Asistencia.personal_id == personal_id
+    total, suma_ids, max_creacion = (await db.execute(
+        select(func.count(Asistencia.id), func.sum(Asistencia.id), func.max(Asistencia.fecha_creacion))
+        .where(filtro, Asistencia.fecha_hora >= desde, Asistencia.fecha_hora <= hasta)
+    )).one()
+    return f"{total}-{suma_ids}-{max_creacion.isoformat() if max_creacion else ''}"
+
+
+def _valor_json(valor):
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return float(valor)
+    return valor
+
+
 @router.get("/", response_model=List[PersonalResponse])
-def obtener_todos(
+async def obtener_todos(
+    request: Request,
     skip: int = 0,
     limit: int = 200,
     activos: bool = True,
-    db: Session = Depends(get_db)
+    cursor: Optional[int] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Obtener lista de personal"""
+    """
+    Obtener lista de personal ordenada por id.
+    - cursor: id del ultimo empleado recibido; la respuesta trae X-Siguiente-Cursor si hay mas
+    - fields: proyeccion separada por comas (ej: id,nombre,apellido)
+    - ETag/If-None-Match: si el roster no cambio responde 304 sin cuerpo
+    """
     try:
         skip = max(0, skip)
         limit = max(1, min(limit, 500))
 
-        query = db.query(Personal)
+        campos = CAMPOS_PERSONAL
+        if fields:
+            campos = tuple(dict.fromkeys(c.strip() for c in fields.split(",") if c.strip()))
+            invalidos = [c for c in campos if c not in CAMPOS_PERSONAL]
+            if invalidos or not campos:
+                raise HTTPException(status_code=400, detail=f"Campos invalidos: {', '.join(invalidos) or fields}")
+
+        version = await version_roster(db)
+        clave = f"{version}|{activos}|{cursor}|{skip}|{limit}|{','.join(campos)}"
+        etag = f'W/"{hashlib.sha1(clave.encode()).hexdigest()[:20]}"'
+        if _etag_coincide(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+
+        # Siempre se consulta id (para el cursor) y solo las columnas pedidas
+        columnas = ["id"] + [c for c in campos if c != "id"]
+        query = select(*[getattr(Personal, c) for c in columnas])
         if activos:
-            query = query.filter(Personal.activo == True)
-
-        personal = query.offset(skip).limit(limit).all()
-        return personal
+            query = query.where(Personal.activo == True)
+        query = query.order_by(Personal.id)
+        if cursor is not None:
+            query = query.where(Personal.id > cursor)
+        elif skip:
+            query = query.offset(skip)
+
+        filas = (await db.execute(query.limit(limit + 1))).all()
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if len(filas) > limit:
+            filas = filas[:limit]
+            headers["X-Siguiente-Cursor"] = str(filas[-1].id)
+
+        contenido = [{c: _valor_json(getattr(f, c)) for c in campos} for f in filas]
+        return JSONResponse(content=contenido, headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -289,12 +389,18 @@ def obtener_estadisticas(db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/stats/cache-roster", response_model=dict)
+def estadisticas_cache_roster():
+    """Version y tasa de aciertos del cache de roster en este proceso"""
+    return roster_cache.stats()
+
 # DASHBOARD
 @router.get("/stats/dashboard")
-def dashboard_stats(
+async def dashboard_stats(
+    request: Request,
     mes: int = None,
     anio: int = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db_lectura),
 ):
     """Estadisticas para el dashboard: asistencia general del mes"""
     from app.models.asistencia import Asistencia
@@ -308,27 +414,45 @@ def dashboard_stats(
     fecha_inicio_dt = datetime(anio, mes, 1)
     fecha_fin_dt = datetime(anio, mes, dias_en_mes, 23, 59, 59)
 
-    personal_activo = db.query(Personal).filter(Personal.activo == True).all()
+    # Version de los datos que usa el calculo (roster + marcajes del mes + dia actual):
+    # si el cliente ya tiene esta version responde 304 sin recalcular
+    etag = _etag_fuerte(
+        "dashboard", mes, anio, date.today(), await version_roster(db),
+        await _version_asistencia(db, fecha_inicio_dt, fecha_fin_dt),
+    )
+    if _etag_coincide(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, **HEADERS_REVALIDAR})
 
-    resumen = []
-    total_retrasos = 0
-    total_faltas = 0
-    total_extras = 0
-    por_puesto = defaultdict(int)
+    personal_activo = (await db.scalars(select(Personal).where(Personal.activo == True))).all()
 
-    DIAS_SEMANA_MAP = {0: "lunes", 1: "martes", 2: "miercoles", 3: "jueves", 4: "viernes", 5: "sabado", 6: "domingo"}
-
-    # Una sola query para todos los registros del mes (evita N+1)
+    # Una sola query para todos los registros del mes (evita N+1).
+    # Ordenar por (personal_id, fecha_hora) sigue el indice compuesto y evita un sort.
     ids_activos = [p.id for p in personal_activo]
     todos_registros = []
     if ids_activos:
-        todos_registros = db.query(Asistencia).filter(
+        todos_registros = (await db.scalars(select(Asistencia).where(
             and_(
                 Asistencia.personal_id.in_(ids_activos),
                 Asistencia.fecha_hora >= fecha_inicio_dt,
                 Asistencia.fecha_hora <= fecha_fin_dt,
             )
-        ).order_by(Asistencia.fecha_hora.asc()).all()
+        ).order_by(Asistencia.personal_id, Asistencia.fecha_hora.asc()))).all()
+
+    # El calculo recorre empleados x dias: fuera del event loop para no frenar otros requests
+    datos = await run_in_threadpool(_calcular_dashboard, personal_activo, todos_registros, mes, anio)
+    return ORJSONResponse(datos, headers={"ETag": etag, **HEADERS_REVALIDAR})
+
+
+def _calcular_dashboard(personal_activo: list, todos_registros: list, mes: int, anio: int) -> dict:
+    """Resumen del mes por empleado (CPU: se llama desde el threadpool)"""
+    dias_en_mes = monthrange(anio, mes)[1]
+    resumen = []
+    total_retrasos = 0
+    total_faltas = 0
+    total_extras = 0
+    por_puesto = defaultdict(int)
+
+    DIAS_SEMANA_MAP = {0: "lunes", 1: "martes", 2: "miercoles", 3: "jueves", 4: "viernes", 5: "sabado", 6: "domingo"}
 
     registros_por_personal: dict = defaultdict(lambda: defaultdict(list))
     for reg in todos_registros:
@@ -415,7 +539,7 @@ def dashboard_stats(
 def exportar_lista_personal(
     formato: str = "csv",
     activos: bool = True,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_lectura),
 ):
     """Exporta la lista completa de personal en CSV o Excel"""
     query = db.query(Personal)
@@ -478,6 +602,122 @@ def exportar_lista_personal(
         )
 
 
+# IMPORTACION MASIVA - CSV/XLSX
+LOTE_IMPORTACION = 500  # filas por INSERT multi-fila (y por consulta de duplicados)
+
+
+def _lotes(filas, tamano: int):
+    while lote := list(islice(filas, tamano)):
+        yield lote
+
+
+def _error_fila(numero: int, documento, errores: list[str]) -> dict:
+    return {"fila": numero, "documento": documento, "errores": errores}
+
+
+def _valores_importados(personal: PersonalCreate) -> dict:
+    valores = personal.model_dump()
+    valores["fecha_fin"] = Personal(**valores).calcular_fecha_fin()
+    return valores
+
+
+@router.post("/importar")
+def importar_personal(
+    archivo: UploadFile = File(...),
+    exportar_dispositivo: bool = False,
+    db: Session = Depends(get_db),
+):
+    """
+    Alta masiva desde CSV o XLSX. Cada fila se valida con PersonalCreate; los documentos
+    repetidos (en el archivo o ya registrados) se detectan por lote con una consulta y
+    las filas validas entran con un INSERT multi-fila por lote, en una sola transaccion.
+    Las filas con error se omiten y vuelven en el reporte.
+    """
+    errores = []
+    creados: list[tuple[int, str]] = []  # (id, nombre para el dispositivo)
+    vistos = set()
+    total = 0
+    try:
+        for lote in _lotes(leer_archivo(archivo.file, archivo.filename or ""), LOTE_IMPORTACION):
+            total += len(lote)
+            validos = []
+            for numero, datos in lote:
+                try:
+                    personal = PersonalCreate.model_validate(datos)
+                except ValidationError as e:
+                    errores.append(_error_fila(numero, datos.get("documento"), [
+                        f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()
+                    ]))
+                    continue
+                if personal.documento in vistos:
+                    errores.append(_error_fila(numero, personal.documento, ["Documento repetido en el archivo"]))
+                    continue
+                vistos.add(personal.documento)
+                validos.append((numero, personal))
+            if not validos:
+                continue
+
+            existentes = set(db.scalars(
+                select(Personal.documento).where(Personal.documento.in_([p.documento for _, p in validos]))
+            ))
+            nuevos = []
+            for numero, personal in validos:
+                if personal.documento in existentes:
+                    errores.append(_error_fila(numero, personal.documento, ["El documento ya existe"]))
+                else:
+                    nuevos.append(personal)
+            if not nuevos:
+                continue
+
+            # RETURNING sin orden garantizado: los ids se asocian por documento (unico).
+            # render_nulls evita que el ORM separe en otro INSERT las filas con campos en None
+            id_por_documento = dict(db.execute(
+                insert(Personal).returning(Personal.documento, Personal.id),
+                [_valores_importados(p) for p in nuevos],
+                execution_options={"render_nulls": True},
+            ).all())
+            ids = [id_por_documento[p.documento] for p in nuevos]
+            # user_id (ID en el dispositivo) = id, igual que en el alta individual
+            db.execute(
+                update(Personal).where(Personal.id.in_(ids)).values(user_id=Personal.id)
+                .execution_options(synchronize_session=False)
+            )
+            creados += [(i, f"{p.nombre} {p.apellido}".strip()[:24]) for i, p in zip(ids, nuevos)]
+        db.commit()
+    except ArchivoInvalido as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Otro alta registro uno de los documentos durante la importacion; reintentar")
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if creados:
+        roster_cache.invalidar()
+        registrar_audit("importar", "personal", None, f"{len(creados)} registros desde {archivo.filename}")
+    logger.info(f"Importacion: {len(creados)} de {total} filas creadas desde {archivo.filename}")
+
+    dispositivo = None
+    if exportar_dispositivo and creados:
+        try:
+            fallos = zkteco_service.registrar_usuarios(creados)
+            dispositivo = {"exportados": len(creados) - len(fallos), "errores": fallos}
+        except (ConnectionError, OSError) as e:
+            # El alta en la BD ya quedo: se puede reintentar con /api/zkteco/exportar-todos
+            dispositivo = {"exportados": 0, "errores": [{"error": f"Dispositivo no disponible: {e}"}]}
+
+    return {
+        "total_filas": total,
+        "creados": len(creados),
+        "omitidos": total - len(creados),
+        "ids": [i for i, _ in creados],
+        "errores": errores,
+        "dispositivo": dispositivo,
+    }
+
+
 class AsistenciaManualRequest(BaseModel):
     personal_id: int
     fecha: str  # YYYY-MM-DD
@@ -500,57 +740,81 @@ class AsistenciaManualRequest(BaseModel):
             raise ValueError("Formato de hora invalido, usar HH:MM")
         return v
 
+MAX_ASISTENCIA_MANUAL_LOTE = 2000  # dias empleado-fecha por request
+LOTE_BORRADO_ASISTENCIA = 200  # rangos por DELETE (OR de condiciones sobre el indice personal+fecha)
+
+
+class AsistenciaManualLoteRequest(BaseModel):
+    registros: List[AsistenciaManualRequest]
+
+    @field_validator("registros")
+    @classmethod
+    def validar_registros(cls, v):
+        if not v or len(v) > MAX_ASISTENCIA_MANUAL_LOTE:
+            raise ValueError(f"Debe tener entre 1 y {MAX_ASISTENCIA_MANUAL_LOTE} registros")
+        claves = [(r.personal_id, r.fecha) for r in v]
+        if len(set(claves)) != len(claves):
+            raise ValueError("Hay mas de un registro para el mismo personal y fecha")
+        return v
+
+
+def _marcaje_manual(personal: RegistroRoster, dia: date, tipo: str, hora: str, ahora: datetime) -> dict:
+    h, m = hora.split(":")
+    return {
+        "personal_id": personal.id,
+        "user_id": personal.user_id,
+        "tipo": tipo,
+        "fecha_hora": datetime(dia.year, dia.month, dia.day, int(h), int(m)),
+        "dispositivo_ip": "manual",
+        "sincronizado": "S",
+        "fecha_sincronizacion": ahora,
+    }
+
+
+def _aplicar_asistencia_manual(db: Session, registros: list[tuple[RegistroRoster, AsistenciaManualRequest]]
+                               ) -> tuple[int, list[tuple[int, date]]]:
+    """
+    Reemplaza los marcajes de cada (personal, dia): un DELETE por bloque de dias y un
+    INSERT multi-fila con los nuevos. No hace commit; retorna (marcajes creados, dias).
+    """
+    from app.models.asistencia import Asistencia
+
+    dias = [(personal, datetime.strptime(r.fecha, "%Y-%m-%d").date(), r) for personal, r in registros]
+    for i in range(0, len(dias), LOTE_BORRADO_ASISTENCIA):
+        db.execute(
+            Asistencia.__table__.delete().where(or_(*(
+                and_(
+                    Asistencia.personal_id == personal.id,
+                    Asistencia.fecha_hora >= datetime(dia.year, dia.month, dia.day),
+                    Asistencia.fecha_hora < datetime(dia.year, dia.month, dia.day) + timedelta(days=1),
+                )
+                for personal, dia, _ in dias[i:i + LOTE_BORRADO_ASISTENCIA]
+            )))
+        )
+
+    ahora = datetime.utcnow()
+    filas = []
+    for personal, dia, r in dias:
+        if r.hora_ingreso:
+            filas.append(_marcaje_manual(personal, dia, "entrada", r.hora_ingreso, ahora))
+        if r.hora_salida:
+            filas.append(_marcaje_manual(personal, dia, "salida", r.hora_salida, ahora))
+    if filas:
+        db.execute(insert(Asistencia), filas)
+    return len(filas), [(personal.id, dia) for personal, dia, _ in dias]
+
+
 # Asistencia manual (debe ir antes de /{personal_id} routes con sub-paths)
 @router.post("/asistencia-manual")
 def registrar_asistencia_manual(data: AsistenciaManualRequest, db: Session = Depends(get_db)):
     """Registra o actualiza manualmente la asistencia de un dia"""
-    from app.models.asistencia import Asistencia
-
-    personal = db.query(Personal).filter(Personal.id == data.personal_id).first()
+    personal = roster_cache.por_id(db, data.personal_id)
     if not personal:
         raise HTTPException(status_code=404, detail="Personal no encontrado")
 
-    fecha_date = datetime.strptime(data.fecha, "%Y-%m-%d").date()
-    fecha_inicio_dt = datetime(fecha_date.year, fecha_date.month, fecha_date.day, 0, 0, 0)
-    fecha_fin_dt = datetime(fecha_date.year, fecha_date.month, fecha_date.day, 23, 59, 59)
-
-    db.query(Asistencia).filter(
-        and_(
-            Asistencia.personal_id == data.personal_id,
-            Asistencia.fecha_hora >= fecha_inicio_dt,
-            Asistencia.fecha_hora <= fecha_fin_dt,
-        )
-    ).delete()
-
-    registros_creados = 0
-
-    if data.hora_ingreso:
-        h, m = data.hora_ingreso.split(":")
-        db.add(Asistencia(
-            personal_id=data.personal_id,
-            user_id=personal.user_id,
-            tipo="entrada",
-            fecha_hora=datetime(fecha_date.year, fecha_date.month, fecha_date.day, int(h), int(m)),
-            dispositivo_ip="manual",
-            sincronizado="S",
-            fecha_sincronizacion=datetime.utcnow(),
-        ))
-        registros_creados += 1
-
-    if data.hora_salida:
-        h, m = data.hora_salida.split(":")
-        db.add(Asistencia(
-            personal_id=data.personal_id,
-            user_id=personal.user_id,
-            tipo="salida",
-            fecha_hora=datetime(fecha_date.year, fecha_date.month, fecha_date.day, int(h), int(m)),
-            dispositivo_ip="manual",
-            sincronizado="S",
-            fecha_sincronizacion=datetime.utcnow(),
-        ))
-        registros_creados += 1
-
+    registros_creados, dias = _aplicar_asistencia_manual(db, [(personal, data)])
     db.commit()
+    broker_eventos.marcajes_editados(db, dias)
     logger.info(f"Asistencia manual: personal_id={data.personal_id} fecha={data.fecha} registros={registros_creados}")
     return {
         "status": "ok",
@@ -558,6 +822,113 @@ def registrar_asistencia_manual(data: AsistenciaManualRequest, db: Session = Dep
         "mensaje": f"Asistencia del {data.fecha} actualizada correctamente",
     }
 
+
+@router.post("/asistencia-manual/lote")
+def registrar_asistencia_manual_lote(data: AsistenciaManualLoteRequest, db: Session = Depends(get_db)):
+    """
+    Varios dias (de uno o mas empleados) en una transaccion: todos se aplican o ninguno.
+    Los reportes y el dashboard se calculan desde asistencia y sus ETags dependen de
+    los marcajes, asi que reflejan el lote completo apenas se hace commit.
+    """
+    registros = []
+    no_encontrados = set()
+    for r in data.registros:
+        personal = roster_cache.por_id(db, r.personal_id)
+        if personal is None:
+            no_encontrados.add(r.personal_id)
+        else:
+            registros.append((personal, r))
+    if no_encontrados:
+        raise HTTPException(status_code=404, detail=f"Personal no encontrado: {sorted(no_encontrados)}")
+
+    try:
+        registros_creados, dias = _aplicar_asistencia_manual(db, registros)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error en asistencia manual por lote: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    broker_eventos.marcajes_editados(db, dias)
+
+    empleados = len({r.personal_id for r in data.registros})
+    logger.info(f"Asistencia manual por lote: {len(data.registros)} dias de {empleados} empleados, "
+                f"registros={registros_creados}")
+    registrar_audit("asistencia_manual", "asistencia", None,
+                    f"{len(data.registros)} dias de {empleados} empleados")
+    return {
+        "status": "ok",
+        "dias_actualizados": len(data.registros),
+        "registros_creados": registros_creados,
+        "mensaje": f"{len(data.registros)} dias de asistencia actualizados correctamente",
+    }
+
+# BUSQUEDA - nombre, apellido y documento (prefijo + difusa)
+def _escapar_like(texto: str) -> str:
+    return texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+@router.get("/buscar")
+def buscar_personal(
+    q: str,
+    limit: int = 20,
+    offset: int = 0,
+    activos: bool = True,
+    db: Session = Depends(get_db),
+):
+    """
+    Busca personal por nombre, apellido o documento y ordena por relevancia:
+    documento exacto > prefijo de documento > prefijo de nombre/apellido > similitud.
+    En PostgreSQL la coincidencia difusa usa pg_trgm (indices GIN de la migracion).
+    """
+    q = q.strip()
+    if not q or len(q) > 100:
+        raise HTTPException(status_code=400, detail="La busqueda debe tener entre 1 y 100 caracteres")
+    limit = max(1, min(limit, 100))
+    offset = max(0, offset)
+
+    # Separador en linea (no como parametro) para que coincida con la expresion del indice
+    nombre_completo = Personal.nombre + literal_column("' '") + Personal.apellido
+    prefijo = f"{_escapar_like(q)}%"
+    prefijo_palabra = f"% {_escapar_like(q)}%"
+    coincide_nombre = or_(
+        nombre_completo.ilike(prefijo, escape="\\"),
+        nombre_completo.ilike(prefijo_palabra, escape="\\"),
+    )
+    coincide_documento = Personal.documento.ilike(prefijo, escape="\\")
+
+    puntaje = case(
+        (Personal.documento == q, 3.0),
+        (coincide_documento, 2.0),
+        (coincide_nombre, 1.0),
+        else_=0.0,
+    )
+    filtro = or_(coincide_nombre, coincide_documento)
+
+    if db.bind.dialect.name == "postgresql":
+        # word_similarity tolera errores de tipeo dentro de cualquier palabra del nombre
+        similitud = func.greatest(
+            func.word_similarity(q, nombre_completo),
+            func.similarity(Personal.documento, q),
+        )
+        puntaje = puntaje + similitud
+        filtro = or_(filtro, nombre_completo.op("%>")(q), Personal.documento.op("%")(q))
+
+    query = db.query(Personal, puntaje.label("puntaje")).filter(filtro)
+    if activos:
+        query = query.filter(Personal.activo == True)
+
+    filas = query.order_by(puntaje.desc(), Personal.id).offset(offset).limit(limit + 1).all()
+    hay_mas = len(filas) > limit
+
+    return {
+        "q": q,
+        "hay_mas": hay_mas,
+        "resultados": [
+            {**PersonalResponse.model_validate(p).model_dump(mode="json"), "puntaje": round(float(pts), 3)}
+            for p, pts in filas[:limit]
+        ],
+    }
+
 # READ - Obtener por ID
 @router.get("/{personal_id}", response_model=PersonalResponse)
 def obtener_personal(personal_id: int, db: Session = Depends(get_db)):
@@ -610,8 +981,9 @@ def actualizar_personal(
         personal.fecha_actualizacion = datetime.utcnow()
         db.commit()
         db.refresh(personal)
+        roster_cache.invalidar()
         logger.info(f"Personal actualizado: id={personal_id} campos={list(update_data.keys())}")
-        registrar_audit(db, "actualizar", "personal", personal_id, f"Campos: {', '.join(update_data.keys())}")
+        registrar_audit("actualizar", "personal", personal_id, f"Campos: {', '.join(update_data.keys())}")
         return personal
     except HTTPException:
         raise
@@ -631,8 +1003,9 @@ def eliminar_personal(personal_id: int, db: Session = Depends(get_db)):
         personal.activo = False
         personal.fecha_actualizacion = datetime.utcnow()
         db.commit()
+        roster_cache.invalidar()
         logger.info(f"Personal desactivado: id={personal_id} '{personal.nombre} {personal.apellido}'")
-        registrar_audit(db, "desactivar", "personal", personal_id, f"{personal.nombre} {personal.apellido}")
+        registrar_audit("desactivar", "personal", personal_id, f"{personal.nombre} {personal.apellido}")
         return {"mensaje": "Personal desactivado correctamente"}
     except HTTPException:
         raise
@@ -644,10 +1017,11 @@ def eliminar_personal(personal_id: int, db: Session = Depends(get_db)):
 @router.get("/{personal_id}/asistencia")
 def obtener_asistencia_personal(
     personal_id: int,
+    request: Request,
     limit: int = 100,
     db: Session = Depends(get_db),
 ):
-    """Obtener registros de asistencia de un personal"""
+    """Obtener registros de asistencia de un personal (ETag por version de sus marcajes)"""
     from app.models.asistencia import Asistencia
 
     limit = max(1, min(limit, 1000))
@@ -657,9 +1031,14 @@ def obtener_asistencia_personal(
         if not personal:
             raise HTTPException(status_code=404, detail="Personal no encontrado")
 
-        total = db.query(Asistencia).filter(
-            Asistencia.personal_id == personal_id
-        ).count()
+        # El conteo sale de la misma agregacion que la version
+        total, suma_ids, max_creacion = db.query(
+            func.count(Asistencia.id), func.sum(Asistencia.id), func.max(Asistencia.fecha_creacion)
+        ).filter(Asistencia.personal_id == personal_id).one()
+        etag = _etag_fuerte("asistencia", personal_id, limit, total, suma_ids, max_creacion,
+                            personal.nombre, personal.apellido)
+        if _etag_coincide(request, etag):
+            return Response(status_code=304, headers={"ETag": etag, **HEADERS_REVALIDAR})
 
         registros = db.query(Asistencia).filter(
             Asistencia.personal_id == personal_id
@@ -674,12 +1053,12 @@ def obtener_asistencia_personal(
                 "dispositivo_ip": reg.dispositivo_ip,
             })
 
-        return {
+        return ORJSONResponse({
             "personal_id": personal_id,
             "nombre": f"{personal.nombre} {personal.apellido}",
             "total_registros": total,
             "registros": registros_formateados,
-        }
+        }, headers={"ETag": etag, **HEADERS_REVALIDAR})
     except HTTPException:
         raise
     except Exception as e:
@@ -688,15 +1067,32 @@ def obtener_asistencia_personal(
 
 # REPORTE MENSUAL
 @router.get("/{personal_id}/reporte-mensual")
-def reporte_mensual(
+async def reporte_mensual(
     personal_id: int,
+    request: Request,
     mes: int = None,
     anio: int = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db_lectura),
 ):
     """Genera reporte mensual de asistencia con horas de ingreso/salida por dia"""
-    from app.models.asistencia import Asistencia
+    mes, anio = _periodo_reporte(mes, anio)
+    personal = await _personal_reporte(db, personal_id)
 
+    dias_en_mes = monthrange(anio, mes)[1]
+    version = await _version_asistencia(
+        db, datetime(anio, mes, 1), datetime(anio, mes, dias_en_mes, 23, 59, 59), personal_id
+    )
+    etag = _etag_fuerte("reporte", mes, anio, date.today(), version,
+                        *(getattr(personal, c) for c in RegistroRoster.__slots__))
+    if _etag_coincide(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, **HEADERS_REVALIDAR})
+    return ORJSONResponse(
+        await _datos_reporte_mensual(db, personal, mes, anio),
+        headers={"ETag": etag, **HEADERS_REVALIDAR},
+    )
+
+
+def _periodo_reporte(mes: Optional[int], anio: Optional[int]) -> tuple[int, int]:
     if mes is None:
         mes = datetime.now().month
     if anio is None:
@@ -706,22 +1102,31 @@ def reporte_mensual(
         raise HTTPException(status_code=400, detail="Mes debe estar entre 1 y 12")
     if not (2000 <= anio <= 2100):
         raise HTTPException(status_code=400, detail="Anio debe estar entre 2000 y 2100")
+    return mes, anio
 
-    personal = db.query(Personal).filter(Personal.id == personal_id).first()
+
+async def _personal_reporte(db: AsyncSession, personal_id: int) -> RegistroRoster:
+    personal = await roster_cache.por_id_async(db, personal_id)
     if not personal:
         raise HTTPException(status_code=404, detail="Personal no encontrado")
+    return personal
+
 
+async def _datos_reporte_mensual(db: AsyncSession, personal: RegistroRoster, mes: int, anio: int) -> dict:
+    from app.models.asistencia import Asistencia
+
+    personal_id = personal.id
     dias_en_mes = monthrange(anio, mes)[1]
     fecha_inicio = datetime(anio, mes, 1)
     fecha_fin = datetime(anio, mes, dias_en_mes, 23, 59, 59)
 
-    registros = db.query(Asistencia).filter(
+    registros = (await db.scalars(select(Asistencia).where(
         and_(
             Asistencia.personal_id == personal_id,
             Asistencia.fecha_hora >= fecha_inicio,
             Asistencia.fecha_hora <= fecha_fin,
         )
-    ).order_by(Asistencia.fecha_hora.asc()).all()
+    ).order_by(Asistencia.fecha_hora.asc()))).all()
 
     por_fecha = defaultdict(list)
     for reg in registros:
@@ -819,17 +1224,22 @@ def reporte_mensual(
 
 # ============ EXPORTAR REPORTE ============
 @router.get("/{personal_id}/exportar-reporte")
-def exportar_reporte(
+async def exportar_reporte(
     personal_id: int,
     mes: int = None,
     anio: int = None,
     formato: str = "csv",
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db_lectura),
 ):
     """Exporta el reporte mensual en CSV o Excel"""
-    # Reusar la logica del reporte mensual
-    data = reporte_mensual(personal_id, mes, anio, db)
+    # Reusar la logica del reporte mensual; el archivo (openpyxl/CSV) se arma fuera del event loop
+    mes, anio = _periodo_reporte(mes, anio)
+    data = await _datos_reporte_mensual(db, await _personal_reporte(db, personal_id), mes, anio)
+    return await run_in_threadpool(_archivo_reporte, data, formato)
+
 
+def _archivo_reporte(data: dict, formato: str) -> StreamingResponse:
+    """Arma el CSV o Excel del reporte mensual (CPU: se llama desde el threadpool)"""
     DIAS_LABEL = {
         "lunes": "Lunes", "martes": "Martes", "miercoles": "Miercoles",
         "jueves": "Jueves", "viernes": "Viernes", "sabado": "Sabado", "domingo": "Domingo"
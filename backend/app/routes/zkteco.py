@@ -2,12 +2,19 @@
 Rutas para integración con dispositivo biométrico ZKTeco
 """
 from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import Optional
 from slowapi import Limiter
 from slowapi.util import get_remote_address
+from app.config import settings
 from app.services.zkteco_service import zkteco_service
+from app.services.roster_cache import roster_cache
+from app.services.metrics import sync_filas
+from app.services.estado_compartido import estado_compartido
+from app.services.eventos import broker_eventos
+from app.services.spool import spool_ingesta, es_caida_bd
 from app.database.db import get_db
 from app.models.personal import Personal
 from app.models.asistencia import Asistencia
@@ -21,9 +28,11 @@ import socket
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/zkteco", tags=["ZKTeco"])
-limiter = Limiter(key_func=get_remote_address)
+limiter = Limiter(key_func=get_remote_address, storage_uri=settings.rate_limit_storage_uri)
 
+# Legado: la config vive en estado_runtime; el archivo solo se migra la primera vez
 CONFIG_FILE = Path(__file__).parent.parent.parent / "device_config.json"
+CLAVE_CONFIG = "zkteco_config"
 
 
 def _cargar_config_guardada():
@@ -38,19 +47,41 @@ def _cargar_config_guardada():
 
 
 def _guardar_config(ip: str, puerto: int, password: int):
-    """Guarda la config del dispositivo a archivo JSON"""
-    config = {"ip": ip, "puerto": puerto, "password": password}
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(config, f, indent=2)
+    """Guarda la config del dispositivo en el estado compartido (visible para todos los workers)"""
+    estado_compartido.guardar(CLAVE_CONFIG, {"ip": ip, "puerto": puerto, "password": password})
 
 
-# Cargar config guardada al iniciar el módulo
-_config_guardada = _cargar_config_guardada()
-if _config_guardada:
-    zkteco_service.ip = _config_guardada["ip"]
-    zkteco_service.port = _config_guardada["puerto"]
-    zkteco_service.password = _config_guardada.get("password", 0)
-    logger.info(f"Config cargada desde archivo: {_config_guardada['ip']}:{_config_guardada['puerto']}")
+def _aplicar_config(config: Optional[dict]):
+    if config:
+        zkteco_service.ip = config["ip"]
+        zkteco_service.port = config["puerto"]
+        zkteco_service.password = config.get("password", 0)
+
+
+# Otro worker cambio la config: aplicarla en este proceso
+estado_compartido.al_cambiar(CLAVE_CONFIG, _aplicar_config)
+
+
+def aplicar_config_guardada():
+    """
+    Aplica la config guardada al servicio (se llama al arrancar la app, no al importar).
+    Fuente: estado compartido; si aun no existe, se migra device_config.json.
+    """
+    try:
+        estado_compartido.refrescar()
+        config = estado_compartido.obtener(CLAVE_CONFIG)
+        if config is None:
+            config = _cargar_config_guardada()
+            if config:
+                _guardar_config(config["ip"], config["puerto"], config.get("password", 0))
+                logger.info("Config del dispositivo migrada de device_config.json al estado compartido")
+    except Exception as e:
+        # Sin BD: usar el archivo legado para este proceso
+        logger.warning(f"Estado compartido no disponible ({e}), usando device_config.json")
+        config = _cargar_config_guardada()
+    if config:
+        _aplicar_config(config)
+        logger.info(f"Config del dispositivo: {config['ip']}:{config['puerto']}")
 
 
 DEBOUNCE_SEGUNDOS = 30  # Ignorar marcajes duplicados dentro de este rango
@@ -119,6 +150,12 @@ class ExportarUsuarioRequest(BaseModel):
 
 
 
+def _contar_sync_registros(nuevos: int, duplicados: int, sin_personal: int):
+    sync_filas.inc(nuevos, tipo="registros", resultado="nuevos")
+    sync_filas.inc(duplicados, tipo="registros", resultado="duplicados")
+    sync_filas.inc(sin_personal, tipo="registros", resultado="sin_personal")
+
+
 @router.get("/turnos")
 def obtener_turnos():
     """Retorna los turnos disponibles con sus horarios"""
@@ -132,7 +169,7 @@ def obtener_config():
         "ip": zkteco_service.ip,
         "puerto": zkteco_service.port,
         "password": zkteco_service.password,
-        "guardado": CONFIG_FILE.exists(),
+        "guardado": estado_compartido.obtener(CLAVE_CONFIG) is not None,
     }
 
 
@@ -222,6 +259,9 @@ def sincronizar_usuarios(request: Request, db: Session = Depends(get_db)):
                     actualizados += 1
 
         db.commit()
+        roster_cache.invalidar()
+        sync_filas.inc(sincronizados, tipo="usuarios", resultado="nuevos")
+        sync_filas.inc(actualizados, tipo="usuarios", resultado="actualizados")
         logger.info(f"Usuarios sincronizados: {sincronizados}, actualizados: {actualizados}")
 
         return {
@@ -244,7 +284,7 @@ def exportar_usuario(data: ExportarUsuarioRequest, db: Session = Depends(get_db)
     EXPORTAR: Registra un empleado de la BD en el dispositivo biométrico.
     """
     try:
-        personal = db.query(Personal).filter(Personal.id == data.personal_id).first()
+        personal = roster_cache.por_id(db, data.personal_id)
         if not personal:
             raise HTTPException(status_code=404, detail="Personal no encontrado en la base de datos")
 
@@ -261,9 +301,12 @@ def exportar_usuario(data: ExportarUsuarioRequest, db: Session = Depends(get_db)
         )
 
         if not personal.user_id:
-            personal.user_id = uid
-            personal.fecha_actualizacion = datetime.now(timezone.utc)
+            db.query(Personal).filter(Personal.id == personal.id).update({
+                Personal.user_id: uid,
+                Personal.fecha_actualizacion: datetime.now(timezone.utc),
+            })
             db.commit()
+            roster_cache.invalidar()
 
         return {
             "status": "exportado",
@@ -315,6 +358,7 @@ def exportar_todos_usuarios(db: Session = Depends(get_db)):
                 errores.append({"personal_id": personal.id, "nombre": personal.nombre, "error": str(e)})
 
         db.commit()
+        roster_cache.invalidar()
         logger.info(f"Exportación masiva: {exportados} usuarios enviados al dispositivo")
 
         return {
@@ -382,12 +426,46 @@ def obtener_registros():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _encolar_en_spool(registros: list) -> tuple[int, int]:
+    """
+    Escribe al spool local (con fsync) los marcajes validos del dispositivo.
+    Retorna (encolados, duplicados filtrados).
+    """
+    validos = [
+        {
+            "user_id": int(reg["user_id"]) if reg["user_id"] else None,
+            "tipo": reg["tipo_auto"],
+            "fecha_hora": reg["timestamp"].isoformat() if reg["timestamp"] else None,
+            "dispositivo_ip": zkteco_service.ip,
+        }
+        for reg in registros if reg["tipo_auto"] != "duplicado"
+    ]
+    spool_ingesta.agregar(validos)
+    return len(validos), len(registros) - len(validos)
+
+
+def _respuesta_spool_pendiente(db: Session, e: Exception, total: int, encolados: int, **extra) -> JSONResponse:
+    """Sin conexion con la BD despues de escribir al spool: los marcajes quedan en disco y se cargan al volver"""
+    db.rollback()
+    logger.warning(f"BD no disponible, {encolados} marcajes quedan en el spool local: {e}")
+    return JSONResponse(status_code=202, content={
+        **extra,
+        "total_sincronizados": 0,
+        "total_registros": total,
+        "encolados": encolados,
+        "pendientes_spool": spool_ingesta.pendientes,
+        "mensaje": f"Base de datos no disponible: {encolados} registros quedaron guardados localmente "
+                   f"y se importaran automaticamente cuando vuelva",
+    })
+
+
 @router.post("/sincronizar-registros")
 @limiter.limit("5/minute")
 def sincronizar_registros(request: Request, db: Session = Depends(get_db)):
     """
     IMPORTAR: Sincroniza registros de asistencia del dispositivo a la BD.
     Usa detección automática: alterna entrada/salida por usuario por día.
+    Los marcajes pasan primero por el spool local: si la BD no responde se conservan (202).
     """
     try:
         registros = zkteco_service.obtener_registros_asistencia()
@@ -396,59 +474,40 @@ def sincronizar_registros(request: Request, db: Session = Depends(get_db)):
 
         # Asignar tipos alternados (entrada/salida) por usuario por día
         registros = _asignar_tipos_alternados(registros)
-
-        sincronizados = 0
-        sin_personal = 0
-        duplicados = 0
-        for reg in registros:
-            if reg["tipo_auto"] == "duplicado":
-                duplicados += 1
-                continue
-
-            user_id_int = int(reg["user_id"]) if reg["user_id"] else None
-            personal = db.query(Personal).filter(
-                Personal.user_id == user_id_int
-            ).first()
-
-            if not personal:
-                sin_personal += 1
-                continue
-
-            registro_existente = db.query(Asistencia).filter(
-                Asistencia.personal_id == personal.id,
-                Asistencia.fecha_hora == reg["timestamp"],
-            ).first()
-
-            if not registro_existente:
-                nueva_asistencia = Asistencia(
-                    personal_id=personal.id,
-                    user_id=user_id_int,
-                    tipo=reg["tipo_auto"],
-                    fecha_hora=reg["timestamp"],
-                    dispositivo_ip=zkteco_service.ip,
-                    sincronizado="S",
-                    fecha_sincronizacion=datetime.now(timezone.utc),
-                )
-                db.add(nueva_asistencia)
-                sincronizados += 1
-
-        db.commit()
-        logger.info(f"Registros sincronizados: {sincronizados}, duplicados filtrados: {duplicados}")
-
-        return {
-            "total_sincronizados": sincronizados,
-            "total_registros": len(registros),
-            "duplicados_filtrados": duplicados,
-            "sin_personal_asociado": sin_personal,
-            "mensaje": f"Se importaron {sincronizados} registros ({duplicados} duplicados filtrados)",
-        }
     except (ConnectionError, OSError, socket.error) as e:
         raise HTTPException(status_code=503, detail=f"Dispositivo no disponible: {e}")
     except Exception as e:
-        db.rollback()
         logger.error(f"Error al sincronizar registros: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+    try:
+        encolados, duplicados = _encolar_en_spool(registros)
+    except OSError as e:
+        logger.error(f"No se pudo escribir el spool de ingesta: {e}")
+        raise HTTPException(status_code=500, detail=f"No se pudo escribir el spool local: {e}")
+
+    try:
+        # Carga lo pendiente del spool (incluye lo que quedo de caidas anteriores de la BD)
+        resultado = spool_ingesta.reproducir(db)
+    except Exception as e:
+        if not es_caida_bd(e):
+            db.rollback()
+            logger.error(f"Error al cargar el spool de ingesta: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+        return _respuesta_spool_pendiente(db, e, len(registros), encolados, duplicados_filtrados=duplicados)
+
+    sincronizados, sin_personal = resultado["insertados"], resultado["sin_personal"]
+    _contar_sync_registros(sincronizados, duplicados, sin_personal)
+    logger.info(f"Registros sincronizados: {sincronizados}, duplicados filtrados: {duplicados}")
+    return {
+        "total_sincronizados": sincronizados,
+        "total_registros": len(registros),
+        "duplicados_filtrados": duplicados,
+        "sin_personal_asociado": sin_personal,
+        "rechazados": resultado["rechazados"],
+        "mensaje": f"Se importaron {sincronizados} registros ({duplicados} duplicados filtrados)",
+    }
+
 
 @router.post("/re-sincronizar-registros")
 @limiter.limit("2/minute")
@@ -456,14 +515,17 @@ def re_sincronizar_registros(request: Request, db: Session = Depends(get_db)):
     """
     Borra TODOS los registros de asistencia y los re-importa con tipos corregidos.
     Útil cuando los registros anteriores tienen tipo incorrecto.
+    Lo que seguia pendiente en el spool (con los tipos viejos) se descarta.
     """
     try:
+        spool_ingesta.descartar_anteriores()
         eliminados = db.query(Asistencia).delete()
         db.commit()
         logger.info(f"Se eliminaron {eliminados} registros de asistencia para re-sincronización")
 
         registros = zkteco_service.obtener_registros_asistencia()
         if not registros:
+            broker_eventos.recarga_completa()
             return {
                 "eliminados": eliminados,
                 "total_sincronizados": 0,
@@ -471,50 +533,36 @@ def re_sincronizar_registros(request: Request, db: Session = Depends(get_db)):
             }
 
         registros = _asignar_tipos_alternados(registros)
-
-        sincronizados = 0
-        sin_personal = 0
-        duplicados = 0
-        for reg in registros:
-            if reg["tipo_auto"] == "duplicado":
-                duplicados += 1
-                continue
-
-            user_id_int = int(reg["user_id"]) if reg["user_id"] else None
-            personal = db.query(Personal).filter(
-                Personal.user_id == user_id_int
-            ).first()
-
-            if not personal:
-                sin_personal += 1
-                continue
-
-            nueva_asistencia = Asistencia(
-                personal_id=personal.id,
-                user_id=user_id_int,
-                tipo=reg["tipo_auto"],
-                fecha_hora=reg["timestamp"],
-                dispositivo_ip=zkteco_service.ip,
-                sincronizado="S",
-                fecha_sincronizacion=datetime.now(timezone.utc),
-            )
-            db.add(nueva_asistencia)
-            sincronizados += 1
-
-        db.commit()
-        logger.info(f"Re-sincronización: {sincronizados} registros, {duplicados} duplicados filtrados")
-
-        return {
-            "eliminados": eliminados,
-            "total_sincronizados": sincronizados,
-            "total_registros": len(registros),
-            "duplicados_filtrados": duplicados,
-            "sin_personal_asociado": sin_personal,
-            "mensaje": f"Se eliminaron {eliminados} registros, se importaron {sincronizados} ({duplicados} duplicados filtrados)",
-        }
+        encolados, duplicados = _encolar_en_spool(registros)
     except (ConnectionError, OSError, socket.error) as e:
         raise HTTPException(status_code=503, detail=f"Dispositivo no disponible: {e}")
     except Exception as e:
         db.rollback()
         logger.error(f"Error en re-sincronización: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+    try:
+        resultado = spool_ingesta.reproducir(db)
+    except Exception as e:
+        broker_eventos.recarga_completa()  # lo eliminado ya no esta
+        if not es_caida_bd(e):
+            db.rollback()
+            logger.error(f"Error en re-sincronización al cargar el spool: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+        return _respuesta_spool_pendiente(db, e, len(registros), encolados,
+                                          eliminados=eliminados, duplicados_filtrados=duplicados)
+
+    sincronizados, sin_personal = resultado["insertados"], resultado["sin_personal"]
+    broker_eventos.recarga_completa()
+    _contar_sync_registros(sincronizados, duplicados, sin_personal)
+    logger.info(f"Re-sincronización: {sincronizados} registros, {duplicados} duplicados filtrados")
+
+    return {
+        "eliminados": eliminados,
+        "total_sincronizados": sincronizados,
+        "total_registros": len(registros),
+        "duplicados_filtrados": duplicados,
+        "sin_personal_asociado": sin_personal,
+        "rechazados": resultado["rechazados"],
+        "mensaje": f"Se eliminaron {eliminados} registros, se importaron {sincronizados} ({duplicados} duplicados filtrados)",
+    }
@@ -0,0 +1,255 @@
+"""
+Empaquetado del frontend sin paso de build: al arrancar concatena y minifica el CSS,
+el JS y los partials HTML, les pone un hash de contenido en el nombre y guarda
+variantes gzip/brotli ya comprimidas. index.html queda apuntando a dos bundles
+(app.<hash>.css y app.<hash>.js) que se sirven con cache inmutable; los partials
+viajan dentro del JS en vez de pedirse uno por uno.
+"""
+from pathlib import Path
+from typing import Optional
+from starlette.requests import Request
+from starlette.responses import Response
+import hashlib
+import gzip
+import json
+import re
+import threading
+import logging
+
+try:
+    import brotli
+except ImportError:  # opcional: sin brotli se sirve solo gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+CACHE_INMUTABLE = "public, max-age=31536000, immutable"
+TIPOS = {".js": "application/javascript; charset=utf-8", ".css": "text/css; charset=utf-8"}
+
+_RE_CSS = re.compile(r'\s*<link rel="stylesheet" href="/static/(css/[\w.-]+\.css)">\n?')
+_RE_JS = re.compile(r'\s*<script src="/static/(js/[\w.-]+\.js)"></script>\n?')
+_RE_ID_PARTIAL = re.compile(r"\{\s*id:\s*'([\w-]+)',\s*file:\s*'([\w-]+)'\s*\}")
+
+
+def minificar_js(codigo: str) -> str:
+    """
+    Quita comentarios, indentacion y lineas vacias respetando strings, templates y
+    regex literales. Conserva los saltos de linea (insercion automatica de ';').
+    """
+    salida = []
+    i, n = 0, len(codigo)
+    previo = ""  # ultimo caracter significativo emitido (decide si '/' abre una regex)
+    while i < n:
+        c = codigo[i]
+        if c in "'\"`":
+            j = _fin_string(codigo, i)
+            salida.append(codigo[i:j])
+            previo = c
+            i = j
+        elif c == "/" and codigo.startswith("//", i):
+            i = codigo.find("\n", i)
+            i = n if i < 0 else i
+        elif c == "/" and codigo.startswith("/*", i):
+            j = codigo.find("*/", i + 2)
+            i = n if j < 0 else j + 2
+        elif c == "/" and (previo == "" or previo in "(,=:[!&|?{};+-*%<>~^\n"):
+            j = _fin_regex(codigo, i)
+            salida.append(codigo[i:j])
+            previo = "/"
+            i = j
+        elif c in " \t\r\n":
+            j = i
+            while j < n and codigo[j] in " \t\r\n":
+                j += 1
+            if "\n" in codigo[i:j]:
+                if previo not in ("", "\n"):
+                    salida.append("\n")
+                    previo = "\n"
+            elif previo not in ("", "\n"):
+                salida.append(" ")
+            i = j
+        else:
+            salida.append(c)
+            previo = c
+            i += 1
+    return "".join(salida).strip() + "\n"
+
+
+def _fin_string(codigo: str, i: int) -> int:
+    """Indice siguiente al cierre del string/template que empieza en i"""
+    comilla = codigo[i]
+    j = i + 1
+    while j < len(codigo):
+        c = codigo[j]
+        if c == "\\":
+            j += 2
+            continue
+        if c == comilla:
+            return j + 1
+        if comilla == "`" and codigo.startswith("${", j):
+            j = _fin_interpolacion(codigo, j + 2)
+            continue
+        j += 1
+    return j
+
+
+def _fin_interpolacion(codigo: str, j: int) -> int:
+    profundidad = 1
+    while j < len(codigo) and profundidad:
+        c = codigo[j]
+        if c in "'\"`":
+            j = _fin_string(codigo, j)
+            continue
+        if c == "{":
+            profundidad += 1
+        elif c == "}":
+            profundidad -= 1
+        j += 1
+    return j
+
+
+def _fin_regex(codigo: str, i: int) -> int:
+    j, en_clase = i + 1, False
+    while j < len(codigo) and codigo[j] != "\n":
+        c = codigo[j]
+        if c == "\\":
+            j += 2
+            continue
+        if c == "[":
+            en_clase = True
+        elif c == "]":
+            en_clase = False
+        elif c == "/" and not en_clase:
+            j += 1
+            while j < len(codigo) and codigo[j].isalpha():  # flags
+                j += 1
+            return j
+        j += 1
+    return j
+
+
+def minificar_css(codigo: str) -> str:
+    codigo = re.sub(r"/\*.*?\*/", "", codigo, flags=re.S)
+    codigo = re.sub(r"\s+", " ", codigo)
+    codigo = re.sub(r"\s*([{};,>])\s*", r"\1", codigo)
+    return codigo.replace(";}", "}").strip() + "\n"
+
+
+def minificar_html(codigo: str) -> str:
+    """Solo indentacion y lineas vacias: colapsar espacios entre tags cambia el layout inline"""
+    return "\n".join(l.strip() for l in codigo.splitlines() if l.strip()) + "\n"
+
+
+def _reemplazar_tags(patron: re.Pattern, html: str, tag: str) -> str:
+    """El primer tag que coincide pasa a ser `tag` (mismo lugar en el documento); el resto se quita"""
+    primero = patron.search(html)
+    if primero is None:
+        return html
+    resto = patron.sub("", html[primero.end():])
+    return f"{html[:primero.start()]}\n{tag}\n{resto}"
+
+
+class Recurso:
+    """Contenido servible con sus variantes comprimidas"""
+    __slots__ = ("contenido", "tipo", "etag", "variantes")
+
+    def __init__(self, contenido: bytes, tipo: str):
+        self.contenido = contenido
+        self.tipo = tipo
+        self.etag = f'"{hashlib.sha256(contenido).hexdigest()[:16]}"'
+        self.variantes = {"gzip": gzip.compress(contenido, 9, mtime=0)}
+        if brotli is not None:
+            self.variantes["br"] = brotli.compress(contenido, quality=11)
+
+    def respuesta(self, request: Request, cache_control: str) -> Response:
+        """304 si el cliente ya lo tiene; si no, la variante comprimida que acepte"""
+        headers = {"ETag": self.etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if self.etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
+        cuerpo, codificacion = self.elegir(request.headers.get("accept-encoding", ""))
+        if codificacion:
+            headers["Content-Encoding"] = codificacion
+        return Response(cuerpo, media_type=self.tipo, headers=headers)
+
+    def elegir(self, accept_encoding: str) -> tuple[bytes, Optional[str]]:
+        """Variante mas chica que acepta el cliente: (cuerpo, content-encoding o None)"""
+        aceptadas = {p.split(";")[0].strip() for p in accept_encoding.lower().split(",")}
+        for codificacion in ("br", "gzip"):
+            if codificacion in aceptadas and codificacion in self.variantes:
+                return self.variantes[codificacion], codificacion
+        return self.contenido, None
+
+
+class Assets:
+    """Bundles del frontend, construidos una vez por proceso"""
+
+    def __init__(self, directorio: Path):
+        self.directorio = directorio
+        self.index: Optional[Recurso] = None
+        self.bundles: dict[str, Recurso] = {}
+        self.stats_build: dict = {}
+        self._lock = threading.Lock()
+
+    def construir(self) -> bool:
+        """Arma index y bundles; False si no hay frontend (la app sirve la API igual)"""
+        with self._lock:
+            index_path = self.directorio / "index.html"
+            if not index_path.exists():
+                return False
+            html = index_path.read_text(encoding="utf-8")
+            archivos_css = _RE_CSS.findall(html)
+            archivos_js = _RE_JS.findall(html)
+
+            css = "".join(minificar_css(self._leer(f)) for f in archivos_css)
+            js = self._prefijo_partials() + "".join(
+                f";{minificar_js(self._leer(f))}" for f in archivos_js
+            )
+            bundles = {}
+            nombre_css = self._agregar(bundles, "app", ".css", css)
+            nombre_js = self._agregar(bundles, "app", ".js", js)
+
+            html = _reemplazar_tags(_RE_CSS, html, f'<link rel="stylesheet" href="/assets/{nombre_css}">')
+            html = _reemplazar_tags(_RE_JS, html, f'<script src="/assets/{nombre_js}"></script>')
+            self.bundles = bundles
+            self.index = Recurso(minificar_html(html).encode(), "text/html; charset=utf-8")
+            self.stats_build = {
+                "archivos": len(archivos_css) + len(archivos_js) + len(self._partials()),
+                "bundles": sorted(bundles),
+                "bytes": {n: len(r.contenido) for n, r in bundles.items()},
+                "bytes_gzip": {n: len(r.variantes["gzip"]) for n, r in bundles.items()},
+            }
+            logger.info(f"Frontend empaquetado: {self.stats_build['bundles']}")
+            return True
+
+    def obtener(self, nombre: str) -> Optional[Recurso]:
+        return self.bundles.get(nombre)
+
+    def _leer(self, relativo: str) -> str:
+        return (self.directorio / relativo).read_text(encoding="utf-8")
+
+    def _partials(self) -> dict[str, str]:
+        """{id del contenedor: archivo} segun la lista de cargarPartials() en app.js"""
+        app_js = self.directorio / "js" / "app.js"
+        if not app_js.exists():
+            return {}
+        return dict(_RE_ID_PARTIAL.findall(app_js.read_text(encoding="utf-8")))
+
+    def _prefijo_partials(self) -> str:
+        partials = {}
+        for archivo in self._partials().values():
+            ruta = self.directorio / "partials" / f"{archivo}.html"
+            if ruta.exists():
+                partials[archivo] = minificar_html(ruta.read_text(encoding="utf-8"))
+        # app.js usa estos en vez de pedir /static/partials/*.html
+        return f"window.PARTIALS_EMPAQUETADOS={json.dumps(partials, ensure_ascii=False)};\n"
+
+    @staticmethod
+    def _agregar(bundles: dict, base: str, extension: str, texto: str) -> str:
+        contenido = texto.encode("utf-8")
+        nombre = f"{base}.{hashlib.sha256(contenido).hexdigest()[:12]}{extension}"
+        bundles[nombre] = Recurso(contenido, TIPOS[extension])
+        return nombre
+
+
+# Instancia global (frontend/ queda junto a backend/)
+assets = Assets(Path(__file__).resolve().parents[3] / "frontend")
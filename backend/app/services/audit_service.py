@@ -0,0 +1,166 @@
+"""
+Escritor del audit log en segundo plano.
+Las rutas encolan entradas y un hilo las inserta por lotes (por tamaño o intervalo),
+fuera del request y con una sola transaccion por lote.
+"""
+from sqlalchemy import insert
+from app.models.auditlog import AuditLog
+from datetime import datetime
+import threading
+import logging
+import queue
+import time
+
+logger = logging.getLogger(__name__)
+
+# Marcadores de control para el hilo escritor
+_VACIAR = object()
+_DETENER = object()
+
+
+class AuditService:
+    """Cola acotada + escritor por lotes para el audit log"""
+
+    def __init__(self, max_cola: int = 10000, tam_lote: int = 200,
+                 intervalo: float = 1.0, timeout_encolar: float = 0.05):
+        self.max_cola = max_cola
+        self.tam_lote = tam_lote
+        self.intervalo = intervalo
+        self.timeout_encolar = timeout_encolar
+        self.session_factory = None  # None = SessionLocal de la app
+        self._cola: queue.Queue = queue.Queue(maxsize=max_cola)
+        self._hilo = None
+        self._lock_hilo = threading.Lock()
+        # Los contadores se actualizan desde los requests y desde el hilo escritor
+        self._lock_stats = threading.Lock()
+        self.escritos = 0
+        self.descartados = 0
+        self.fallidos = 0
+
+    def registrar(self, accion: str, entidad: str, entidad_id: int = None,
+                  detalle: str = None, usuario: str = None, ip: str = None):
+        """
+        Encola una entrada. Nunca lanza excepcion: si la cola sigue llena tras
+        `timeout_encolar` segundos la entrada se descarta y se cuenta.
+        """
+        self._asegurar_hilo()
+        entrada = {
+            "accion": accion,
+            "entidad": entidad,
+            "entidad_id": entidad_id,
+            "detalle": detalle,
+            "usuario": usuario,
+            "ip": ip,
+            "fecha": datetime.utcnow(),
+        }
+        try:
+            self._cola.put(entrada, timeout=self.timeout_encolar)
+        except queue.Full:
+            self._contar("descartados", 1)
+            logger.warning(f"Audit log: cola llena ({self.max_cola}), entrada '{accion}' descartada")
+
+    def flush(self):
+        """Escribe de inmediato todo lo pendiente en la cola (bloqueante)"""
+        if self._hilo is not None and self._hilo.is_alive():
+            self._cola.put(_VACIAR)
+            self._cola.join()
+        else:
+            self._escribir_pendientes()
+
+    def detener(self, timeout: float = 5.0):
+        """Detiene el hilo escritor y vacia la cola (llamar al apagar la app)"""
+        if self._hilo is not None and self._hilo.is_alive():
+            self._cola.put(_DETENER)
+            self._hilo.join(timeout)
+        self._hilo = None
+        self._escribir_pendientes()
+
+    def stats(self) -> dict:
+        with self._lock_stats:
+            return {
+                "pendientes": self._cola.qsize(),
+                "escritos": self.escritos,
+                "descartados": self.descartados,
+                "fallidos": self.fallidos,
+            }
+
+    def _contar(self, campo: str, cantidad: int):
+        with self._lock_stats:
+            setattr(self, campo, getattr(self, campo) + cantidad)
+
+    def _asegurar_hilo(self):
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        with self._lock_hilo:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._bucle, name="audit-writer", daemon=True)
+                self._hilo.start()
+
+    def _bucle(self):
+        lote = []
+        limite = 0.0
+        while True:
+            espera = self.intervalo if not lote else max(0.0, limite - time.monotonic())
+            try:
+                item = self._cola.get(timeout=espera)
+            except queue.Empty:
+                item = None
+            es_control = item is _VACIAR or item is _DETENER
+
+            if item is not None and not es_control:
+                if not lote:
+                    limite = time.monotonic() + self.intervalo
+                lote.append(item)
+
+            # Escribir al completar el lote, al vencer el intervalo o si lo piden
+            if lote and (item is None or es_control or len(lote) >= self.tam_lote):
+                self._escribir(lote)
+                for _ in lote:
+                    self._cola.task_done()
+                lote = []
+
+            if es_control:
+                self._cola.task_done()
+                if item is _DETENER:
+                    return
+
+    def _escribir_pendientes(self):
+        while True:
+            lote = []
+            while len(lote) < self.tam_lote:
+                try:
+                    item = self._cola.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _VACIAR or item is _DETENER:
+                    self._cola.task_done()
+                    continue
+                lote.append(item)
+            if not lote:
+                return
+            self._escribir(lote)
+            for _ in lote:
+                self._cola.task_done()
+
+    def _escribir(self, lote: list):
+        if self.session_factory is None:
+            from app.database.db import SessionLocal
+            self.session_factory = SessionLocal
+        db = None
+        try:
+            db = self.session_factory()
+            db.execute(insert(AuditLog), lote)
+            db.commit()
+            self._contar("escritos", len(lote))
+        except Exception as e:
+            if db is not None:
+                db.rollback()
+            self._contar("fallidos", len(lote))
+            logger.error(f"Audit log: fallo al escribir lote de {len(lote)} entradas: {e}")
+        finally:
+            if db is not None:
+                db.close()
+
+
+# Instancia global del servicio
+audit_service = AuditService()
@@ -0,0 +1,84 @@
+"""
+Tokens CSRF sin estado: timestamp + nonce firmados con HMAC-SHA256.
+Cualquier worker o replica con el mismo SECRET_KEY los valida sin memoria compartida.
+"""
+from app.config import settings
+from collections import OrderedDict
+from typing import Optional
+import hashlib
+import hmac
+import logging
+import secrets
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CsrfService:
+    """Genera y verifica tokens CSRF firmados, con revocacion opcional acotada"""
+
+    def __init__(self, secreto: str = "", max_edad: int = 3600 * 8, max_revocados: int = 10000):
+        if not secreto:
+            secreto = secrets.token_hex(32)
+            logger.warning("SECRET_KEY no configurado: tokens CSRF validos solo en este proceso")
+        self._clave = secreto.encode()
+        self.max_edad = max_edad
+        self.max_revocados = max_revocados
+        self._revocados: OrderedDict[str, int] = OrderedDict()  # firma -> timestamp del token
+        self._lock = threading.Lock()
+
+    def generar(self) -> str:
+        ts = f"{int(time.time()):x}"
+        nonce = secrets.token_hex(8)
+        return f"{ts}.{nonce}.{self._firmar(ts, nonce)}"
+
+    def verificar(self, token: str) -> Optional[str]:
+        """Retorna None si el token es valido, o el motivo del rechazo"""
+        # Un token legitimo es ASCII; compare_digest no admite str con otros caracteres
+        if not token.isascii():
+            return "CSRF token invalido o faltante"
+        try:
+            ts, nonce, firma = token.split(".")
+            emitido = int(ts, 16)
+        except ValueError:
+            return "CSRF token invalido o faltante"
+        if not hmac.compare_digest(firma, self._firmar(ts, nonce)):
+            return "CSRF token invalido o faltante"
+        edad = time.time() - emitido
+        if edad > self.max_edad or edad < -60:
+            return "CSRF token expirado"
+        if self._revocados and firma in self._revocados:
+            return "CSRF token revocado"
+        return None
+
+    def revocar(self, token: str) -> bool:
+        """
+        Invalida un token antes de su expiracion. La lista se acota a max_revocados: si
+        esta llena de tokens aun vigentes la revocacion se rechaza (retorna False) en vez
+        de descartar revocaciones anteriores, que volverian a ser validas.
+        """
+        if not token.isascii():
+            return False
+        try:
+            ts, _, firma = token.split(".")
+            emitido = int(ts, 16)
+        except ValueError:
+            return False
+        with self._lock:
+            # Los tokens expirados ya no necesitan estar en la lista
+            limite = time.time() - self.max_edad
+            while self._revocados and next(iter(self._revocados.values())) < limite:
+                self._revocados.popitem(last=False)
+            if firma not in self._revocados and len(self._revocados) >= self.max_revocados:
+                logger.warning(f"Lista de tokens CSRF revocados llena ({self.max_revocados}): revocacion rechazada")
+                return False
+            self._revocados[firma] = emitido
+            return True
+
+    def _firmar(self, ts: str, nonce: str) -> str:
+        return hmac.new(self._clave, f"csrf.{ts}.{nonce}".encode(), hashlib.sha256).hexdigest()
+
+
+# Instancia global del servicio
+csrf_service = CsrfService(settings.secret_key)
@@ -0,0 +1,199 @@
+"""
+Estado de runtime compartido entre workers y replicas (tabla estado_runtime).
+Cada clave tiene un valor JSON y una version que sube en cada escritura. Cada
+worker guarda una copia local y la refresca cada `intervalo` segundos con una
+consulta de solo (clave, version); los valores se leen solo si cambiaron y los
+callbacks registrados aplican el cambio (config del dispositivo, invalidar caches).
+Las invalidaciones (`tocar`) no escriben en el request: se marcan en memoria y las
+publica el hilo de refresco, asi no serializan las escrituras sobre una misma fila.
+"""
+from sqlalchemy.exc import IntegrityError
+from app.models.estado_runtime import EstadoRuntime
+from app.config import settings
+from typing import Any, Callable
+import threading
+import logging
+import json
+
+logger = logging.getLogger(__name__)
+
+
+class EstadoCompartido:
+    """Cache local versionado de la tabla estado_runtime"""
+
+    def __init__(self, intervalo: float = 2.0):
+        self.intervalo = intervalo
+        self.session_factory = None  # None = SessionLocal de la app
+        self._valores: dict[str, Any] = {}
+        self._versiones: dict[str, int] = {}
+        self._callbacks: dict[str, list[Callable[[Any], None]]] = {}
+        self._callbacks_perdidos: dict[str, list[Callable[[], None]]] = {}
+        self._por_publicar: set[str] = set()  # claves tocadas, pendientes de subir version
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._detener = threading.Event()
+        self.refrescos = 0
+        self.cambios_remotos = 0
+
+    def al_cambiar(self, clave: str, callback: Callable[[Any], None]):
+        """Registra una funcion que recibe el valor nuevo cuando otro worker cambia la clave"""
+        self._callbacks.setdefault(clave, []).append(callback)
+
+    def al_perder_cambios(self, clave: str, callback: Callable[[], None]):
+        """
+        Para claves cuyo valor es un aviso y no el estado completo: si la version salto
+        mas de uno desde lo ultimo visto (un aviso intermedio se sobreescribio antes de
+        leerlo) se llama a esta funcion en vez de los callbacks de al_cambiar.
+        """
+        self._callbacks_perdidos.setdefault(clave, []).append(callback)
+
+    def obtener(self, clave: str, defecto: Any = None) -> Any:
+        """Valor cacheado localmente (sin consultar la BD)"""
+        return self._valores.get(clave, defecto)
+
+    def guardar(self, clave: str, valor: Any = None) -> int:
+        """Escribe la clave subiendo su version; retorna la version nueva"""
+        db = self._sesion()
+        try:
+            for intento in range(2):  # reintento si otro worker inserto la misma clave a la vez
+                try:
+                    fila = db.query(EstadoRuntime).filter(
+                        EstadoRuntime.clave == clave
+                    ).with_for_update().first()
+                    texto = json.dumps(valor) if valor is not None else None
+                    previa = fila.version if fila is not None else 0
+                    if fila is None:
+                        fila = EstadoRuntime(clave=clave, valor=texto, version=1)
+                        db.add(fila)
+                    else:
+                        fila.valor = texto
+                        fila.version += 1
+                    db.commit()
+                    break
+                except IntegrityError:
+                    db.rollback()
+                    if intento:
+                        raise
+            version = fila.version
+        finally:
+            db.close()
+        # La escritura propia no debe dispararse como cambio remoto en el proximo refresco
+        with self._lock:
+            conocida = self._versiones.get(clave)
+            self._valores[clave] = valor
+            self._versiones[clave] = version
+        if conocida is not None and previa > conocida:
+            # Habia cambios remotos sin leer: esta escritura los tapa
+            self._avisar_perdidos(clave)
+        return version
+
+    def tocar(self, clave: str):
+        """
+        Senal de invalidacion sin valor: se marca en memoria y el proximo refresco sube la
+        version en la BD (los demas workers la ven a lo sumo un intervalo despues).
+        """
+        with self._lock:
+            self._por_publicar.add(clave)
+
+    def publicar_pendientes(self):
+        """Sube la version de las claves tocadas; nunca lanza excepcion (reintenta en el proximo)"""
+        with self._lock:
+            claves, self._por_publicar = self._por_publicar, set()
+        for clave in sorted(claves):
+            try:
+                self.guardar(clave)
+            except Exception as e:
+                logger.warning(f"Estado compartido: no se pudo publicar '{clave}': {e}")
+                with self._lock:
+                    self._por_publicar.add(clave)
+
+    def refrescar(self) -> list[str]:
+        """
+        Publica las claves tocadas y trae los cambios hechos por otros workers; retorna las
+        claves que cambiaron
+        """
+        self.publicar_pendientes()
+        db = self._sesion()
+        try:
+            versiones = dict(db.query(EstadoRuntime.clave, EstadoRuntime.version).all())
+            cambiadas = [c for c, v in versiones.items() if self._versiones.get(c) != v]
+            filas = []
+            if cambiadas:
+                filas = db.query(EstadoRuntime.clave, EstadoRuntime.valor, EstadoRuntime.version).filter(
+                    EstadoRuntime.clave.in_(cambiadas)
+                ).all()
+        finally:
+            db.close()
+        self.refrescos += 1
+        with self._lock:
+            # Claves borradas de la tabla: olvidar la version para detectar una recreacion
+            for clave in [c for c in self._versiones if c not in versiones]:
+                self._versiones.pop(clave, None)
+                self._valores.pop(clave, None)
+
+        aplicadas = []
+        for clave, texto, version in filas:
+            valor = json.loads(texto) if texto is not None else None
+            with self._lock:
+                anterior = self._versiones.get(clave)
+                self._valores[clave] = valor
+                self._versiones[clave] = version
+            aplicadas.append(clave)
+            if anterior is not None:
+                self.cambios_remotos += 1
+                if version - anterior > 1 and clave in self._callbacks_perdidos:
+                    self._avisar_perdidos(clave)
+                    continue
+            for callback in self._callbacks.get(clave, []):
+                try:
+                    callback(valor)
+                except Exception as e:
+                    logger.error(f"Estado compartido: fallo al aplicar '{clave}': {e}")
+        return aplicadas
+
+    def _avisar_perdidos(self, clave: str):
+        for callback in self._callbacks_perdidos.get(clave, []):
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Estado compartido: fallo al aplicar cambios perdidos de '{clave}': {e}")
+
+    def iniciar(self):
+        """Arranca el hilo que refresca cada `intervalo` segundos (llamar al arrancar la app)"""
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle, name="estado-compartido", daemon=True)
+        self._hilo.start()
+
+    def detener(self, timeout: float = 5.0):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+        self._hilo = None
+        self.publicar_pendientes()  # invalidaciones de ultimo momento
+
+    def stats(self) -> dict:
+        return {
+            "claves": dict(self._versiones),
+            "intervalo": self.intervalo,
+            "refrescos": self.refrescos,
+            "cambios_remotos": self.cambios_remotos,
+        }
+
+    def _bucle(self):
+        while not self._detener.wait(self.intervalo):
+            try:
+                self.refrescar()
+            except Exception as e:
+                logger.warning(f"Estado compartido: fallo al refrescar: {e}")
+
+    def _sesion(self):
+        if self.session_factory is None:
+            from app.database.db import SessionLocal
+            self.session_factory = SessionLocal
+        return self.session_factory()
+
+
+# Instancia global del servicio
+estado_compartido = EstadoCompartido(settings.estado_refresco_segundos)
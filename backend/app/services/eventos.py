@@ -0,0 +1,283 @@
+"""
+Eventos en vivo (Server-Sent Events) para el dashboard y las vistas de asistencia.
+La ingesta (sincronizacion con el dispositivo, asistencia manual) publica despues del
+commit los marcajes nuevos y el resumen de los dias afectados; cada navegador tiene
+una cola acotada y recibe un heartbeat periodico. Si un cliente lento llena su cola
+se descarta lo pendiente y se le envia `resync` para que recargue la vista completa.
+
+Entre workers: la ingesta guarda en el estado compartido (clave "asistencia") el rango
+de ids insertados o los dias editados; los otros workers leen esas filas y las
+difunden a sus propios clientes. Si entre dos refrescos llego mas de un aviso (la clave
+guarda solo el ultimo) los clientes reciben `resync`.
+"""
+from app.config import settings
+from app.models.asistencia import Asistencia
+from app.services.estado_compartido import estado_compartido
+from app.services.metrics import metricas
+from sqlalchemy import case, func, select
+from datetime import date, datetime, timedelta
+from typing import AsyncIterator, Iterable, Optional
+import itertools
+import threading
+import asyncio
+import logging
+import json
+
+logger = logging.getLogger(__name__)
+
+CLAVE_ESTADO = "asistencia"
+FILAS_POR_EVENTO = 200  # marcajes por evento `asistencia` (una sincronizacion puede traer miles)
+MAX_FILAS_REMOTAS = 5000  # tope por aviso de otro worker; si hay mas, los clientes reciben resync
+COLUMNAS_EVENTO = (Asistencia.id, Asistencia.personal_id, Asistencia.user_id, Asistencia.tipo,
+                   Asistencia.fecha_hora, Asistencia.dispositivo_ip)
+
+
+def fila_evento(asistencia) -> dict:
+    """Marcaje (modelo o fila de COLUMNAS_EVENTO) -> datos del evento"""
+    return {
+        "id": asistencia.id,
+        "personal_id": asistencia.personal_id,
+        "user_id": asistencia.user_id,
+        "tipo": asistencia.tipo,
+        "fecha_hora": asistencia.fecha_hora,
+        "dispositivo_ip": asistencia.dispositivo_ip,
+    }
+
+
+def _formatear(id_evento: int, tipo: str, datos) -> bytes:
+    texto = json.dumps(datos, default=str, ensure_ascii=False, separators=(",", ":"))
+    return f"id: {id_evento}\nevent: {tipo}\ndata: {texto}\n\n".encode()
+
+
+class ClienteEventos:
+    """Conexion SSE: cola acotada que se llena desde cualquier hilo via su event loop"""
+    __slots__ = ("cola", "loop", "desbordes")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, buffer: int):
+        self.cola: asyncio.Queue = asyncio.Queue(buffer)
+        self.loop = loop
+        self.desbordes = 0
+
+    def _encolar(self, evento: bytes, resync: bytes):
+        """Corre en el event loop del cliente"""
+        try:
+            self.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Cliente lento: lo pendiente ya no sirve, que recargue la vista completa
+            while not self.cola.empty():
+                self.cola.get_nowait()
+            self.cola.put_nowait(resync)
+            self.desbordes += 1
+
+
+class BrokerEventos:
+    """Difunde eventos a los clientes SSE conectados a este worker"""
+
+    def __init__(self, buffer: int = 256, heartbeat: float = 15.0, max_clientes: int = 200):
+        self.buffer = buffer
+        self.heartbeat = heartbeat
+        self.max_clientes = max_clientes
+        self.session_factory = None  # None = SessionLocal de la app
+        self._clientes: set[ClienteEventos] = set()
+        self._lock = threading.Lock()
+        self._secuencia = itertools.count(1)
+        self.eventos = 0
+        self.desbordes = 0
+
+    @property
+    def clientes(self) -> int:
+        return len(self._clientes)
+
+    def lleno(self) -> bool:
+        return len(self._clientes) >= self.max_clientes
+
+    def stats(self) -> dict:
+        with self._lock:
+            desbordes = self.desbordes + sum(c.desbordes for c in self._clientes)
+        return {"clientes": self.clientes, "eventos": self.eventos, "desbordes": desbordes}
+
+    def suscribir(self) -> ClienteEventos:
+        """Registra un cliente (llamar desde el event loop)"""
+        cliente = ClienteEventos(asyncio.get_running_loop(), self.buffer)
+        with self._lock:
+            self._clientes.add(cliente)
+        return cliente
+
+    def desuscribir(self, cliente: ClienteEventos):
+        with self._lock:
+            self._clientes.discard(cliente)
+            self.desbordes += cliente.desbordes
+            cliente.desbordes = 0
+
+    def publicar(self, tipo: str, datos) -> int:
+        """Encola el evento en todos los clientes (seguro desde cualquier hilo); retorna cuantos"""
+        with self._lock:
+            clientes = list(self._clientes)
+        if not clientes:
+            return 0
+        id_evento = next(self._secuencia)
+        evento = _formatear(id_evento, tipo, datos)  # se serializa una vez para todos
+        resync = _formatear(id_evento, "resync", {})
+        for cliente in clientes:
+            try:
+                cliente.loop.call_soon_threadsafe(cliente._encolar, evento, resync)
+            except RuntimeError:  # loop cerrado: el cliente ya se fue
+                self.desuscribir(cliente)
+        self.eventos += 1
+        return len(clientes)
+
+    async def flujo(self) -> AsyncIterator[bytes]:
+        """
+        Cuerpo de la respuesta SSE; se cancela cuando el cliente se desconecta. Se suscribe
+        al empezar a iterar: si el cliente se va antes, no queda una cola huerfana.
+        """
+        cliente = self.suscribir()
+        try:
+            # El primer bloque envia los headers de inmediato y fija el reintento del navegador
+            yield b"retry: 5000\n\n"
+            while True:
+                try:
+                    yield await asyncio.wait_for(cliente.cola.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"  # comentario SSE: mantiene viva la conexion en proxies
+        finally:
+            self.desuscribir(cliente)
+
+    # --- Ingesta ---
+
+    def nuevos_marcajes(self, db, filas: list[dict]):
+        """
+        Despues del commit de la ingesta: difunde aqui y avisa a los otros workers.
+        Nunca lanza excepcion (los marcajes ya estan guardados).
+        """
+        if not filas:
+            return
+        ids = [f["id"] for f in filas]
+        try:
+            self._difundir(db, filas)
+        except Exception as e:
+            logger.warning(f"Eventos: no se pudieron difundir {len(filas)} marcajes: {e}")
+        self._avisar({"desde": min(ids), "hasta": max(ids)})
+
+    def marcajes_editados(self, db, dias: Iterable[tuple[int, date]]):
+        """Dias (personal_id, fecha) reemplazados por una edicion manual; nunca lanza excepcion"""
+        dias = sorted(set(dias))
+        if not dias:
+            return
+        try:
+            self._difundir_editados(db, dias)
+        except Exception as e:
+            logger.warning(f"Eventos: no se pudo difundir la edicion de {len(dias)} dias: {e}")
+        self._avisar({"editados": [[p, f.isoformat()] for p, f in dias[:MAX_FILAS_REMOTAS]]})
+
+    def recarga_completa(self):
+        """Cambio masivo (re-sincronizacion): todos los clientes recargan su vista"""
+        self.publicar("resync", {})
+        self._avisar({"resync": True})
+
+    def _difundir(self, db, filas: list[dict]):
+        if not self._clientes:
+            return
+        for i in range(0, len(filas), FILAS_POR_EVENTO):
+            self.publicar("asistencia", {"registros": filas[i:i + FILAS_POR_EVENTO]})
+        self._publicar_resumenes(db, {f["fecha_hora"].date() for f in filas})
+
+    def _difundir_editados(self, db, dias: list[tuple[int, date]]):
+        if not self._clientes:
+            return
+        self.publicar("asistencia_editada", {
+            "dias": [{"personal_id": p, "fecha": f} for p, f in dias],
+        })
+        self._publicar_resumenes(db, {f for _, f in dias})
+
+    def _publicar_resumenes(self, db, fechas: set[date]):
+        """Un evento resumen_dia por fecha afectada (una consulta agrupada para todas)"""
+        for fecha, resumen in sorted(self.resumen_dias(db, fechas).items()):
+            self.publicar("resumen_dia", {"fecha": fecha, **resumen})
+
+    @staticmethod
+    def resumen_dias(db, fechas: set[date]) -> dict[date, dict]:
+        """{fecha: {marcajes, presentes}}; presentes = empleados con al menos una entrada"""
+        if not fechas:
+            return {}
+        dia = func.date(Asistencia.fecha_hora)
+        desde, hasta = min(fechas), max(fechas)
+        consulta = select(
+            dia,
+            func.count(),
+            func.count(func.distinct(case((Asistencia.tipo == "entrada", Asistencia.personal_id)))),
+        ).where(
+            Asistencia.fecha_hora >= datetime(desde.year, desde.month, desde.day),
+            Asistencia.fecha_hora < datetime(hasta.year, hasta.month, hasta.day) + timedelta(days=1),
+        ).group_by(dia)
+        resumen = {f: {"marcajes": 0, "presentes": 0} for f in fechas}
+        for valor, marcajes, presentes in db.execute(consulta):
+            # date() de SQLite devuelve texto; PostgreSQL devuelve date
+            fecha = valor if isinstance(valor, date) else date.fromisoformat(valor)
+            if fecha in resumen:
+                resumen[fecha] = {"marcajes": marcajes, "presentes": presentes}
+        return resumen
+
+    # --- Otros workers ---
+
+    def _avisar(self, valor: dict):
+        try:
+            estado_compartido.guardar(CLAVE_ESTADO, valor)
+        except Exception as e:
+            logger.warning(f"Eventos: no se pudo avisar a los otros workers: {e}")
+
+    def cambio_remoto(self, valor: Optional[dict]):
+        """Callback del estado compartido: otro worker ingirio o edito marcajes"""
+        if not valor:
+            return
+        if valor.get("resync"):
+            self.publicar("resync", {})
+            return
+        if not self._clientes:
+            return
+        db = self._sesion()
+        try:
+            if "editados" in valor:
+                self._difundir_editados(db, [(p, date.fromisoformat(f)) for p, f in valor["editados"]])
+                return
+            # Exactamente el rango del aviso: los ids propios pueden ser mayores que los remotos
+            filas = db.execute(
+                select(*COLUMNAS_EVENTO)
+                .where(Asistencia.id >= valor["desde"], Asistencia.id <= valor["hasta"])
+                .order_by(Asistencia.id).limit(MAX_FILAS_REMOTAS + 1)
+            ).all()
+            if len(filas) > MAX_FILAS_REMOTAS:
+                self.publicar("resync", {})
+            else:
+                self._difundir(db, [fila_evento(f) for f in filas])
+        finally:
+            db.close()
+
+    def avisos_perdidos(self):
+        """Callback del estado compartido: se sobreescribio un aviso antes de leerlo"""
+        self.publicar("resync", {})
+
+    def _sesion(self):
+        if self.session_factory is None:
+            from app.database.db import SessionLocal
+            self.session_factory = SessionLocal
+        return self.session_factory()
+
+
+# Instancia global del broker
+broker_eventos = BrokerEventos(
+    settings.eventos_buffer_cliente, settings.eventos_heartbeat_segundos, settings.eventos_max_clientes
+)
+estado_compartido.al_cambiar(CLAVE_ESTADO, broker_eventos.cambio_remoto)
+estado_compartido.al_perder_cambios(CLAVE_ESTADO, broker_eventos.avisos_perdidos)
+
+
+@metricas.colector
+def _metricas_eventos():
+    stats = broker_eventos.stats()
+    return [
+        ("sse_clientes", "gauge", "Clientes SSE conectados a este worker", [({}, stats["clientes"])]),
+        ("sse_eventos_total", "counter", "Eventos SSE publicados", [({}, stats["eventos"])]),
+        ("sse_desbordes_total", "counter", "Colas de clientes SSE desbordadas (se les envio resync)",
+         [({}, stats["desbordes"])]),
+    ]
@@ -0,0 +1,107 @@
+"""
+Lectura de archivos de importacion masiva de personal (CSV o XLSX).
+Las filas se leen de a una desde el archivo subido (sin cargarlo entero en memoria)
+y se normalizan a los campos de PersonalCreate: acepta tanto los nombres de campo
+(nombre, hora_entrada, ...) como los encabezados de /exportar-lista ("Hora Entrada").
+"""
+from typing import BinaryIO, Iterator
+from datetime import date, datetime
+import unicodedata
+import codecs
+import csv
+
+CAMPOS_IMPORTABLES = {
+    "nombre", "apellido", "documento", "puesto", "turno", "hora_entrada", "hora_salida",
+    "fecha_inicio", "duracion_contrato", "dia_libre", "sueldo",
+}
+# Encabezados alternativos -> campo
+ALIAS = {"ci": "documento", "carnet": "documento", "cargo": "puesto", "inicio": "fecha_inicio"}
+# Campos con valores de un conjunto fijo: se comparan sin mayusculas ni acentos
+_VALORES_CANONICOS = {"manana": "mañana"}
+_CAMPOS_ENUM = {"puesto", "turno", "duracion_contrato", "dia_libre"}
+
+
+class ArchivoInvalido(ValueError):
+    """El archivo no se puede leer o no tiene los encabezados requeridos"""
+
+
+def _sin_acentos(texto: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c))
+
+
+def _campo(encabezado) -> str:
+    nombre = _sin_acentos(str(encabezado or "")).strip().lower().replace(" ", "_")
+    return ALIAS.get(nombre, nombre)
+
+
+def _valor(campo: str, valor):
+    """Celda -> valor para PersonalCreate (None = vacia, usa el default del schema)"""
+    if valor is None:
+        return None
+    if isinstance(valor, datetime):
+        return valor.date() if campo == "fecha_inicio" else valor.strftime("%H:%M")
+    if isinstance(valor, date):
+        return valor
+    if isinstance(valor, float) and campo == "documento" and valor.is_integer():
+        valor = int(valor)  # Excel guarda el CI como numero
+    texto = str(valor).strip()
+    if not texto:
+        return None
+    if campo in _CAMPOS_ENUM:
+        texto = _sin_acentos(texto).lower()
+        return _VALORES_CANONICOS.get(texto, texto)
+    return texto
+
+
+def _filas(encabezados, filas: Iterator) -> Iterator[tuple[int, dict]]:
+    campos = [_campo(e) for e in encabezados]
+    faltantes = {"nombre", "apellido", "documento"} - set(campos)
+    if faltantes:
+        raise ArchivoInvalido(f"Faltan columnas requeridas: {', '.join(sorted(faltantes))}")
+    for numero, fila in enumerate(filas, start=2):  # la fila 1 son los encabezados
+        datos = {}
+        for campo, valor in zip(campos, fila):
+            if campo in CAMPOS_IMPORTABLES:
+                valor = _valor(campo, valor)
+                if valor is not None:
+                    datos[campo] = valor
+        if datos:  # filas completamente vacias se ignoran
+            yield numero, datos
+
+
+def leer_csv(archivo: BinaryIO) -> Iterator[tuple[int, dict]]:
+    """(numero de fila, datos) por cada fila; detecta ',' o ';' como separador"""
+    texto = codecs.getreader("utf-8-sig")(archivo, errors="replace")
+    primera = texto.readline()
+    if not primera.strip():
+        raise ArchivoInvalido("El archivo esta vacio")
+    separador = ";" if primera.count(";") > primera.count(",") else ","
+    encabezados = next(csv.reader([primera], delimiter=separador))
+    yield from _filas(encabezados, csv.reader(texto, delimiter=separador))
+
+
+def leer_xlsx(archivo: BinaryIO) -> Iterator[tuple[int, dict]]:
+    """Primera hoja del libro en modo solo lectura (openpyxl la recorre sin cargarla)"""
+    from openpyxl import load_workbook
+    try:
+        libro = load_workbook(archivo, read_only=True, data_only=True)
+    except Exception as e:
+        raise ArchivoInvalido(f"No es un archivo Excel valido: {e}")
+    try:
+        filas = libro.active.iter_rows(values_only=True)
+        encabezados = next(filas, None)
+        if encabezados is None:
+            raise ArchivoInvalido("El archivo esta vacio")
+        yield from _filas(encabezados, filas)
+    finally:
+        libro.close()
+
+
+def leer_archivo(archivo: BinaryIO, nombre: str) -> Iterator[tuple[int, dict]]:
+    """Elige el lector por extension (.csv o .xlsx)"""
+    extension = nombre.lower().rsplit(".", 1)[-1] if "." in nombre else ""
+    if extension == "csv":
+        return leer_csv(archivo)
+    if extension == "xlsx":
+        return leer_xlsx(archivo)
+    raise ArchivoInvalido("Formato no soportado: usar .csv o .xlsx")
@@ -0,0 +1,198 @@
+"""
+Metricas en formato de exposicion de texto de Prometheus (version 0.0.4).
+Contadores e histogramas en memoria del proceso, mas colectores que leen gauges
+(pool de BD, caches) solo al momento del scrape. Sin dependencias externas.
+"""
+from contextlib import contextmanager
+from typing import Callable, Iterable
+import bisect
+import threading
+import time
+
+# Limites superiores (segundos) por defecto de los histogramas de latencia
+BUCKETS_DEFECTO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _etiquetas(nombres: tuple, valores: tuple, extra: str = "") -> str:
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+def _numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+
+class Contador:
+    """Valor monotono por combinacion de etiquetas"""
+    tipo = "counter"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: tuple = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self._valores: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, cantidad: float = 1, **etiquetas):
+        clave = tuple(etiquetas.get(n, "") for n in self.etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+    def valor(self, **etiquetas) -> float:
+        return self._valores.get(tuple(etiquetas.get(n, "") for n in self.etiquetas), 0)
+
+    def lineas(self) -> Iterable[str]:
+        with self._lock:
+            valores = list(self._valores.items())
+        for clave, valor in valores:
+            yield f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}"
+
+
+class Histograma:
+    """Buckets acumulativos + suma + conteo por combinacion de etiquetas"""
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: tuple = (), buckets: tuple = BUCKETS_DEFECTO):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.buckets = tuple(sorted(buckets))
+        # {etiquetas: [conteos por bucket (no acumulados)..., suma, total]}
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, **etiquetas):
+        clave = tuple(etiquetas.get(n, "") for n in self.etiquetas)
+        # Bucket exclusivo; se acumula al exponer para que observar sea O(log n)
+        indice = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            serie[indice] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    @contextmanager
+    def medir(self, **etiquetas):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **etiquetas)
+
+    def conteo(self, **etiquetas) -> int:
+        serie = self._series.get(tuple(etiquetas.get(n, "") for n in self.etiquetas))
+        return serie[-1] if serie else 0
+
+    def lineas(self) -> Iterable[str]:
+        with self._lock:
+            series = [(clave, list(serie)) for clave, serie in self._series.items()]
+        for clave, serie in series:
+            acumulado = 0
+            for limite, conteo in zip(self.buckets + (float("inf"),), serie):
+                acumulado += conteo
+                le = f'le="{_numero(limite)}"'
+                yield f"{self.nombre}_bucket{_etiquetas(self.etiquetas, clave, le)} {acumulado}"
+            yield f"{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {_numero(serie[-2])}"
+            yield f"{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {serie[-1]}"
+
+
+class RegistroMetricas:
+    """Registro de metricas del proceso y colectores de gauges"""
+
+    def __init__(self):
+        self._metricas: dict[str, object] = {}
+        # Colectores: funcion -> iterable de (nombre, tipo, ayuda, [(etiquetas_dict, valor)])
+        self._colectores: list[Callable] = []
+        self._lock = threading.Lock()
+
+    def contador(self, nombre: str, ayuda: str, etiquetas: tuple = ()) -> Contador:
+        return self._registrar(Contador(nombre, ayuda, etiquetas))
+
+    def histograma(self, nombre: str, ayuda: str, etiquetas: tuple = (),
+                   buckets: tuple = BUCKETS_DEFECTO) -> Histograma:
+        return self._registrar(Histograma(nombre, ayuda, etiquetas, buckets))
+
+    def colector(self, funcion: Callable) -> Callable:
+        """Registra una funcion que produce gauges al momento del scrape (usable como decorador)"""
+        with self._lock:
+            self._colectores.append(funcion)
+        return funcion
+
+    def exponer(self) -> str:
+        lineas = []
+        for metrica in list(self._metricas.values()):
+            lineas.append(f"# HELP {metrica.nombre} {metrica.ayuda}")
+            lineas.append(f"# TYPE {metrica.nombre} {metrica.tipo}")
+            lineas.extend(metrica.lineas())
+        # Varias fuentes pueden aportar muestras a la misma familia (ej. cache_hits_total);
+        # el formato exige HELP/TYPE una vez y las muestras contiguas
+        familias: dict[str, tuple[str, str, list]] = {}
+        for colector in list(self._colectores):
+            try:
+                aportes = list(colector())
+            except Exception as e:
+                lineas.append(f"# colector {colector.__name__} fallo: {_escapar(e)}")
+                continue
+            for nombre, tipo, ayuda, muestras in aportes:
+                familias.setdefault(nombre, (tipo, ayuda, []))[2].extend(muestras)
+        for nombre, (tipo, ayuda, muestras) in familias.items():
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+            for etiquetas, valor in muestras:
+                if valor is None:
+                    continue
+                lineas.append(f"{nombre}{_etiquetas(tuple(etiquetas), tuple(etiquetas.values()))} {_numero(valor)}")
+        return "\n".join(lineas) + "\n"
+
+    def _registrar(self, metrica):
+        with self._lock:
+            existente = self._metricas.get(metrica.nombre)
+            if existente is not None:
+                return existente
+            self._metricas[metrica.nombre] = metrica
+            return metrica
+
+
+# Registro global y metricas compartidas por la app
+metricas = RegistroMetricas()
+
+http_duracion = metricas.histograma(
+    "http_request_duration_seconds", "Latencia de requests HTTP por ruta", ("method", "route"),
+)
+http_requests = metricas.contador(
+    "http_requests_total", "Requests HTTP por ruta y status", ("method", "route", "status"),
+)
+db_pool_espera = metricas.histograma(
+    "db_pool_wait_seconds", "Tiempo esperando una conexion del pool de SQLAlchemy", ("engine",),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+db_pool_retencion = metricas.histograma(
+    "db_pool_checkout_seconds", "Tiempo que una conexion queda fuera del pool (checkout a checkin)",
+    ("engine",), buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+db_lecturas = metricas.contador(
+    "db_read_routing_total", "Sesiones de solo lectura por destino (replica/primaria) y motivo",
+    ("destino", "motivo"),
+)
+zkteco_duracion = metricas.histograma(
+    "zkteco_operation_duration_seconds", "Duracion de operaciones con el dispositivo por fase",
+    ("operacion", "fase"), buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+sync_filas = metricas.contador(
+    "zkteco_sync_rows_total", "Filas procesadas en sincronizaciones con el dispositivo",
+    ("tipo", "resultado"),
+)
@@ -0,0 +1,113 @@
+"""
+Hashing de passwords fuera del threadpool compartido.
+bcrypt es lento a proposito: se ejecuta en un executor propio con concurrencia
+acotada, para que una rafaga de logins no bloquee el resto de endpoints.
+"""
+from passlib.context import CryptContext
+from app.config import settings
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
+import hmac
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+_pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# Limites superiores (segundos) del histograma de latencia
+BUCKETS_LATENCIA = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, float("inf"))
+
+
+def hash_password(password: str) -> str:
+    """Hash con bcrypt"""
+    return _pwd_context.hash(password)
+
+
+def es_bcrypt(stored_hash: str) -> bool:
+    return stored_hash.startswith("$2b$") or stored_hash.startswith("$2a$")
+
+
+def verify_password(password: str, stored_hash: str) -> bool:
+    """Verifica password. Soporta bcrypt (nuevo) y SHA-256+salt (legado)."""
+    if es_bcrypt(stored_hash):
+        return _pwd_context.verify(password, stored_hash)
+    # Legado: salt:sha256hex
+    try:
+        salt, hashed = stored_hash.split(":", 1)
+        computed = hashlib.sha256(f"{salt}{password}".encode()).hexdigest()
+        return hmac.compare_digest(computed, hashed)
+    except Exception:
+        return False
+
+
+def necesita_rehash(stored_hash: str) -> bool:
+    """True para hashes legados (SHA-256) o bcrypt con parametros obsoletos"""
+    return not es_bcrypt(stored_hash) or _pwd_context.needs_update(stored_hash)
+
+
+class SobrecargaHash(Exception):
+    """Hay demasiadas operaciones de hash en cola"""
+
+
+class PasswordService:
+    """Executor dedicado para bcrypt, con cola acotada y metricas de latencia"""
+
+    def __init__(self, max_workers: int = 2, max_pendientes: int = 32):
+        self.max_workers = max_workers
+        self.max_pendientes = max_pendientes
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self._pendientes = 0  # solo se modifica desde el event loop
+        self.rechazados = 0
+        # {operacion: {"count": n, "sum": segundos, "buckets": [n por bucket]}}
+        self._latencias: dict[str, dict] = {}
+
+    async def verificar(self, password: str, stored_hash: str) -> bool:
+        return await self._ejecutar("verificar", verify_password, password, stored_hash)
+
+    async def hash(self, password: str) -> str:
+        return await self._ejecutar("hash", hash_password, password)
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "pendientes": self._pendientes,
+            "rechazados": self.rechazados,
+            "latencia": {
+                op: {
+                    "count": d["count"],
+                    "sum_segundos": round(d["sum"], 6),
+                    "buckets": dict(zip([str(b) for b in BUCKETS_LATENCIA], d["buckets"])),
+                }
+                for op, d in self._latencias.items()
+            },
+        }
+
+    async def _ejecutar(self, operacion: str, funcion, *args):
+        if self._pendientes >= self.max_pendientes:
+            self.rechazados += 1
+            raise SobrecargaHash(f"{self._pendientes} operaciones de hash en cola")
+        self._pendientes += 1
+        try:
+            inicio = time.perf_counter()
+            resultado = await asyncio.get_running_loop().run_in_executor(self._executor, funcion, *args)
+            self._observar(operacion, time.perf_counter() - inicio)
+            return resultado
+        finally:
+            self._pendientes -= 1
+
+    def _observar(self, operacion: str, segundos: float):
+        datos = self._latencias.setdefault(
+            operacion, {"count": 0, "sum": 0.0, "buckets": [0] * len(BUCKETS_LATENCIA)}
+        )
+        datos["count"] += 1
+        datos["sum"] += segundos
+        # Buckets acumulativos (le = less or equal), como en Prometheus
+        for i, limite in enumerate(BUCKETS_LATENCIA):
+            if segundos <= limite:
+                datos["buckets"][i] += 1
+
+
+# Instancia global del servicio
+password_service = PasswordService(settings.hash_workers, settings.hash_max_pendientes)
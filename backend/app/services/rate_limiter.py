@@ -0,0 +1,142 @@
+"""
+Rate limiter de ventana deslizante (aproximada) con memoria fija por clave.
+Cada clave guarda solo (ventana, contador_actual, contador_previo); el conteo
+estimado pondera la ventana previa por la fraccion que aun se solapa.
+El backend es intercambiable: en memoria (un proceso) o tabla SQL (compartido).
+"""
+from sqlalchemy.exc import IntegrityError
+from app.models.ratelimit import RateLimitContador
+from collections import OrderedDict
+import threading
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _normalizar(ventana: int, actual: int, previo: int, ahora: int) -> tuple[int, int]:
+    """Contadores (actual, previo) vistos desde la ventana `ahora`"""
+    if ventana == ahora:
+        return actual, previo
+    if ventana == ahora - 1:
+        return 0, actual
+    return 0, 0
+
+
+class MemoriaBackend:
+    """Contadores en un OrderedDict acotado con desalojo LRU (por proceso)"""
+
+    def __init__(self, max_claves: int = 10000):
+        self.max_claves = max_claves
+        self._datos: OrderedDict[str, tuple[int, int, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave: str, ventana: int) -> tuple[int, int]:
+        with self._lock:
+            fila = self._datos.get(clave)
+            if fila is None:
+                return 0, 0
+            self._datos.move_to_end(clave)
+            return _normalizar(*fila, ventana)
+
+    def incrementar(self, clave: str, ventana: int):
+        with self._lock:
+            fila = self._datos.get(clave)
+            actual, previo = _normalizar(*fila, ventana) if fila else (0, 0)
+            self._datos[clave] = (ventana, actual + 1, previo)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_claves:
+                self._datos.popitem(last=False)
+
+    def reiniciar(self):
+        with self._lock:
+            self._datos.clear()
+
+
+class SQLBackend:
+    """Contadores en la tabla rate_limit: el limite se respeta entre workers y replicas"""
+
+    def __init__(self, session_factory=None, purgar_cada: int = 500):
+        self.session_factory = session_factory  # None = SessionLocal de la app
+        self.purgar_cada = purgar_cada
+        self._escrituras = 0
+
+    def _sesion(self):
+        if self.session_factory is None:
+            from app.database.db import SessionLocal
+            self.session_factory = SessionLocal
+        return self.session_factory()
+
+    def obtener(self, clave: str, ventana: int) -> tuple[int, int]:
+        db = self._sesion()
+        try:
+            fila = db.get(RateLimitContador, clave)
+            if fila is None:
+                return 0, 0
+            return _normalizar(fila.ventana, fila.actual, fila.previo, ventana)
+        finally:
+            db.close()
+
+    def incrementar(self, clave: str, ventana: int):
+        db = self._sesion()
+        try:
+            for _ in range(2):  # reintento si otro worker inserto la misma clave a la vez
+                try:
+                    fila = db.query(RateLimitContador).filter(
+                        RateLimitContador.clave == clave
+                    ).with_for_update().first()
+                    if fila is None:
+                        db.add(RateLimitContador(clave=clave, ventana=ventana, actual=1, previo=0))
+                    else:
+                        actual, previo = _normalizar(fila.ventana, fila.actual, fila.previo, ventana)
+                        fila.ventana, fila.actual, fila.previo = ventana, actual + 1, previo
+                    db.commit()
+                    break
+                except IntegrityError:
+                    db.rollback()
+            self._escrituras += 1
+            if self._escrituras % self.purgar_cada == 0:
+                # Claves sin actividad en las dos ultimas ventanas ya no cuentan
+                db.query(RateLimitContador).filter(RateLimitContador.ventana < ventana - 1).delete()
+                db.commit()
+        finally:
+            db.close()
+
+    def reiniciar(self):
+        db = self._sesion()
+        try:
+            db.query(RateLimitContador).delete()
+            db.commit()
+        finally:
+            db.close()
+
+
+class SlidingWindowLimiter:
+    """Permite `limite` eventos por clave en cualquier intervalo de `ventana` segundos"""
+
+    def __init__(self, limite: int, ventana: int, backend):
+        self.limite = limite
+        self.ventana = ventana
+        self.backend = backend
+
+    def excedido(self, clave: str) -> bool:
+        ahora = time.time()
+        idx = int(ahora // self.ventana)
+        actual, previo = self.backend.obtener(clave, idx)
+        solape = 1 - (ahora % self.ventana) / self.ventana
+        return actual + previo * solape >= self.limite
+
+    def registrar(self, clave: str):
+        self.backend.incrementar(clave, int(time.time() // self.ventana))
+
+    def reiniciar(self):
+        self.backend.reiniciar()
+
+
+def crear_backend(nombre: str):
+    """'memoria' (por defecto) o 'db' para compartir los contadores entre workers"""
+    if nombre == "db":
+        return SQLBackend()
+    if nombre != "memoria":
+        logger.warning(f"Backend de rate limit desconocido '{nombre}', usando memoria")
+    return MemoriaBackend()
@@ -0,0 +1,176 @@
+"""
+Cache en memoria del roster de personal para busquedas calientes.
+Mapas user_id -> id e id -> registro (horario, dia libre, nombre), cargados con una
+sola consulta y versionados: cualquier alta/edicion/baja llama a invalidar().
+"""
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.personal import Personal
+from app.services.metrics import metricas
+from app.services.estado_compartido import estado_compartido
+from typing import Optional
+import threading
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class RegistroRoster:
+    """Datos de un empleado que necesitan sync, reportes y asistencia manual"""
+    __slots__ = ("id", "user_id", "nombre", "apellido", "puesto", "turno",
+                 "hora_entrada", "hora_salida", "dia_libre", "activo")
+
+    def __init__(self, id, user_id, nombre, apellido, puesto, turno,
+                 hora_entrada, hora_salida, dia_libre, activo):
+        self.id = id
+        self.user_id = user_id
+        self.nombre = nombre
+        self.apellido = apellido
+        self.puesto = puesto
+        self.turno = turno
+        self.hora_entrada = hora_entrada
+        self.hora_salida = hora_salida
+        self.dia_libre = dia_libre
+        self.activo = activo
+
+
+_COLUMNAS = [getattr(Personal, c) for c in RegistroRoster.__slots__]
+
+
+class RosterCache:
+    """Roster completo en memoria, compartido por todos los requests del proceso"""
+
+    def __init__(self, ttl: float = 60.0, recarga_minima: float = 5.0):
+        self.ttl = ttl  # tope de antiguedad (cambios hechos por otros procesos)
+        self.recarga_minima = recarga_minima  # no recargar por ids desconocidos mas seguido que esto
+        self.version = 0
+        self._por_id: dict[int, RegistroRoster] = {}
+        self._id_por_user: dict[int, int] = {}
+        self._version_cargada = -1
+        self._cargado_en = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.cargas = 0
+
+    def invalidar(self, propagar: bool = True):
+        """Marca el roster como obsoleto; la siguiente consulta lo recarga"""
+        # Sin lock: una carga en curso guarda la version previa y queda obsoleta sola
+        self.version += 1
+        if propagar:
+            # Los demas workers lo ven en su proximo refresco del estado compartido
+            estado_compartido.tocar("roster")
+
+    def por_id(self, db: Session, personal_id: int) -> Optional[RegistroRoster]:
+        self._asegurar(db)
+        registro = self._por_id.get(personal_id)
+        if registro is None and self._recargar_si_antiguo(db):
+            registro = self._por_id.get(personal_id)
+        self._contar(registro is not None)
+        return registro
+
+    async def por_id_async(self, db: AsyncSession, personal_id: int) -> Optional[RegistroRoster]:
+        """
+        por_id para rutas async. La consulta se hace fuera del lock: un threading.Lock
+        tomado durante un await bloquearia el event loop si otra corrutina lo espera.
+        """
+        registro = self._por_id.get(personal_id) if self._vigente() else None
+        if registro is None and db.info.get("replica"):
+            # Una replica atrasada no debe instalarse como roster vigente: solo esta fila
+            fila = (await db.execute(select(*_COLUMNAS).where(Personal.id == personal_id))).first()
+            registro = RegistroRoster(*fila) if fila else None
+        elif registro is None and (not self._vigente()
+                                 or time.monotonic() - self._cargado_en >= self.recarga_minima):
+            version = self.version
+            filas = (await db.execute(select(*_COLUMNAS))).all()
+            with self._lock:
+                self._instalar(filas, version)
+            registro = self._por_id.get(personal_id)
+        self._contar(registro is not None)
+        return registro
+
+    def id_por_user_id(self, db: Session, user_id: Optional[int]) -> Optional[int]:
+        if user_id is None:
+            return None
+        self._asegurar(db)
+        personal_id = self._id_por_user.get(user_id)
+        if personal_id is None and self._recargar_si_antiguo(db):
+            personal_id = self._id_por_user.get(user_id)
+        self._contar(personal_id is not None)
+        return personal_id
+
+    def stats(self) -> dict:
+        consultas = self.hits + self.misses
+        return {
+            "version": self.version,
+            "empleados": len(self._por_id),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / consultas, 4) if consultas else None,
+            "cargas": self.cargas,
+        }
+
+    def _contar(self, hit: bool):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def _vigente(self) -> bool:
+        return (self._version_cargada == self.version
+                and time.monotonic() - self._cargado_en < self.ttl)
+
+    def _asegurar(self, db: Session):
+        if not self._vigente():
+            self._cargar(db)
+
+    def _recargar_si_antiguo(self, db: Session) -> bool:
+        """Un id desconocido puede ser un alta de otro proceso: recargar con limite de frecuencia"""
+        if time.monotonic() - self._cargado_en < self.recarga_minima:
+            return False
+        self._cargar(db, forzar=True)
+        return True
+
+    def _cargar(self, db: Session, forzar: bool = False):
+        with self._lock:
+            # Otro hilo pudo haber recargado mientras se esperaba el lock
+            if forzar:
+                if time.monotonic() - self._cargado_en < self.recarga_minima:
+                    return
+            elif self._vigente():
+                return
+            version = self.version
+            self._instalar(db.query(*_COLUMNAS).all(), version)
+
+    def _instalar(self, filas, version: int):
+        por_id = {}
+        id_por_user = {}
+        for fila in filas:
+            registro = RegistroRoster(*fila)
+            por_id[registro.id] = registro
+            if registro.user_id is not None:
+                id_por_user[registro.user_id] = registro.id
+        self._por_id = por_id
+        self._id_por_user = id_por_user
+        self._version_cargada = version
+        self._cargado_en = time.monotonic()
+        self.cargas += 1
+        logger.debug(f"Roster cargado: {len(por_id)} empleados (version {version})")
+
+
+# Instancia global del cache
+roster_cache = RosterCache()
+estado_compartido.al_cambiar("roster", lambda _: roster_cache.invalidar(propagar=False))
+
+
+@metricas.colector
+def _metricas_roster():
+    stats = roster_cache.stats()
+    return [
+        ("cache_hits_total", "counter", "Consultas resueltas desde cache", [({"cache": "roster"}, stats["hits"])]),
+        ("cache_misses_total", "counter", "Consultas no resueltas desde cache", [({"cache": "roster"}, stats["misses"])]),
+        ("cache_hit_ratio", "gauge", "Proporcion de hits del cache", [({"cache": "roster"}, stats["hit_ratio"])]),
+        ("roster_cache_cargas_total", "counter", "Recargas completas del roster", [({}, stats["cargas"])]),
+    ]
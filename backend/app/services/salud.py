@@ -0,0 +1,155 @@
+"""
+Estado de salud de la app para probes de liveness/readiness.
+Un hilo en segundo plano mide cada `intervalo` segundos la BD (SELECT 1 y ocupacion
+de los pools de todos los engines: sync, async y replicas) y cada `intervalo_dispositivo` segundos el dispositivo ZKTeco (conexion
+TCP al puerto, sin abrir sesion ZK). /health/ready responde desde la ultima foto:
+un probe no abre conexiones ni espera timeouts.
+"""
+from app.config import settings
+from app.services.zkteco_service import zkteco_service
+from sqlalchemy import text
+from typing import Optional
+import socket
+import threading
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class MonitorSalud:
+    """Foto periodica de BD, pool y dispositivo"""
+
+    def __init__(self, intervalo: float = 5.0, intervalo_dispositivo: float = 30.0,
+                 pool_saturado: float = 0.9):
+        self.intervalo = intervalo
+        self.intervalo_dispositivo = intervalo_dispositivo
+        self.pool_saturado = pool_saturado
+        self.session_factory = None  # None = SessionLocal de la app
+        self.pools = None  # None = pools de los engines de la app (db.pools_activos)
+        self._foto: Optional[dict] = None
+        self._dispositivo: dict = {"alcanzable": None, "verificado_en": None}
+        self._dispositivo_en = 0.0
+        self._hilo = None
+        self._detener = threading.Event()
+
+    def foto(self) -> Optional[dict]:
+        """Ultima medicion (None si todavia no se midio)"""
+        return self._foto
+
+    def listo(self, foto: Optional[dict]) -> tuple[bool, str]:
+        """(listo, motivo): BD alcanzable, pool con margen y foto reciente"""
+        if foto is None:
+            return False, "iniciando"
+        if time.time() - foto["medido_en"] > 3 * self.intervalo:
+            return False, "foto_vencida"
+        # Antes que la BD: con el pool lleno el SELECT 1 no se intenta
+        if any(self._saturado(estado) for estado in foto["pool"].values()):
+            return False, "pool_saturado"
+        if not foto["bd"]["ok"]:
+            return False, "bd_inalcanzable"
+        return True, "ok"
+
+    def refrescar(self) -> dict:
+        """Mide y reemplaza la foto (la llama el hilo; tambien sirve en tests)"""
+        bd, pool = self._medir_bd()
+        if time.monotonic() - self._dispositivo_en >= self.intervalo_dispositivo or self._dispositivo_en == 0:
+            self._dispositivo = self._medir_dispositivo()
+            self._dispositivo_en = time.monotonic()
+        self._foto = {"medido_en": time.time(), "bd": bd, "pool": pool, "dispositivo": self._dispositivo}
+        return self._foto
+
+    def iniciar(self):
+        """Arranca el hilo de medicion (llamar al arrancar la app)"""
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle, name="monitor-salud", daemon=True)
+        self._hilo.start()
+
+    def detener(self, timeout: float = 5.0):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+        self._hilo = None
+
+    def _bucle(self):
+        while True:
+            try:
+                self.refrescar()
+            except Exception as e:
+                logger.warning(f"Monitor de salud: fallo al medir: {e}")
+            if self._detener.wait(self.intervalo):
+                return
+
+    def _saturado(self, estado: dict) -> bool:
+        ocupacion = estado.get("ocupacion")
+        return ocupacion is not None and ocupacion >= self.pool_saturado
+
+    def _medir_bd(self) -> tuple[dict, dict]:
+        # La ocupacion se lee de los pools antes del SELECT 1: la medicion no cuenta su conexion
+        pools = {etiqueta: self._estado_pool(pool) for etiqueta, pool in self._pools()}
+        inicio = time.perf_counter()
+        try:
+            db = self._sesion()
+            try:
+                # get_bind no hace checkout; con su pool lleno el SELECT esperaria pool_timeout
+                if self._saturado(self._estado_pool(db.get_bind().pool)):
+                    return {"ok": None, "omitido": "pool_saturado"}, pools
+                db.execute(text("SELECT 1"))
+            finally:
+                db.close()
+            return {"ok": True, "latencia_ms": round((time.perf_counter() - inicio) * 1000, 1)}, pools
+        except Exception as e:
+            return {"ok": False, "error": str(e)[:200]}, pools
+
+    @staticmethod
+    def _estado_pool(pool) -> dict:
+        if not hasattr(pool, "checkedout"):
+            return {}
+        # QueuePool no expone max_overflow publicamente (negativo = sin limite)
+        capacidad = pool.size() + max(pool._max_overflow, 0)
+        en_uso = pool.checkedout()
+        return {
+            "en_uso": en_uso,
+            "capacidad": capacidad,
+            "ocupacion": round(en_uso / capacidad, 3) if capacidad else None,
+        }
+
+    @staticmethod
+    def _medir_dispositivo() -> dict:
+        """Heartbeat barato: el puerto del dispositivo acepta conexiones TCP"""
+        inicio = time.perf_counter()
+        try:
+            with socket.create_connection((zkteco_service.ip, zkteco_service.port), timeout=2):
+                pass
+            alcanzable, error = True, None
+        except OSError as e:
+            alcanzable, error = False, str(e)[:200]
+        estado = {
+            "ip": zkteco_service.ip,
+            "alcanzable": alcanzable,
+            "latencia_ms": round((time.perf_counter() - inicio) * 1000, 1),
+            "verificado_en": time.time(),
+        }
+        if error:
+            estado["error"] = error
+        return estado
+
+    def _pools(self) -> list:
+        if self.pools is None:
+            from app.database.db import pools_activos
+            return pools_activos()
+        return self.pools()
+
+    def _sesion(self):
+        if self.session_factory is None:
+            from app.database.db import SessionLocal
+            self.session_factory = SessionLocal
+        return self.session_factory()
+
+
+# Instancia global del monitor
+monitor_salud = MonitorSalud(
+    settings.salud_intervalo_segundos, settings.salud_intervalo_dispositivo, settings.salud_pool_saturado
+)
@@ -0,0 +1,206 @@
+"""
+Tokens de sesion firmados (HMAC-SHA256) emitidos en el login.
+El token lleva el id de usuario, la emision y una huella del password hash; el
+principal (id, username, rol, activo, huella) se cachea en memoria con TTL corto,
+asi un request autenticado no toca la BD mientras el principal este en cache.
+"""
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from app.config import settings
+from app.models.usuario import Usuario
+from app.services.metrics import metricas
+from app.services.estado_compartido import estado_compartido
+from collections import OrderedDict
+from typing import Optional
+import hashlib
+import hmac
+import logging
+import secrets
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def huella_password(password_hash: str) -> str:
+    """Fragmento del hash: cambiar el password invalida los tokens emitidos antes"""
+    return hashlib.sha256(password_hash.encode()).hexdigest()[:12]
+
+
+class Principal:
+    """Usuario autenticado de un request"""
+    __slots__ = ("id", "username", "rol", "activo", "huella")
+
+    def __init__(self, id, username, rol, activo, huella):
+        self.id = id
+        self.username = username
+        self.rol = rol
+        self.activo = activo
+        self.huella = huella
+
+    @property
+    def es_admin(self) -> bool:
+        return self.rol == "admin"
+
+
+class SessionService:
+    """Emite y valida tokens de sesion con cache acotado de principales"""
+
+    def __init__(self, secreto: str = "", max_edad: int = 3600 * 12,
+                 ttl_principal: float = 30.0, max_principales: int = 5000):
+        if not secreto:
+            secreto = secrets.token_hex(32)
+            logger.warning("SECRET_KEY no configurado: tokens de sesion validos solo en este proceso")
+        self._clave = secreto.encode()
+        self.max_edad = max_edad
+        # Tope de antiguedad del principal cacheado (cambios hechos por otros procesos)
+        self.ttl_principal = ttl_principal
+        self.max_principales = max_principales
+        self.session_factory = None  # None = SessionLocal de la app
+        self._principales: OrderedDict[int, tuple[float, Principal]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def emitir(self, usuario: Usuario) -> str:
+        """Token '{id}.{emision}.{huella}.{firma}' para un usuario recien autenticado"""
+        self._guardar(Principal(usuario.id, usuario.username, usuario.rol, usuario.activo,
+                                huella_password(usuario.password_hash)))
+        cuerpo = f"{usuario.id:x}.{int(time.time()):x}.{huella_password(usuario.password_hash)}"
+        return f"{cuerpo}.{self._firmar(cuerpo)}"
+
+    def autenticar(self, token: str) -> Optional[Principal]:
+        """
+        Principal del token, o None si es invalido, expiro, el usuario fue
+        desactivado o cambio su password. Solo consulta la BD si no esta en cache.
+        """
+        datos = self._decodificar(token)
+        if datos is None:
+            return None
+        usuario_id, huella = datos
+        principal = self._en_cache(usuario_id) or self._cargar(usuario_id)
+        return self._validar(principal, huella)
+
+    async def autenticar_async(self, token: str) -> Optional[Principal]:
+        """Igual que autenticar(), pero la carga desde BD (cache miss) va al threadpool"""
+        datos = self._decodificar(token)
+        if datos is None:
+            return None
+        usuario_id, huella = datos
+        principal = self._en_cache(usuario_id)
+        if principal is None:
+            principal = await run_in_threadpool(self._cargar, usuario_id)
+        return self._validar(principal, huella)
+
+    def invalidar(self, usuario_id: int = None, propagar: bool = True):
+        """Olvida el principal de un usuario (o todos); la siguiente validacion lo recarga"""
+        with self._lock:
+            if usuario_id is None:
+                self._principales.clear()
+            else:
+                self._principales.pop(usuario_id, None)
+        if propagar and usuario_id is not None:
+            # Otros workers descartan sus principales cacheados sin esperar el TTL
+            estado_compartido.tocar("sesiones")
+
+    def stats(self) -> dict:
+        consultas = self.hits + self.misses
+        return {
+            "principales": len(self._principales),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / consultas, 4) if consultas else None,
+        }
+
+    def _decodificar(self, token: str) -> Optional[tuple[int, str]]:
+        """(usuario_id, huella) si la firma es valida y el token no expiro"""
+        # Un token legitimo es ASCII; compare_digest no admite str con otros caracteres
+        if not token.isascii():
+            return None
+        try:
+            uid, ts, huella, firma = token.split(".")
+            usuario_id = int(uid, 16)
+            emitido = int(ts, 16)
+        except ValueError:
+            return None
+        if not hmac.compare_digest(firma, self._firmar(f"{uid}.{ts}.{huella}")):
+            return None
+        edad = time.time() - emitido
+        if edad > self.max_edad or edad < -60:
+            return None
+        return usuario_id, huella
+
+    @staticmethod
+    def _validar(principal: Optional[Principal], huella: str) -> Optional[Principal]:
+        if principal is None or not principal.activo or principal.huella != huella:
+            return None
+        return principal
+
+    def _en_cache(self, usuario_id: int) -> Optional[Principal]:
+        with self._lock:
+            entrada = self._principales.get(usuario_id)
+            if entrada is None or time.monotonic() - entrada[0] >= self.ttl_principal:
+                self.misses += 1
+                return None
+            self._principales.move_to_end(usuario_id)
+            self.hits += 1
+            return entrada[1]
+
+    def _guardar(self, principal: Principal):
+        with self._lock:
+            self._principales[principal.id] = (time.monotonic(), principal)
+            self._principales.move_to_end(principal.id)
+            while len(self._principales) > self.max_principales:
+                self._principales.popitem(last=False)
+
+    def _cargar(self, usuario_id: int) -> Optional[Principal]:
+        if self.session_factory is None:
+            from app.database.db import SessionLocal
+            self.session_factory = SessionLocal
+        db = self.session_factory()
+        try:
+            fila = db.query(
+                Usuario.id, Usuario.username, Usuario.rol, Usuario.activo, Usuario.password_hash
+            ).filter(Usuario.id == usuario_id).first()
+        finally:
+            db.close()
+        if fila is None:
+            return None
+        principal = Principal(fila.id, fila.username, fila.rol, fila.activo,
+                              huella_password(fila.password_hash))
+        self._guardar(principal)
+        return principal
+
+    def _firmar(self, cuerpo: str) -> str:
+        return hmac.new(self._clave, f"sesion.{cuerpo}".encode(), hashlib.sha256).hexdigest()
+
+
+def obtener_principal(request: Request) -> Optional[Principal]:
+    """Dependencia: principal del token de sesion (None si se uso API key o no hay auth)"""
+    return getattr(request.state, "principal", None)
+
+
+def requiere_admin(request: Request) -> Principal:
+    """
+    Dependencia: exige una sesion de rol admin, sin consultar la BD. Sin principal (solo
+    API key, que el frontend publica, o sin auth configurada) tambien se rechaza.
+    """
+    principal = obtener_principal(request)
+    if principal is None or not principal.es_admin:
+        raise HTTPException(status_code=403, detail="Se requiere rol admin")
+    return principal
+
+
+# Instancia global del servicio
+session_service = SessionService(settings.secret_key)
+estado_compartido.al_cambiar("sesiones", lambda _: session_service.invalidar(propagar=False))
+
+
+@metricas.colector
+def _metricas_sesiones():
+    stats = session_service.stats()
+    return [
+        ("cache_hits_total", "counter", "Consultas resueltas desde cache", [({"cache": "sesiones"}, stats["hits"])]),
+        ("cache_misses_total", "counter", "Consultas no resueltas desde cache", [({"cache": "sesiones"}, stats["misses"])]),
+        ("cache_hit_ratio", "gauge", "Proporcion de hits del cache", [({"cache": "sesiones"}, stats["hit_ratio"])]),
+    ]
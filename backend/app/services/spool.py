@@ -0,0 +1,611 @@
+"""
+Spool local de ingesta (write-ahead log). Los marcajes del dispositivo se escriben
+primero a un archivo append-only con fsync y despues se cargan a `asistencia`: si la
+BD no responde, quedan en disco y un hilo en segundo plano los reintenta.
+
+Cada proceso (worker) toma con un lock de archivo su propio subdirectorio w0, w1...;
+al reiniciar, un worker recupera lo pendiente del subdirectorio que toma.
+
+Formato: segmentos spool-000001.log, spool-000002.log... con una linea por marcaje
+
+    <crc32 en hex> <json>\\n
+
+Los escritores concurrentes comparten el fsync (group commit): cada uno escribe su
+bloque y espera a que un fsync cubra su escritura; el primero que llega hace el fsync
+para todos los que se sumaron en la ventana `espera_fsync`.
+
+El checkpoint (segmento, offset) se reescribe de forma atomica (temporal + fsync +
+rename) despues de cada commit. Reproducir es idempotente: un marcaje que ya existe
+(mismo personal_id y fecha_hora; sin timestamp, mismo personal_id, tipo y momento en que
+se encolo) se descarta, asi que una caida entre el commit y el checkpoint solo repite
+trabajo.
+
+Una re-sincronizacion reemplaza lo encolado antes que ella: publica un corte en
+estado_compartido y los marcajes con encolado_en anterior se descartan al reproducir,
+en este worker y en los demas (que lo ven en su proximo refresco).
+
+Solo una falla de conexion con la BD deja lo pendiente para el siguiente intento. Si un
+lote falla por otro motivo (datos invalidos, una restriccion) se reintenta marcaje por
+marcaje y los que vuelven a fallar pasan a cuarentena.log: el spool nunca queda trabado.
+"""
+from app.config import settings
+from app.models.asistencia import Asistencia
+from app.services.estado_compartido import estado_compartido
+from app.services.eventos import broker_eventos, COLUMNAS_EVENTO, fila_evento
+from app.services.metrics import metricas
+from app.services.roster_cache import roster_cache
+from sqlalchemy import insert, select
+from sqlalchemy.exc import DBAPIError, DisconnectionError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, Optional
+import itertools
+import threading
+import logging
+import json
+import time
+import zlib
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows: un solo proceso, sin lock
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+spool_fsync = metricas.histograma(
+    "spool_fsync_seconds", "Duracion de cada fsync del spool de ingesta",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0),
+)
+spool_registros = metricas.contador(
+    "spool_records_total", "Marcajes escritos y reproducidos por el spool de ingesta", ("resultado",),
+)
+
+PREFIJO = "spool-"
+CHECKPOINT = "checkpoint.json"
+CUARENTENA = "cuarentena.log"
+CLAVE_CORTE = "spool_corte"  # encolado_en desde el que valen los marcajes (re-sincronizacion)
+
+
+def es_caida_bd(e: BaseException) -> bool:
+    """True si el error es de conexion con la BD (reintentable), no de los datos"""
+    if isinstance(e, DBAPIError):
+        return isinstance(e, OperationalError) or e.connection_invalidated
+    return isinstance(e, (DisconnectionError, PoolTimeoutError))
+
+
+def _codificar(registro: dict) -> bytes:
+    datos = json.dumps(registro, default=str, separators=(",", ":")).encode()
+    return b"%08x %s\n" % (zlib.crc32(datos), datos)
+
+
+def _decodificar(linea: bytes) -> Optional[dict]:
+    """None si la linea esta incompleta o no coincide su CRC"""
+    if not linea.endswith(b"\n") or len(linea) < 10:
+        return None
+    crc, datos = linea[:8], linea[9:-1]
+    try:
+        if int(crc, 16) != zlib.crc32(datos):
+            return None
+        return json.loads(datos)
+    except ValueError:
+        return None
+
+
+def _bloquear(directorio: Path):
+    """Lock exclusivo del subdirectorio de un worker; None si otro proceso lo tiene"""
+    directorio.mkdir(parents=True, exist_ok=True)
+    lock = open(directorio / ".lock", "a")
+    if fcntl is not None:
+        try:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            return None
+    return lock
+
+
+def _leer_checkpoint(directorio: Path) -> tuple[int, int]:
+    ruta = directorio / CHECKPOINT
+    if not ruta.exists():
+        return 1, 0
+    datos = json.loads(ruta.read_text())
+    return datos["segmento"], datos["offset"]
+
+
+def _registros_pendientes(directorio: Path, checkpoint: tuple[int, int]) -> Iterator[dict]:
+    """Marcajes validos escritos despues del checkpoint (omite lineas incompletas o corruptas)"""
+    segmentos = sorted(int(p.stem[len(PREFIJO):]) for p in directorio.glob(f"{PREFIJO}*.log"))
+    for segmento in segmentos:
+        if segmento < checkpoint[0]:
+            continue
+        with open(directorio / f"{PREFIJO}{segmento:06d}.log", "rb") as f:
+            f.seek(checkpoint[1] if segmento == checkpoint[0] else 0)
+            for linea in f:
+                registro = _decodificar(linea)
+                if registro is not None:
+                    yield registro
+
+
+def _fsync_directorio(directorio: Path):
+    """Hace durable la creacion/rename de archivos dentro del directorio"""
+    try:
+        fd = os.open(directorio, os.O_RDONLY)
+    except OSError:  # Windows no permite abrir directorios
+        return
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class SpoolIngesta:
+    """Log local de marcajes pendientes de cargar a la BD"""
+
+    def __init__(self, directorio: str, espera_fsync: float = 0.002,
+                 max_segmento: int = 16 * 1024 * 1024, lote: int = 500, intervalo: float = 5.0):
+        self.directorio = Path(directorio)
+        self.espera_fsync = espera_fsync
+        self.max_segmento = max_segmento
+        self.lote = lote
+        self.intervalo = intervalo
+        self.session_factory = None  # None = SessionLocal de la app
+        self._cond = threading.Condition()
+        self._lock_replay = threading.Lock()
+        self._dir: Optional[Path] = None  # subdirectorio tomado por este proceso
+        self._lock_dir = None
+        self._archivo = None  # segmento abierto para escribir
+        self._segmento = 0
+        self._checkpoint = (1, 0)  # (segmento, offset) del proximo marcaje a reproducir
+        self._escritos = 0  # escrituras hechas (turnos)
+        self._sincronizados = 0  # turnos cubiertos por un fsync
+        self._sincronizando = False
+        self.pendientes = 0
+        self._mas_antiguo: Optional[float] = None  # encolado_en del marcaje pendiente mas viejo
+        self._hilo = None
+        self._detener = threading.Event()
+
+    # --- Apertura y recuperacion ---
+
+    def _segmentos(self) -> list[int]:
+        return sorted(int(p.stem[len(PREFIJO):]) for p in self._dir.glob(f"{PREFIJO}*.log"))
+
+    def _ruta(self, segmento: int) -> Path:
+        return self._dir / f"{PREFIJO}{segmento:06d}.log"
+
+    def _tomar_directorio(self):
+        """Primer subdirectorio w<N> cuyo lock no tenga otro proceso"""
+        for n in itertools.count():
+            directorio = self.directorio / f"w{n}"
+            lock = _bloquear(directorio)
+            if lock is not None:
+                self._dir, self._lock_dir = directorio, lock
+                return
+
+    def _abrir(self):
+        """Recupera el estado desde disco (llamar con self._cond tomado)"""
+        if self._archivo is not None:
+            return
+        self._tomar_directorio()
+        self._checkpoint = _leer_checkpoint(self._dir)
+        segmentos = self._segmentos()
+        for segmento in segmentos:
+            if segmento < self._checkpoint[0]:  # ya reproducido; quedo por una caida
+                self._ruta(segmento).unlink(missing_ok=True)
+        segmentos = [s for s in segmentos if s >= self._checkpoint[0]]
+        self._segmento = segmentos[-1] if segmentos else self._checkpoint[0]
+        self._truncar_cola(self._ruta(self._segmento))
+
+        # Backlog pendiente desde el checkpoint
+        self.pendientes, self._mas_antiguo = 0, None
+        for registro in _registros_pendientes(self._dir, self._checkpoint):
+            self.pendientes += 1
+            if self._mas_antiguo is None:
+                self._mas_antiguo = registro.get("encolado_en")
+        self._archivo = open(self._ruta(self._segmento), "ab")
+        _fsync_directorio(self._dir)
+        if self.pendientes:
+            logger.warning(f"Spool de ingesta: {self.pendientes} marcajes pendientes de cargar a la BD")
+
+    @staticmethod
+    def _truncar_cola(ruta: Path):
+        """Descarta una ultima linea escrita a medias (caida durante la escritura)"""
+        if not ruta.exists():
+            return
+        valido = 0
+        with open(ruta, "rb") as f:
+            for linea in f:
+                if not linea.endswith(b"\n"):
+                    break
+                valido += len(linea)
+        if valido < ruta.stat().st_size:
+            logger.warning(f"Spool de ingesta: descartando escritura incompleta al final de {ruta.name}")
+            with open(ruta, "r+b") as f:
+                f.truncate(valido)
+                os.fsync(f.fileno())
+
+    def _adoptar_huerfanos(self):
+        """
+        Subdirectorios sin dueno vivo (el reinicio dejo menos workers que antes): lo
+        pendiente pasa a este spool y se reproduce con el resto. Si el proceso cae a mitad
+        de la adopcion, los marcajes copiados dos veces se descartan al reproducir.
+        """
+        for directorio in sorted(self.directorio.glob("w*")):
+            if directorio == self._dir or not directorio.name[1:].isdigit():
+                continue
+            lock = _bloquear(directorio)
+            if lock is None:  # lo usa otro worker
+                continue
+            try:
+                adoptados, lote = 0, []
+                for registro in _registros_pendientes(directorio, _leer_checkpoint(directorio)):
+                    lote.append(registro)
+                    if len(lote) >= self.lote:
+                        adoptados += self.agregar(lote)
+                        lote = []
+                adoptados += self.agregar(lote)
+                for segmento in directorio.glob(f"{PREFIJO}*.log"):
+                    segmento.unlink()
+                (directorio / CHECKPOINT).unlink(missing_ok=True)
+                _fsync_directorio(directorio)
+                if adoptados:
+                    logger.warning(f"Spool de ingesta: {adoptados} marcajes pendientes adoptados de {directorio.name}")
+            finally:
+                lock.close()
+
+    def cerrar(self):
+        """Cierra el segmento abierto; la proxima operacion vuelve a leer el estado de disco"""
+        with self._cond:
+            if self._archivo is not None:
+                self._archivo.close()
+                self._archivo = None
+            if self._lock_dir is not None:
+                self._lock_dir.close()  # libera el lock del subdirectorio
+                self._dir = self._lock_dir = None
+            self._checkpoint = (1, 0)
+
+    # --- Escritura ---
+
+    def agregar(self, registros: list[dict]) -> int:
+        """
+        Escribe los marcajes y retorna cuando estan en disco (fsync).
+        Cada registro: user_id, tipo, fecha_hora, dispositivo_ip.
+        """
+        if not registros:
+            return 0
+        ahora = time.time()
+        # Los marcajes adoptados de otro worker conservan su encolado_en original
+        registros = [{"encolado_en": ahora, **r} for r in registros]
+        bloque = b"".join(_codificar(r) for r in registros)
+        with self._cond:
+            self._abrir()
+            if self._archivo.tell() >= self.max_segmento:
+                self._rotar()
+            self._archivo.write(bloque)
+            self._archivo.flush()
+            self._escritos += 1
+            turno = self._escritos
+            self.pendientes += len(registros)
+            if self._mas_antiguo is None:
+                self._mas_antiguo = registros[0]["encolado_en"]
+        self._esperar_fsync(turno)
+        spool_registros.inc(len(registros), resultado="escrito")
+        return len(registros)
+
+    def _rotar(self):
+        """Segmento nuevo (con self._cond tomado); el anterior queda durable antes de cerrarlo"""
+        os.fsync(self._archivo.fileno())
+        self._archivo.close()
+        self._segmento += 1
+        self._archivo = open(self._ruta(self._segmento), "ab")
+        _fsync_directorio(self._dir)
+
+    def _esperar_fsync(self, turno: int):
+        with self._cond:
+            while self._sincronizados < turno:
+                if not self._sincronizando:
+                    self._sincronizando = True
+                    break
+                self._cond.wait()
+            else:
+                return  # otro escritor ya hizo el fsync que cubre este turno
+        objetivo = 0
+        try:
+            if self.espera_fsync:
+                time.sleep(self.espera_fsync)  # ventana para que otros escritores se sumen
+            with self._cond:
+                objetivo = self._escritos
+                archivo = self._archivo
+            inicio = time.perf_counter()
+            os.fsync(archivo.fileno())
+            spool_fsync.observar(time.perf_counter() - inicio)
+        except BaseException:
+            objetivo = 0
+            raise
+        finally:
+            with self._cond:
+                self._sincronizados = max(self._sincronizados, objetivo)
+                self._sincronizando = False
+                self._cond.notify_all()
+
+    def descartar_anteriores(self) -> float:
+        """
+        Re-sincronizacion: lo encolado hasta ahora tiene los tipos viejos y se descarta al
+        reproducir. Llamar antes de borrar `asistencia`; el dispositivo conserva esos marcajes.
+        """
+        corte = time.time()
+        estado_compartido.guardar(CLAVE_CORTE, corte)
+        return corte
+
+    # --- Reproduccion ---
+
+    def reproducir(self, db=None, bloquear: bool = True) -> Optional[dict]:
+        """
+        Carga a la BD lo pendiente, por lotes con commit y checkpoint. Si se cae la conexion
+        con la BD (es_caida_bd) la excepcion se propaga y lo no cargado queda para el
+        siguiente intento. None si bloquear=False y otra reproduccion esta en curso.
+        """
+        if not self._lock_replay.acquire(blocking=bloquear):
+            return None
+        sesion_propia = db is None
+        resultado = {"insertados": 0, "existentes": 0, "sin_personal": 0, "descartados": 0, "rechazados": 0}
+        try:
+            with self._cond:
+                self._abrir()
+            if sesion_propia:
+                db = self._sesion()
+            while True:
+                registros, checkpoint = self._leer_lote()
+                if not registros:
+                    if checkpoint != self._checkpoint:
+                        self._guardar_checkpoint(checkpoint)  # solo se salto lineas corruptas
+                    break
+                self._mas_antiguo = registros[0].get("encolado_en")
+                try:
+                    parcial = self._cargar(db, registros)
+                except Exception as e:
+                    db.rollback()
+                    if es_caida_bd(e):
+                        raise
+                    logger.error(f"Spool de ingesta: lote de {len(registros)} rechazado, "
+                                 f"se reintenta marcaje por marcaje: {e}")
+                    parcial = self._cargar_uno_a_uno(db, registros)
+                self._guardar_checkpoint(checkpoint)
+                self.pendientes = max(self.pendientes - len(registros), 0)
+                for clave, valor in parcial.items():
+                    resultado[clave] += valor
+            with self._cond:
+                if not self._hay_pendientes():  # sin escrituras nuevas mientras se leia
+                    self.pendientes, self._mas_antiguo = 0, None
+        finally:
+            if sesion_propia and db is not None:
+                db.close()
+            self._lock_replay.release()
+        return resultado
+
+    def _hay_pendientes(self) -> bool:
+        """Hay bytes escritos despues del checkpoint (llamar con self._cond tomado)"""
+        return self._archivo is not None and (self._segmento, self._archivo.tell()) != self._checkpoint
+
+    def _leer_lote(self) -> tuple[list[dict], tuple[int, int]]:
+        """Hasta `lote` marcajes desde el checkpoint y la posicion siguiente al ultimo leido"""
+        segmento, offset = self._checkpoint
+        registros = []
+        while len(registros) < self.lote:
+            ruta = self._ruta(segmento)
+            if ruta.exists():
+                with open(ruta, "rb") as f:
+                    f.seek(offset)
+                    for linea in f:
+                        if not linea.endswith(b"\n"):
+                            break  # escritura en curso: se lee en la proxima pasada
+                        offset += len(linea)
+                        registro = _decodificar(linea)
+                        if registro is None:
+                            spool_registros.inc(resultado="corrupto")
+                            logger.error(f"Spool de ingesta: linea corrupta en {ruta.name}, se omite")
+                            continue
+                        registros.append(registro)
+                        if len(registros) >= self.lote:
+                            break
+            if len(registros) >= self.lote or segmento >= self._segmento:
+                break
+            segmento, offset = segmento + 1, 0  # segmento anterior completo
+        return registros, (segmento, offset)
+
+    def _cargar(self, db, registros: list[dict]) -> dict:
+        """Inserta los marcajes que no existen (una consulta de existencia + un INSERT) y hace commit"""
+        sin_personal = descartados = 0
+        corte = estado_compartido.obtener(CLAVE_CORTE) or 0
+        candidatos = {}
+        sin_fecha = {}
+        for r in registros:
+            if r["encolado_en"] < corte:  # encolado antes de una re-sincronizacion
+                descartados += 1
+                continue
+            personal_id = roster_cache.id_por_user_id(db, r["user_id"])
+            if not personal_id:
+                sin_personal += 1
+                continue
+            fecha_hora = datetime.fromisoformat(r["fecha_hora"]) if r["fecha_hora"] else None
+            fila = {
+                "personal_id": personal_id,
+                "user_id": r["user_id"],
+                "tipo": r["tipo"],
+                "fecha_hora": fecha_hora,
+                "dispositivo_ip": r["dispositivo_ip"],
+                "sincronizado": "S",
+                # Cuando se leyo del dispositivo (UTC sin zona, como el resto de la tabla)
+                "fecha_sincronizacion": datetime.fromtimestamp(r["encolado_en"], timezone.utc).replace(tzinfo=None),
+            }
+            if fecha_hora is None:
+                # Sin timestamp la clave es el momento en que se encolo: un reintento del mismo
+                # lote no lo vuelve a insertar (dos iguales en un mismo lote son indistinguibles)
+                sin_fecha.setdefault((personal_id, r["tipo"], fila["fecha_sincronizacion"]), fila)
+            else:
+                # Misma clave que contra la BD: el mismo marcaje encolado por dos sincronizaciones
+                # puede traer otro tipo si cambio la alternancia, y sigue siendo un solo marcaje
+                candidatos.setdefault((personal_id, fecha_hora), fila)
+        existentes = set()
+        if candidatos:
+            # Rango por empleado sobre el indice (personal_id, fecha_hora); el filtro exacto en memoria
+            fechas = [f for _, f in candidatos]
+            existentes = set(db.execute(
+                select(Asistencia.personal_id, Asistencia.fecha_hora).where(
+                    Asistencia.personal_id.in_({p for p, _ in candidatos}),
+                    Asistencia.fecha_hora >= min(fechas),
+                    Asistencia.fecha_hora <= max(fechas),
+                )
+            ).all()) & candidatos.keys()
+        existentes_sin_fecha = set()
+        if sin_fecha:
+            existentes_sin_fecha = set(db.execute(
+                select(Asistencia.personal_id, Asistencia.tipo, Asistencia.fecha_sincronizacion).where(
+                    Asistencia.fecha_hora.is_(None),
+                    Asistencia.personal_id.in_({p for p, _, _ in sin_fecha}),
+                    Asistencia.fecha_sincronizacion.in_({f for _, _, f in sin_fecha}),
+                )
+            ).all()) & sin_fecha.keys()
+        nuevas = [fila for clave, fila in candidatos.items() if clave not in existentes]
+        nuevas += [fila for clave, fila in sin_fecha.items() if clave not in existentes_sin_fecha]
+        filas_evento = []
+        if nuevas:
+            filas_evento = [fila_evento(f) for f in db.execute(
+                insert(Asistencia).returning(*COLUMNAS_EVENTO), nuevas,
+            )]
+        db.commit()
+        broker_eventos.nuevos_marcajes(db, filas_evento)
+
+        duplicados = len(registros) - sin_personal - descartados - len(nuevas)
+        spool_registros.inc(len(nuevas), resultado="insertado")
+        spool_registros.inc(duplicados, resultado="existente")
+        spool_registros.inc(sin_personal, resultado="sin_personal")
+        spool_registros.inc(descartados, resultado="descartado")
+        return {"insertados": len(nuevas), "existentes": duplicados, "sin_personal": sin_personal,
+                "descartados": descartados}
+
+    def _cargar_uno_a_uno(self, db, registros: list[dict]) -> dict:
+        """Carga cada marcaje por separado; los que fallan por sus datos van a cuarentena"""
+        parcial = {"insertados": 0, "existentes": 0, "sin_personal": 0, "descartados": 0, "rechazados": 0}
+        rechazados = []
+        for registro in registros:
+            try:
+                for clave, valor in self._cargar(db, [registro]).items():
+                    parcial[clave] += valor
+            except Exception as e:
+                db.rollback()
+                if es_caida_bd(e):
+                    raise  # los ya cargados se descartan como existentes en el reintento
+                rechazados.append({**registro, "error": str(e)[:500]})
+        if rechazados:
+            # Durable antes de avanzar el checkpoint: un marcaje rechazado nunca se pierde
+            with open(self._dir / CUARENTENA, "ab") as f:
+                f.write(b"".join(_codificar(r) for r in rechazados))
+                f.flush()
+                os.fsync(f.fileno())
+            spool_registros.inc(len(rechazados), resultado="rechazado")
+            logger.error(f"Spool de ingesta: {len(rechazados)} marcajes movidos a {CUARENTENA}")
+        parcial["rechazados"] = len(rechazados)
+        return parcial
+
+    def _guardar_checkpoint(self, checkpoint: tuple[int, int]):
+        temporal = self._dir / f"{CHECKPOINT}.tmp"
+        with open(temporal, "w") as f:
+            json.dump({"segmento": checkpoint[0], "offset": checkpoint[1]}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, self._dir / CHECKPOINT)
+        _fsync_directorio(self._dir)
+        anterior = self._checkpoint[0]
+        self._checkpoint = checkpoint
+        for segmento in range(anterior, checkpoint[0]):  # segmentos ya reproducidos
+            self._ruta(segmento).unlink(missing_ok=True)
+
+    # --- Estado y metricas ---
+
+    def stats(self) -> dict:
+        backlog_bytes = 0
+        directorio = self._dir
+        if directorio is not None:
+            segmento_cp, offset_cp = self._checkpoint
+            for ruta in directorio.glob(f"{PREFIJO}*.log"):
+                segmento = int(ruta.stem[len(PREFIJO):])
+                if segmento >= segmento_cp:
+                    try:
+                        tamano = ruta.stat().st_size
+                    except FileNotFoundError:  # borrado por la reproduccion en curso
+                        continue
+                    backlog_bytes += tamano - (offset_cp if segmento == segmento_cp else 0)
+        mas_antiguo = self._mas_antiguo
+        return {
+            "pendientes": self.pendientes,
+            "backlog_bytes": max(backlog_bytes, 0),
+            "lag_segundos": round(time.time() - mas_antiguo, 3) if mas_antiguo else 0.0,
+        }
+
+    # --- Hilo de reproduccion ---
+
+    def iniciar(self):
+        """Recupera el spool y arranca el hilo que lo reproduce (llamar al arrancar la app)"""
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        with self._cond:
+            self._abrir()
+        try:
+            self._adoptar_huerfanos()
+        except OSError as e:
+            logger.error(f"Spool de ingesta: no se pudieron adoptar spools de otros workers: {e}")
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle, name="spool-ingesta", daemon=True)
+        self._hilo.start()
+
+    def detener(self, timeout: float = 10.0):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+        self._hilo = None
+        self.cerrar()
+
+    def _bucle(self):
+        while not self._detener.wait(self.intervalo):
+            with self._cond:
+                if not self._hay_pendientes():
+                    continue
+            try:
+                resultado = self.reproducir(bloquear=False)
+                if resultado:
+                    logger.info(f"Spool de ingesta reproducido: {resultado}")
+            except Exception as e:
+                if es_caida_bd(e):
+                    logger.warning(f"Spool de ingesta: BD no disponible, {self.pendientes} pendientes ({e})")
+                else:
+                    logger.exception(f"Spool de ingesta: error al reproducir, {self.pendientes} pendientes")
+
+    def _sesion(self):
+        if self.session_factory is None:
+            from app.database.db import SessionLocal
+            self.session_factory = SessionLocal
+        return self.session_factory()
+
+
+# Instancia global (el directorio se crea recien al primer uso)
+spool_ingesta = SpoolIngesta(
+    settings.spool_directorio,
+    espera_fsync=settings.spool_fsync_ventana_ms / 1000,
+    max_segmento=settings.spool_segmento_max_bytes,
+    lote=settings.spool_lote,
+    intervalo=settings.spool_intervalo_segundos,
+)
+
+
+@metricas.colector
+def _metricas_spool():
+    stats = spool_ingesta.stats()
+    return [
+        ("spool_backlog_records", "gauge", "Marcajes en el spool pendientes de cargar a la BD",
+         [({}, stats["pendientes"])]),
+        ("spool_backlog_bytes", "gauge", "Bytes del spool pendientes de reproducir", [({}, stats["backlog_bytes"])]),
+        ("spool_lag_seconds", "gauge", "Antiguedad del marcaje pendiente mas viejo", [({}, stats["lag_segundos"])]),
+    ]
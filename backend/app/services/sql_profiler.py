@@ -0,0 +1,110 @@
+"""
+Perfil de SQL por request: cantidad de consultas, tiempo total en BD y sentencias
+repetidas (patron N+1). Se alimenta de eventos del engine de SQLAlchemy y de un
+ContextVar que el middleware abre por request; el threadpool de Starlette copia el
+contexto, asi que las rutas sync tambien quedan medidas.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from collections import Counter
+from sqlalchemy import event
+from typing import Optional
+import threading
+import time
+
+# Caracteres de la sentencia que se muestran en logs
+LARGO_SENTENCIA = 160
+
+
+class PerfilSql:
+    """Consultas ejecutadas dentro de un request"""
+    __slots__ = ("ruta", "consultas", "segundos", "sentencias", "_lock")
+
+    def __init__(self, ruta: str = ""):
+        self.ruta = ruta
+        self.consultas = 0
+        self.segundos = 0.0
+        self.sentencias: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def registrar(self, sentencia: str, segundos: float):
+        with self._lock:
+            self.consultas += 1
+            self.segundos += segundos
+            self.sentencias[sentencia] += 1
+
+    def max_repeticion(self) -> int:
+        return max(self.sentencias.values(), default=0)
+
+    def repetidas(self, minimo: int) -> list[tuple[str, int]]:
+        """Sentencias ejecutadas al menos `minimo` veces (sospechosas de N+1)"""
+        return [
+            (" ".join(s.split())[:LARGO_SENTENCIA], n)
+            for s, n in self.sentencias.most_common() if n >= minimo
+        ]
+
+    def encabezado(self) -> str:
+        return (f"consultas={self.consultas};tiempo_ms={self.segundos * 1000:.1f};"
+                f"max_repeticion={self.max_repeticion()}")
+
+
+_perfil_actual: ContextVar[Optional[PerfilSql]] = ContextVar("perfil_sql", default=None)
+
+# Perfiles de requests terminados que se estan capturando (tests de presupuesto)
+_capturas: list[list[PerfilSql]] = []
+_lock_capturas = threading.Lock()
+
+
+# El inicio va en el contexto de ejecucion, no en conn.info: si la sentencia falla no
+# hay after_cursor_execute, y el contexto se descarta con ella en vez de acumularse
+def _antes(conn, cursor, statement, parameters, context, executemany):
+    if _perfil_actual.get() is not None and context is not None:
+        context._perfil_inicio = time.perf_counter()
+
+
+def _despues(conn, cursor, statement, parameters, context, executemany):
+    perfil = _perfil_actual.get()
+    if perfil is None:
+        return
+    inicio = getattr(context, "_perfil_inicio", None)
+    perfil.registrar(statement, time.perf_counter() - inicio if inicio is not None else 0.0)
+
+
+def instrumentar(engine):
+    """Registra los listeners en un engine (idempotente)"""
+    if not event.contains(engine, "before_cursor_execute", _antes):
+        event.listen(engine, "before_cursor_execute", _antes)
+        event.listen(engine, "after_cursor_execute", _despues)
+
+
+def iniciar(ruta: str):
+    """Abre un perfil para el request actual; retorna (perfil, token para terminar)"""
+    perfil = PerfilSql(ruta)
+    return perfil, _perfil_actual.set(perfil)
+
+
+def ruta_actual() -> Optional[str]:
+    """Path del request en curso (None fuera de un request)"""
+    perfil = _perfil_actual.get()
+    return perfil.ruta if perfil is not None else None
+
+
+def terminar(perfil: PerfilSql, token):
+    _perfil_actual.reset(token)
+    if _capturas:
+        with _lock_capturas:
+            for captura in _capturas:
+                captura.append(perfil)
+
+
+@contextmanager
+def capturar():
+    """Junta los perfiles de los requests que terminan dentro del bloque"""
+    perfiles: list[PerfilSql] = []
+    with _lock_capturas:
+        _capturas.append(perfiles)
+    try:
+        yield perfiles
+    finally:
+        with _lock_capturas:
+            _capturas.remove(perfiles)
@@ -4,6 +4,7 @@ Usa la librería pyzk (protocolo ZK sobre UDP/TCP puerto 4370)
 """
 from zk import ZK
 from app.config import settings
+from app.services.metrics import zkteco_duracion
 from datetime import datetime
 import logging
 
@@ -49,40 +50,54 @@ class ZKTecoService:
             finally:
                 self._conn = None
 
+    def _fase(self, operacion: str, fase: str):
+        """Mide una fase (conexion, lectura, escritura, desconexion) de una operacion"""
+        return zkteco_duracion.medir(operacion=operacion, fase=fase)
+
+    def _conectar_medido(self, operacion: str):
+        with self._fase(operacion, "conexion"):
+            return self.conectar()
+
+    def _desconectar_medido(self, operacion: str):
+        with self._fase(operacion, "desconexion"):
+            self.desconectar()
+
     def obtener_dispositivo_info(self) -> dict:
         """Obtiene información detallada del dispositivo"""
-        conn = self.conectar()
+        conn = self._conectar_medido("info")
         try:
-            conn.read_sizes()
-            info = {
-                "ip": self.ip,
-                "port": self.port,
-                "serial_number": conn.get_serialnumber(),
-                "firmware": conn.get_firmware_version(),
-                "plataforma": conn.get_platform(),
-                "nombre_dispositivo": conn.get_device_name(),
-                "mac": conn.get_mac(),
-                "usuarios_registrados": conn.users,
-                "huellas_registradas": conn.fingers,
-                "registros_asistencia": conn.records,
-                "capacidad_usuarios": conn.users_cap,
-                "capacidad_huellas": conn.fingers_cap,
-                "estado": "conectado",
-            }
+            with self._fase("info", "lectura"):
+                conn.read_sizes()
+                info = {
+                    "ip": self.ip,
+                    "port": self.port,
+                    "serial_number": conn.get_serialnumber(),
+                    "firmware": conn.get_firmware_version(),
+                    "plataforma": conn.get_platform(),
+                    "nombre_dispositivo": conn.get_device_name(),
+                    "mac": conn.get_mac(),
+                    "usuarios_registrados": conn.users,
+                    "huellas_registradas": conn.fingers,
+                    "registros_asistencia": conn.records,
+                    "capacidad_usuarios": conn.users_cap,
+                    "capacidad_huellas": conn.fingers_cap,
+                    "estado": "conectado",
+                }
             return info
         finally:
-            self.desconectar()
+            self._desconectar_medido("info")
 
     def obtener_usuarios(self) -> list:
         """
         Obtiene la lista de usuarios del dispositivo.
         Retorna lista de dicts con datos del usuario.
         """
-        conn = self.conectar()
+        conn = self._conectar_medido("usuarios")
         try:
-            conn.disable_device()
-            usuarios_raw = conn.get_users()
-            conn.enable_device()
+            with self._fase("usuarios", "lectura"):
+                conn.disable_device()
+                usuarios_raw = conn.get_users()
+                conn.enable_device()
 
             usuarios = []
             for u in usuarios_raw:
@@ -98,18 +113,19 @@ class ZKTecoService:
             logger.info(f"Se obtuvieron {len(usuarios)} usuarios del dispositivo")
             return usuarios
         finally:
-            self.desconectar()
+            self._desconectar_medido("usuarios")
 
     def obtener_registros_asistencia(self) -> list:
         """
         Obtiene los registros de asistencia del dispositivo.
         Retorna lista de dicts con datos de asistencia.
         """
-        conn = self.conectar()
+        conn = self._conectar_medido("asistencia")
         try:
-            conn.disable_device()
-            registros_raw = conn.get_attendance()
-            conn.enable_device()
+            with self._fase("asistencia", "lectura"):
+                conn.disable_device()
+                registros_raw = conn.get_attendance()
+                conn.enable_device()
 
             registros = []
             for r in registros_raw:
@@ -122,7 +138,7 @@ class ZKTecoService:
             logger.info(f"Se obtuvieron {len(registros)} registros de asistencia")
             return registros
         finally:
-            self.desconectar()
+            self._desconectar_medido("asistencia")
 
     def registrar_usuario(self, uid: int, name: str, privilege: int = 0,
                           password: str = "", user_id: str = "", card: int = 0) -> bool:
@@ -130,34 +146,60 @@ class ZKTecoService:
         Registra/actualiza un usuario en el dispositivo.
         privilege: 0=Usuario, 14=Admin
         """
-        conn = self.conectar()
+        conn = self._conectar_medido("registrar_usuario")
         try:
-            conn.disable_device()
-            conn.set_user(
-                uid=uid,
-                name=name,
-                privilege=privilege,
-                password=password,
-                user_id=str(user_id) if user_id else str(uid),
-                card=card,
-            )
-            conn.enable_device()
+            with self._fase("registrar_usuario", "escritura"):
+                conn.disable_device()
+                conn.set_user(
+                    uid=uid,
+                    name=name,
+                    privilege=privilege,
+                    password=password,
+                    user_id=str(user_id) if user_id else str(uid),
+                    card=card,
+                )
+                conn.enable_device()
             logger.info(f"Usuario registrado en dispositivo: uid={uid}, name={name}")
             return True
         finally:
-            self.desconectar()
+            self._desconectar_medido("registrar_usuario")
+
+    def registrar_usuarios(self, usuarios: list[tuple[int, str]]) -> list[dict]:
+        """
+        Registra varios usuarios (uid, nombre) con una sola conexion.
+        Retorna los errores por usuario; una falla de conexion se propaga.
+        """
+        errores = []
+        conn = self._conectar_medido("registrar_usuarios")
+        try:
+            with self._fase("registrar_usuarios", "escritura"):
+                conn.disable_device()
+                try:
+                    for uid, nombre in usuarios:
+                        try:
+                            conn.set_user(uid=uid, name=nombre, privilege=0, password="",
+                                          user_id=str(uid), card=0)
+                        except Exception as e:
+                            errores.append({"uid": uid, "nombre": nombre, "error": str(e)})
+                finally:
+                    conn.enable_device()
+            logger.info(f"Usuarios registrados en dispositivo: {len(usuarios) - len(errores)} de {len(usuarios)}")
+            return errores
+        finally:
+            self._desconectar_medido("registrar_usuarios")
 
     def eliminar_usuario(self, uid: int) -> bool:
         """Elimina un usuario del dispositivo por su uid"""
-        conn = self.conectar()
+        conn = self._conectar_medido("eliminar_usuario")
         try:
-            conn.disable_device()
-            conn.delete_user(uid=uid)
-            conn.enable_device()
+            with self._fase("eliminar_usuario", "escritura"):
+                conn.disable_device()
+                conn.delete_user(uid=uid)
+                conn.enable_device()
             logger.info(f"Usuario eliminado del dispositivo: uid={uid}")
             return True
         finally:
-            self.desconectar()
+            self._desconectar_medido("eliminar_usuario")
 
     def test_conexion(self) -> dict:
         """Prueba la conexión al dispositivo y retorna info básica"""
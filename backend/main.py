@@ -4,19 +4,30 @@ Aplicacion principal de FastAPI
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
+from contextlib import asynccontextmanager
+from starlette.concurrency import run_in_threadpool
 import logging
-import secrets
 import uvicorn
 from pathlib import Path
 from app.config import settings
 from app.routes import zkteco
-from app.database.db import Base, engine
+from app.database.db import preparar_bd, cerrar_engine, cerrar_engine_async
 from app.models.usuario import Usuario  # Registrar modelo para crear tabla
 from app.models.auditlog import AuditLog  # Registrar modelo audit log
+from app.models.ratelimit import RateLimitContador  # Registrar modelo rate limit
+from app.models.estado_runtime import EstadoRuntime  # Registrar modelo estado compartido
+from app.services.audit_service import audit_service
+from app.services.estado_compartido import estado_compartido
+from app.services.csrf_service import csrf_service
+from app.services.assets import assets, CACHE_INMUTABLE
+from app.services.salud import monitor_salud
+from app.services.spool import spool_ingesta
+from app.middleware import MiddlewareApi
+from app.services import metrics
 
 # Configurar logging
 logging.basicConfig(
@@ -25,14 +36,37 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Crear tablas
-Base.metadata.create_all(bind=engine)
-
 # Rate limiter
-limiter = Limiter(key_func=get_remote_address)
+limiter = Limiter(key_func=get_remote_address, storage_uri=settings.rate_limit_storage_uri)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Arranque: esquema de BD y estado compartido. Apagado: audit log y pool"""
+    # Sin BD disponible la app arranca igual: las rutas fallan hasta que responda
+    if not await run_in_threadpool(preparar_bd, settings.db_reintentos_inicio, settings.db_espera_reintento):
+        logger.warning("Arranque sin BD: no se verifico el esquema")
+    await run_in_threadpool(zkteco.aplicar_config_guardada)
+    if settings.assets_empaquetar:
+        await run_in_threadpool(assets.construir)
+    # Cambios de otros workers (config del dispositivo, invalidaciones de caches)
+    estado_compartido.iniciar()
+    # Foto de BD/pool/dispositivo que sirve /health/ready sin I/O por probe
+    monitor_salud.iniciar()
+    # Recupera el spool de ingesta y reintenta en segundo plano lo que no llego a la BD
+    spool_ingesta.iniciar()
+    yield
+    spool_ingesta.detener()
+    monitor_salud.detener()
+    estado_compartido.detener()
+    # Escribe las entradas de audit pendientes antes de apagar
+    audit_service.detener()
+    cerrar_engine()
+    await cerrar_engine_async()
+
 
 # Crear aplicacion FastAPI
 app = FastAPI(
+    lifespan=lifespan,
     title="Sistema de Registro de Personal",
     description="API para gestion de asistencia con dispositivo ZKTeco",
     version="1.0.0",
@@ -43,6 +77,7 @@ app = FastAPI(
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+
 # Configurar CORS - solo origenes permitidos
 cors_origins = [origin.strip() for origin in settings.cors_origins.split(",") if origin.strip()]
 app.add_middleware(
@@ -50,90 +85,22 @@ app.add_middleware(
     allow_origins=cors_origins,
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE"],
-    allow_headers=["Content-Type", "X-API-Key", "X-CSRF-Token"],
+    allow_headers=["Content-Type", "Authorization", "X-API-Key", "X-CSRF-Token"],
 )
 
-# Middleware: autenticacion por API Key (solo rutas /api/)
-@app.middleware("http")
-async def verificar_api_key(request: Request, call_next):
-    # Rutas publicas que no requieren API key
-    ruta = request.url.path
-    rutas_publicas = ["/", "/health", "/api/docs", "/api/redoc", "/openapi.json", "/api/auth/login", "/api/auth/registro", "/api/auth/check", "/api/sucursal", "/api/csrf-token"]
-    es_estatico = ruta.startswith("/static")
-    es_publica = ruta in rutas_publicas or es_estatico
-
-    if not es_publica and settings.api_key:
-        api_key = request.headers.get("X-API-Key", "")
-        if api_key != settings.api_key:
-            return JSONResponse(
-                status_code=401,
-                content={"detail": "API Key invalida o no proporcionada"}
-            )
-
-    response = await call_next(request)
-    return response
-
-# Middleware: CSRF protection para mutaciones (POST/PUT/DELETE)
-_csrf_tokens: dict[str, float] = {}  # token -> timestamp
-CSRF_TOKEN_MAX_AGE = 3600 * 8  # 8 horas
-
-@app.middleware("http")
-async def verificar_csrf(request: Request, call_next):
-    if request.method in ("POST", "PUT", "DELETE"):
-        ruta = request.url.path
-        # Excluir rutas publicas de CSRF
-        rutas_sin_csrf = ["/api/auth/login", "/api/auth/registro"]
-        if ruta not in rutas_sin_csrf:
-            csrf_token = request.headers.get("X-CSRF-Token", "")
-            if not csrf_token or csrf_token not in _csrf_tokens:
-                return JSONResponse(
-                    status_code=403,
-                    content={"detail": "CSRF token invalido o faltante"}
-                )
-            # Verificar expiración
-            import time
-            if time.time() - _csrf_tokens[csrf_token] > CSRF_TOKEN_MAX_AGE:
-                del _csrf_tokens[csrf_token]
-                return JSONResponse(
-                    status_code=403,
-                    content={"detail": "CSRF token expirado"}
-                )
-    response = await call_next(request)
-    return response
-
-# Middleware: manejo global de errores
-@app.middleware("http")
-async def manejar_errores(request: Request, call_next):
-    try:
-        response = await call_next(request)
-        return response
-    except Exception as e:
-        logger.error(f"Error no manejado en {request.method} {request.url.path}: {e}")
-        return JSONResponse(
-            status_code=500,
-            content={"detail": "Error interno del servidor"}
-        )
-
-# Middleware: logging de requests
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    if request.url.path.startswith("/api/"):
-        import time
-        start = time.time()
-        response = await call_next(request)
-        duration_ms = round((time.time() - start) * 1000)
-        ip = request.client.host if request.client else "-"
-        logger.info(f"{request.method} {request.url.path} -> {response.status_code} ({duration_ms}ms) [{ip}]")
-        return response
-    response = await call_next(request)
-    return response
+# Middleware unico (ASGI puro): autenticacion, CSRF, errores y log de requests
+app.add_middleware(MiddlewareApi)
 
 # Incluir rutas
 from app.routes import personal as personal_routes
 from app.routes import auth as auth_routes
+from app.routes import auditlog as auditlog_routes
+from app.routes import eventos as eventos_routes
 app.include_router(zkteco.router)
 app.include_router(personal_routes.router)
 app.include_router(auth_routes.router)
+app.include_router(auditlog_routes.router)
+app.include_router(eventos_routes.router)
 
 # Servir archivos estaticos del frontend
 frontend_path = Path(__file__).parent.parent / "frontend"
@@ -141,73 +108,62 @@ if frontend_path.exists():
     app.mount("/static", StaticFiles(directory=str(frontend_path)), name="static")
 
 @app.get("/")
-def read_root():
-    """Endpoint raiz - sirve el frontend"""
+def read_root(request: Request):
+    """Endpoint raiz - sirve el frontend (index apuntando a los bundles de /assets)"""
+    if settings.assets_empaquetar and (assets.index is not None or assets.construir()):
+        return assets.index.respuesta(request, "no-cache")
     frontend_file = frontend_path / "index.html"
     if frontend_file.exists():
         return FileResponse(frontend_file)
     return {"nombre": "Sistema de Registro de Personal", "version": "1.0.0"}
 
+@app.get("/assets/{nombre}", include_in_schema=False)
+def servir_asset(nombre: str, request: Request):
+    """Bundles con hash de contenido en el nombre: cacheables para siempre"""
+    recurso = assets.obtener(nombre)
+    if recurso is None:
+        return PlainTextResponse("No encontrado\n", status_code=404)
+    return recurso.respuesta(request, CACHE_INMUTABLE)
+
+@app.get("/health/live")
+def health_live():
+    """Liveness: el proceso responde (sin I/O; no depende de BD ni dispositivo)"""
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+def health_ready():
+    """Readiness desde la ultima foto del monitor: BD alcanzable y pool con margen"""
+    foto = monitor_salud.foto()
+    listo, motivo = monitor_salud.listo(foto)
+    contenido = {"status": "ok" if listo else "no_listo", "motivo": motivo, **(foto or {})}
+    return JSONResponse(status_code=200 if listo else 503, content=contenido)
+
 @app.get("/health")
 def health_check():
-    """Verificar estado de la API y conexion a DB"""
-    from app.database.db import SessionLocal
-    try:
-        db = SessionLocal()
-        db.execute(__import__("sqlalchemy").text("SELECT 1"))
-        db.close()
+    """Compatibilidad: mismo criterio que /health/ready con la respuesta de antes"""
+    foto = monitor_salud.foto()
+    listo, _ = monitor_salud.listo(foto)
+    if listo:
         return {"status": "ok", "database": "connected"}
-    except Exception as e:
-        logger.error(f"Health check - DB error: {e}")
-        return JSONResponse(status_code=503, content={"status": "error", "database": "disconnected"})
+    return JSONResponse(status_code=503, content={"status": "error", "database": "disconnected"})
+
+@app.get("/metrics", include_in_schema=False)
+def exponer_metricas(request: Request):
+    """Metricas en formato de texto de Prometheus"""
+    if settings.metrics_token and request.headers.get("Authorization") != f"Bearer {settings.metrics_token}":
+        return PlainTextResponse("No autorizado\n", status_code=401)
+    return PlainTextResponse(metrics.metricas.exponer(), media_type=metrics.CONTENT_TYPE)
 
 @app.get("/api/csrf-token")
 def obtener_csrf_token():
-    """Genera un CSRF token para proteger operaciones de escritura"""
-    import time
-    # Limpiar tokens expirados (max 1000)
-    ahora = time.time()
-    expirados = [t for t, ts in _csrf_tokens.items() if ahora - ts > CSRF_TOKEN_MAX_AGE]
-    for t in expirados:
-        del _csrf_tokens[t]
-    token = secrets.token_hex(32)
-    _csrf_tokens[token] = ahora
-    return {"csrf_token": token}
+    """Genera un CSRF token firmado (sin estado en el servidor)"""
+    return {"csrf_token": csrf_service.generar()}
 
 @app.get("/api/sucursal")
 def info_sucursal():
     """Retorna informacion de la sucursal"""
     return {"nombre": settings.sucursal_nombre}
 
-@app.get("/api/audit-log")
-def obtener_audit_log(limit: int = 50, skip: int = 0):
-    """Obtener los ultimos registros del historial de cambios"""
-    from app.database.db import SessionLocal
-    limit = max(1, min(limit, 200))
-    skip = max(0, skip)
-    db = SessionLocal()
-    try:
-        registros = db.query(AuditLog).order_by(AuditLog.fecha.desc()).offset(skip).limit(limit).all()
-        total = db.query(AuditLog).count()
-        return {
-            "total": total,
-            "registros": [
-                {
-                    "id": r.id,
-                    "accion": r.accion,
-                    "entidad": r.entidad,
-                    "entidad_id": r.entidad_id,
-                    "detalle": r.detalle,
-                    "usuario": r.usuario,
-                    "ip": r.ip,
-                    "fecha": r.fecha.isoformat() if r.fecha else None,
-                }
-                for r in registros
-            ]
-        }
-    finally:
-        db.close()
-
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
@@ -0,0 +1,91 @@
+"""
+Benchmark del tiempo de arranque de la app.
+
+Uso:
+    cd backend
+    python scripts/bench_arranque.py [--repeticiones N] [--database-url URL]
+
+Mide en procesos nuevos (cold start) dos cosas:
+  - `import main`: lo que paga cada worker, la recoleccion de tests y alembic
+  - `uvicorn main:app`: desde el spawn hasta que /health/live (o /health) responde
+Con --database-url apuntando a un servidor caido (ej. postgresql://x:x@127.0.0.1:1/x)
+se ve el costo de arrancar sin BD.
+"""
+import sys
+import os
+import argparse
+import socket
+import statistics
+import subprocess
+import time
+import urllib.request
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _entorno(database_url: str) -> dict:
+    env = dict(os.environ)
+    if database_url:
+        env["DATABASE_URL"] = database_url
+    return env
+
+
+def medir_import(env: dict) -> tuple[float, bool]:
+    """(segundos, exito): sin BD el import puede fallar, igual interesa cuanto tardo"""
+    inicio = time.perf_counter()
+    resultado = subprocess.run([sys.executable, "-c", "import main"], cwd=BACKEND, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - inicio, resultado.returncode == 0
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def medir_uvicorn(env: dict, limite: float = 40.0) -> float:
+    puerto = _puerto_libre()
+    inicio = time.perf_counter()
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(puerto), "--log-level", "warning"],
+        cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - inicio < limite:
+            for ruta in ("/health/live", "/health"):
+                try:
+                    urllib.request.urlopen(f"http://127.0.0.1:{puerto}{ruta}", timeout=0.5)
+                    return time.perf_counter() - inicio
+                except urllib.error.HTTPError as e:
+                    if e.code != 404:
+                        return time.perf_counter() - inicio
+                except OSError:
+                    pass
+            time.sleep(0.02)
+        return float("inf")
+    finally:
+        proceso.terminate()
+        proceso.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--database-url", default="")
+    args = parser.parse_args()
+    env = _entorno(args.database_url)
+
+    resultados = [medir_import(env) for _ in range(args.repeticiones)]
+    imports = [segundos for segundos, _ in resultados]
+    fallidos = sum(1 for _, exito in resultados if not exito)
+    servidores = [medir_uvicorn(env) for _ in range(args.repeticiones)]
+    print(f"Repeticiones: {args.repeticiones}  BD: {args.database_url or '(DATABASE_URL del .env)'}")
+    print(f"  import main        mediana {statistics.median(imports):6.2f}s  (min {min(imports):.2f}s)"
+          + (f"  [{fallidos} con error]" if fallidos else ""))
+    print(f"  uvicorn main:app   mediana {statistics.median(servidores):6.2f}s  (min {min(servidores):.2f}s)"
+          + ("  [inf = no respondio]" if float("inf") in servidores else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Benchmark de throughput con muchos clientes concurrentes: sesion sync vs async.
+
+Uso:
+    cd backend
+    python scripts/bench_concurrencia.py [--clientes 200] [--segundos 10] [--espera-ms 20]
+                                         [--database-url URL]
+
+Levanta uvicorn (un worker) con dos rutas que hacen la misma lectura que la lista de
+personal (columnas de personal activo ordenadas por id, 200 filas):
+  - /sync:  `def` + get_db        -> cada request ocupa un hilo del threadpool
+  - /async: `async def` + get_async_db -> espera a la BD en el event loop
+--espera-ms agrega `SELECT pg_sleep(...)` a cada request para simular la latencia de
+red/servidor de un Postgres real (en SQLite se registra una funcion equivalente).
+Sin --database-url usa una BD SQLite temporal con 500 empleados.
+"""
+import sys
+import os
+import argparse
+import asyncio
+import socket
+import statistics
+import subprocess
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+
+def crear_app(espera: float):
+    from fastapi import Depends, FastAPI
+    from sqlalchemy import event, select, text
+    from app.database import db as bd
+    from app.models.personal import Personal
+
+    columnas = (Personal.id, Personal.nombre, Personal.apellido, Personal.puesto, Personal.turno)
+    consulta = select(*columnas).where(Personal.activo == True).order_by(Personal.id).limit(200)
+    pausa = text("SELECT pg_sleep(:s)").bindparams(s=espera)
+
+    if bd.settings.database_url.startswith("sqlite"):
+        def _sleep(conexion, _):
+            conexion.create_function("pg_sleep", 1, time.sleep)
+        event.listen(bd.get_engine(), "connect", _sleep)
+        event.listen(bd.get_async_engine().sync_engine, "connect", _sleep)
+
+    app = FastAPI()
+
+    @app.get("/sync")
+    def leer_sync(db=Depends(bd.get_db)):
+        if espera:
+            db.execute(pausa)
+        return [dict(f._mapping) for f in db.execute(consulta)]
+
+    @app.get("/async")
+    async def leer_async(db=Depends(bd.get_async_db)):
+        if espera:
+            await db.execute(pausa)
+        return [dict(f._mapping) for f in await db.execute(consulta)]
+
+    return app
+
+
+def sembrar(database_url: str, empleados: int = 500):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from app.database.db import Base
+    from app.models.personal import Personal
+
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as s:
+        s.add_all([
+            Personal(nombre=f"Nombre{i}", apellido=f"Apellido{i}", documento=f"DOC{i:05d}",
+                     puesto="cajero", turno="mañana")
+            for i in range(empleados)
+        ])
+        s.commit()
+    engine.dispose()
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _esperar_servidor(puerto: int, limite: float = 30.0):
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < limite:
+        try:
+            with socket.create_connection(("127.0.0.1", puerto), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("El servidor no arranco")
+
+
+async def cargar(url: str, clientes: int, segundos: float) -> tuple[int, int, list[float]]:
+    """Cada cliente repite requests hasta agotar el tiempo; retorna (ok, errores, latencias)"""
+    import httpx
+
+    latencias: list[float] = []
+    errores = 0
+    limites = httpx.Limits(max_connections=clientes, max_keepalive_connections=clientes)
+    async with httpx.AsyncClient(limits=limites, timeout=60) as http:
+        await http.get(url)  # calentar pool y roster
+        fin = time.perf_counter() + segundos
+
+        async def cliente():
+            nonlocal errores
+            while time.perf_counter() < fin:
+                inicio = time.perf_counter()
+                try:
+                    resp = await http.get(url)
+                    if resp.status_code != 200:
+                        errores += 1
+                        continue
+                except httpx.HTTPError:
+                    errores += 1
+                    continue
+                latencias.append(time.perf_counter() - inicio)
+
+        await asyncio.gather(*(cliente() for _ in range(clientes)))
+    return len(latencias), errores, latencias
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clientes", type=int, default=200)
+    parser.add_argument("--segundos", type=float, default=10.0)
+    parser.add_argument("--espera-ms", type=float, default=20.0)
+    parser.add_argument("--database-url", default="")
+    parser.add_argument("--servir", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.servir:
+        import uvicorn
+        uvicorn.run(crear_app(args.espera_ms / 1000), host="127.0.0.1", port=args.servir,
+                    log_level="warning", access_log=False)
+        return
+
+    temporal = None
+    database_url = args.database_url
+    if not database_url:
+        temporal = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        temporal.close()
+        database_url = f"sqlite:///{temporal.name}"
+        sembrar(database_url)
+
+    puerto = _puerto_libre()
+    proceso = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--servir", str(puerto),
+         "--espera-ms", str(args.espera_ms)],
+        cwd=BACKEND, env={**os.environ, "DATABASE_URL": database_url},
+    )
+    try:
+        _esperar_servidor(puerto)
+        print(f"Clientes: {args.clientes}  Duracion: {args.segundos}s  Espera BD: {args.espera_ms}ms  "
+              f"BD: {database_url}")
+        for ruta in ("/sync", "/async"):
+            ok, errores, latencias = asyncio.run(
+                cargar(f"http://127.0.0.1:{puerto}{ruta}", args.clientes, args.segundos)
+            )
+            latencias.sort()
+            p95 = latencias[int(len(latencias) * 0.95)] if latencias else float("nan")
+            mediana = statistics.median(latencias) if latencias else float("nan")
+            print(f"  {ruta:<7} {ok / args.segundos:8.1f} req/s   p50 {mediana * 1000:7.1f}ms   "
+                  f"p95 {p95 * 1000:7.1f}ms   errores {errores}")
+    finally:
+        proceso.terminate()
+        proceso.wait()
+        if temporal is not None:
+            os.unlink(temporal.name)
+
+
+if __name__ == "__main__":
+    main()
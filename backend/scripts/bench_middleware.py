@@ -0,0 +1,133 @@
+"""
+Micro-benchmark del costo por request de los middlewares HTTP.
+
+Uso:
+    cd backend
+    python scripts/bench_middleware.py [requests]
+
+Compara las cuatro capas @app.middleware("http") anteriores (BaseHTTPMiddleware)
+contra el MiddlewareApi unico, invocando la app ASGI directamente (sin red ni
+servidor) sobre una ruta que no hace nada, para medir solo el overhead.
+"""
+import sys
+import os
+import asyncio
+import logging
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from app.config import settings
+from app.middleware import MiddlewareApi, RUTAS_PUBLICAS, RUTAS_SIN_CSRF
+from app.services.csrf_service import csrf_service
+from app.services.session_service import session_service
+
+
+def _ruta(app: FastAPI):
+    @app.get("/api/ping")
+    def ping():
+        return {"ok": True}
+
+
+def app_anterior() -> FastAPI:
+    """Replica de las cuatro capas que tenia main.py"""
+    app = FastAPI()
+    _ruta(app)
+
+    @app.middleware("http")
+    async def verificar_api_key(request: Request, call_next):
+        request.state.principal = None
+        autorizacion = request.headers.get("Authorization", "")
+        if autorizacion.startswith("Bearer "):
+            request.state.principal = await session_service.autenticar_async(autorizacion[7:])
+        es_publica = request.url.path in RUTAS_PUBLICAS or request.url.path.startswith("/static")
+        if not es_publica and request.state.principal is None and settings.api_key:
+            if request.headers.get("X-API-Key", "") != settings.api_key:
+                return JSONResponse(status_code=401, content={"detail": "API Key invalida"})
+        return await call_next(request)
+
+    @app.middleware("http")
+    async def verificar_csrf(request: Request, call_next):
+        if request.method in ("POST", "PUT", "DELETE") and request.url.path not in RUTAS_SIN_CSRF:
+            error = csrf_service.verificar(request.headers.get("X-CSRF-Token", ""))
+            if error:
+                return JSONResponse(status_code=403, content={"detail": error})
+        return await call_next(request)
+
+    @app.middleware("http")
+    async def manejar_errores(request: Request, call_next):
+        try:
+            return await call_next(request)
+        except Exception:
+            return JSONResponse(status_code=500, content={"detail": "Error interno del servidor"})
+
+    @app.middleware("http")
+    async def log_requests(request: Request, call_next):
+        start = time.time()
+        response = await call_next(request)
+        logging.getLogger("bench").info(f"{request.url.path} {round((time.time() - start) * 1000)}ms")
+        return response
+
+    return app
+
+
+def app_actual() -> FastAPI:
+    app = FastAPI()
+    _ruta(app)
+    app.add_middleware(MiddlewareApi)
+    return app
+
+
+def app_sin_middleware() -> FastAPI:
+    app = FastAPI()
+    _ruta(app)
+    return app
+
+
+async def medir(app, n: int) -> float:
+    """Microsegundos promedio por request GET /api/ping"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/api/ping", "raw_path": b"/api/ping",
+        "query_string": b"", "root_path": "", "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1234), "server": ("bench", 80),
+    }
+
+    def receptor():
+        # Primero el body vacio; despues el request queda "abierto" como en un servidor real
+        enviado = False
+
+        async def receive():
+            nonlocal enviado
+            if not enviado:
+                enviado = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await asyncio.Event().wait()
+        return receive
+
+    async def send(message):
+        pass
+
+    for _ in range(200):  # calentamiento
+        await app(dict(scope), receptor(), send)
+    inicio = time.perf_counter()
+    for _ in range(n):
+        await app(dict(scope), receptor(), send)
+    return (time.perf_counter() - inicio) / n * 1e6
+
+
+async def main(n: int):
+    logging.basicConfig(level=logging.WARNING)  # el costo del log no es parte de la medicion
+    base = await medir(app_sin_middleware(), n)
+    anterior = await medir(app_anterior(), n)
+    actual = await medir(app_actual(), n)
+    print(f"Requests por variante: {n}")
+    print(f"  sin middleware        {base:8.1f} us/request")
+    print(f"  4x BaseHTTPMiddleware {anterior:8.1f} us/request  (overhead {anterior - base:7.1f} us)")
+    print(f"  MiddlewareApi (ASGI)  {actual:8.1f} us/request  (overhead {actual - base:7.1f} us)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
@@ -2,17 +2,29 @@
 Fixtures compartidos para tests
 """
 import pytest
+from contextlib import contextmanager
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
 from sqlalchemy.orm import sessionmaker
-from app.database.db import Base, get_db
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app.database.db import Base, get_db, get_async_db, get_db_lectura, get_async_db_lectura, url_async
 from app.models.personal import Personal
 from app.models.usuario import Usuario
+from app.services import sql_profiler
+from app.services.estado_compartido import estado_compartido
 
 # BD en memoria para tests
 TEST_DATABASE_URL = "sqlite:///./test_registro.db"
 engine = create_engine(TEST_DATABASE_URL, connect_args={"check_same_thread": False})
 TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+sql_profiler.instrumentar(engine)
+# Misma BD para las rutas async (NullPool: cada request abre y cierra su conexion)
+async_engine = create_async_engine(url_async(TEST_DATABASE_URL), poolclass=NullPool)
+TestAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+sql_profiler.instrumentar(async_engine.sync_engine)
+# Servicios que abren sus propias sesiones usan la BD de prueba
+estado_compartido.session_factory = TestSessionLocal
 
 
 def override_get_db():
@@ -23,6 +35,11 @@ def override_get_db():
         db.close()
 
 
+async def override_get_async_db():
+    async with TestAsyncSessionLocal() as db:
+        yield db
+
+
 @pytest.fixture(scope="function")
 def db():
     """Crea tablas frescas para cada test"""
@@ -34,23 +51,38 @@ def db():
 
 
 @pytest.fixture(scope="function")
-def client(db):
-    """TestClient con BD de prueba y CSRF deshabilitado"""
-    from main import app, _csrf_tokens
-    import time
+def client(db, tmp_path):
+    """TestClient con BD de prueba y un CSRF token valido"""
+    from main import app
+    from app.services.audit_service import audit_service
+    from app.services.csrf_service import csrf_service
+    from app.services.roster_cache import roster_cache
+    from app.services.session_service import session_service
+    from app.services.spool import spool_ingesta
+    from app.routes import zkteco
 
     app.dependency_overrides[get_db] = override_get_db
-
-    # Generar CSRF token válido para tests
-    test_token = "test-csrf-token-for-testing"
-    _csrf_tokens[test_token] = time.time()
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_db_lectura] = override_get_db
+    app.dependency_overrides[get_async_db_lectura] = override_get_async_db
+    audit_service.session_factory = TestSessionLocal
+    roster_cache.invalidar()
+    session_service.session_factory = TestSessionLocal
+    session_service.invalidar()
+    # Spool de ingesta vacio por test, fuera del arbol del proyecto
+    spool_ingesta.cerrar()
+    spool_ingesta.directorio = tmp_path / "spool"
+    spool_ingesta.session_factory = TestSessionLocal
+    # Los limites por minuto de las rutas del dispositivo no se arrastran entre tests
+    zkteco.limiter.reset()
 
     c = TestClient(app)
-    c.headers["X-CSRF-Token"] = test_token
+    c.headers["X-CSRF-Token"] = csrf_service.generar()
     yield c
 
+    audit_service.flush()
+    spool_ingesta.cerrar()
     app.dependency_overrides.clear()
-    _csrf_tokens.clear()
 
 
 @pytest.fixture
@@ -78,3 +110,23 @@ def usuario_data():
         "nombre": "Test User",
         "rol": "admin",
     }
+
+
+@pytest.fixture
+def presupuesto_consultas():
+    """
+    Limita las consultas SQL de los requests hechos dentro del bloque:
+
+        with presupuesto_consultas(3):
+            client.get("/api/personal/1")
+    """
+    @contextmanager
+    def _presupuesto(maximo: int):
+        with sql_profiler.capturar() as perfiles:
+            yield perfiles
+        for perfil in perfiles:
+            assert perfil.consultas <= maximo, (
+                f"{perfil.ruta}: {perfil.consultas} consultas (presupuesto {maximo}); "
+                f"repetidas: {perfil.repetidas(2)}"
+            )
+    return _presupuesto
@@ -0,0 +1,40 @@
+"""
+Tests para el arranque sin efectos secundarios (engine lazy + lifespan)
+"""
+import subprocess
+import sys
+from pathlib import Path
+from fastapi.testclient import TestClient
+
+BACKEND = Path(__file__).parent.parent
+
+
+def test_import_main_no_conecta():
+    """Importar main no crea el engine ni toca la BD, aunque la URL sea inalcanzable"""
+    codigo = (
+        "import main, app.database.db as db; "
+        "assert db._engine is None, 'engine creado al importar'; "
+        "assert db._async_engine is None, 'engine async creado al importar'"
+    )
+    resultado = subprocess.run(
+        [sys.executable, "-c", codigo], cwd=BACKEND, capture_output=True, text=True, timeout=60,
+        env={**__import__("os").environ, "DATABASE_URL": "postgresql://x:x@127.0.0.1:1/x"},
+    )
+    assert resultado.returncode == 0, resultado.stderr
+
+
+def test_lifespan_arranca_sin_bd(monkeypatch):
+    """Si la BD no responde el lifespan registra el problema y la app arranca igual"""
+    import main
+    from app.routes import zkteco
+    llamadas = []
+    monkeypatch.setattr(main, "preparar_bd", lambda *a: llamadas.append("bd") or False)
+    monkeypatch.setattr(zkteco, "aplicar_config_guardada", lambda: llamadas.append("config"))
+    monkeypatch.setattr(main.audit_service, "detener", lambda: llamadas.append("audit"))
+    monkeypatch.setattr(main.estado_compartido, "iniciar", lambda: llamadas.append("estado"))
+    monkeypatch.setattr(main.monitor_salud, "iniciar", lambda: llamadas.append("salud"))
+    monkeypatch.setattr(main.spool_ingesta, "iniciar", lambda: llamadas.append("spool"))
+
+    with TestClient(main.app) as client:
+        assert client.get("/api/sucursal").status_code == 200
+    assert llamadas == ["bd", "config", "estado", "salud", "spool", "audit"]
@@ -0,0 +1,62 @@
+"""
+Tests para el empaquetado del frontend (bundles con hash, cache inmutable, gzip/brotli)
+"""
+import gzip
+import re
+
+from app.services.assets import CACHE_INMUTABLE, assets, minificar_css, minificar_js
+
+
+def test_minificar_js_respeta_strings_templates_y_regex():
+    codigo = (
+        "// comentario de linea\n"
+        "const url = 'http://host/api'; /* bloque */\n"
+        "    const re = /\\/\\/+/g;\n"
+        "const t = `a // b ${x ? '}' : \"/*\"} c`;\n"
+        "\n\n"
+        "const d = a / b / c;\n"
+    )
+    resultado = minificar_js(codigo)
+    assert "comentario" not in resultado and "bloque" not in resultado
+    assert "'http://host/api'" in resultado
+    assert "/\\/\\/+/g" in resultado
+    assert "`a // b ${x ? '}' : \"/*\"} c`" in resultado
+    assert "const d = a / b / c;" in resultado
+    assert "\n\n" not in resultado
+
+
+def test_minificar_css():
+    assert minificar_css("/* x */\n.a > .b ,\n.c {\n  color: red;\n}\n") == ".a>.b,.c{color: red}\n"
+
+
+def test_index_apunta_a_bundles(client):
+    resp = client.get("/")
+    assert resp.status_code == 200
+    assert resp.headers["cache-control"] == "no-cache"
+    html = resp.text
+    assert "/static/js/" not in html and "/static/css/" not in html
+    nombres = re.findall(r'/assets/(app\.[0-9a-f]{12}\.(?:js|css))', html)
+    assert len(nombres) == 2
+
+    js = next(n for n in nombres if n.endswith(".js"))
+    resp = client.get(f"/assets/{js}", headers={"Accept-Encoding": "gzip"})
+    assert resp.status_code == 200
+    assert resp.headers["cache-control"] == CACHE_INMUTABLE
+    assert resp.headers["content-encoding"] == "gzip"
+    assert resp.headers["content-type"].startswith("application/javascript")
+    # Partials incluidos: el cliente no los pide uno por uno
+    assert "window.PARTIALS_EMPAQUETADOS=" in resp.text
+    assert "async function cargarPartials" in resp.text
+
+    etag = resp.headers["etag"]
+    assert client.get(f"/assets/{js}", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/assets/app.000000000000.js").status_code == 404
+
+
+def test_variantes_precomprimidas():
+    assets.construir()
+    for recurso in assets.bundles.values():
+        assert gzip.decompress(recurso.variantes["gzip"]) == recurso.contenido
+        cuerpo, codificacion = recurso.elegir("gzip, deflate, br")
+        assert codificacion == ("br" if "br" in recurso.variantes else "gzip")
+        assert recurso.elegir("identity") == (recurso.contenido, None)
@@ -0,0 +1,76 @@
+"""
+Tests para el acceso async a la BD (rutas de lectura sobre AsyncSession)
+"""
+from app.database.db import url_async
+from app.models.asistencia import Asistencia  # noqa: F401 (tabla para create_all)
+from app.models.auditlog import AuditLog  # noqa: F401
+from app.services.roster_cache import roster_cache
+
+
+def test_url_async_cambia_solo_el_driver():
+    assert url_async("postgresql://u:p@db:5432/registro") == "postgresql+asyncpg://u:p@db:5432/registro"
+    assert url_async("postgresql+psycopg2://u:p@db/registro") == "postgresql+asyncpg://u:p@db/registro"
+    assert url_async("sqlite:///./registro.db") == "sqlite+aiosqlite:///./registro.db"
+    assert url_async("sqlite+aiosqlite:///./x.db") == "sqlite+aiosqlite:///./x.db"
+
+
+def test_reporte_mensual_async_usa_cache_de_roster(client, personal_data, presupuesto_consultas):
+    """El reporte carga el roster una vez; los siguientes solo consultan asistencia"""
+    pid = client.post("/api/personal/", json=personal_data).json()["id"]
+    assert client.get(f"/api/personal/{pid}/reporte-mensual?mes=3&anio=2026").status_code == 200
+    cargas = roster_cache.cargas
+
+    with presupuesto_consultas(2):  # version de los marcajes (ETag) + marcajes del mes
+        resp = client.get(f"/api/personal/{pid}/reporte-mensual?mes=3&anio=2026")
+    assert resp.status_code == 200
+    assert resp.json()["nombre"] == "Juan Perez"
+    assert roster_cache.cargas == cargas
+    assert client.get("/api/personal/99999/reporte-mensual").status_code == 404
+
+
+def test_rutas_async_leen_lo_escrito_por_la_sesion_sync(client, personal_data):
+    """Lista, dashboard y audit log (async) ven las altas hechas por rutas sync"""
+    client.post("/api/personal/", json=personal_data)
+    from app.services.audit_service import audit_service
+    audit_service.flush()
+
+    lista = client.get("/api/personal/?fields=id,nombre")
+    assert lista.status_code == 200
+    assert [p["nombre"] for p in lista.json()] == ["Juan"]
+    assert client.get("/api/personal/stats/dashboard").json()["total_personal"] == 1
+    audit = client.get("/api/audit-log?total=exacto").json()
+    assert audit["total"] >= 1
+    assert audit["registros"][0]["entidad"] == "personal"
+
+
+def test_exportar_reporte_reusa_reporte_async(client, personal_data):
+    pid = client.post("/api/personal/", json=personal_data).json()["id"]
+    resp = client.get(f"/api/personal/{pid}/exportar-reporte?mes=3&anio=2026")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/csv")
+    assert "Reporte de Asistencia - Juan Perez" in resp.text
+    assert client.get(f"/api/personal/{pid}/exportar-reporte?mes=3&anio=2026&formato=excel").status_code == 200
+
+
+def test_calculo_del_dashboard_y_archivo_del_reporte_fuera_del_event_loop(client, personal_data, monkeypatch):
+    """El trabajo de CPU corre en el threadpool, no en el hilo del event loop"""
+    import asyncio
+    from app.routes import personal as rutas_personal
+
+    en_loop = []
+    for nombre in ("_calcular_dashboard", "_archivo_reporte"):
+        original = getattr(rutas_personal, nombre)
+
+        def espia(*args, _original=original):
+            try:
+                asyncio.get_running_loop()
+                en_loop.append(True)
+            except RuntimeError:
+                en_loop.append(False)
+            return _original(*args)
+        monkeypatch.setattr(rutas_personal, nombre, espia)
+
+    pid = client.post("/api/personal/", json=personal_data).json()["id"]
+    assert client.get("/api/personal/stats/dashboard").status_code == 200
+    assert client.get(f"/api/personal/{pid}/exportar-reporte?mes=3&anio=2026&formato=excel").status_code == 200
+    assert en_loop == [False, False]
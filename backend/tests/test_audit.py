@@ -0,0 +1,97 @@
+"""
+Tests para el escritor de audit log por lotes
+"""
+from app.models.auditlog import AuditLog
+from app.services.audit_service import AuditService, audit_service
+
+
+def test_crud_encola_y_escribe_audit(client, db, personal_data):
+    """Las operaciones CRUD quedan registradas tras vaciar la cola"""
+    pid = client.post("/api/personal/", json=personal_data).json()["id"]
+    client.put(f"/api/personal/{pid}", json={"nombre": "Carlos"})
+    audit_service.flush()
+
+    acciones = [a.accion for a in db.query(AuditLog).order_by(AuditLog.id).all()]
+    assert acciones == ["crear", "actualizar"]
+
+
+def test_cola_llena_descarta_y_cuenta(monkeypatch):
+    """Con la cola llena las entradas se descartan sin bloquear el request"""
+    servicio = AuditService(max_cola=2, timeout_encolar=0)
+    monkeypatch.setattr(servicio, "_asegurar_hilo", lambda: None)
+    for i in range(5):
+        servicio.registrar("login", "usuario", i)
+    stats = servicio.stats()
+    assert stats["pendientes"] == 2
+    assert stats["descartados"] == 3
+
+
+def test_lote_fallido_se_cuenta(monkeypatch):
+    """Un error de BD no propaga excepcion y queda en el contador de fallidos"""
+    class SesionRota:
+        def execute(self, *a, **kw):
+            raise RuntimeError("BD caida")
+        def rollback(self):
+            pass
+        def close(self):
+            pass
+
+    servicio = AuditService()
+    servicio.session_factory = SesionRota
+    monkeypatch.setattr(servicio, "_asegurar_hilo", lambda: None)
+    servicio.registrar("crear", "personal", 1)
+    servicio.registrar("crear", "personal", 2)
+    servicio.flush()
+    assert servicio.stats()["fallidos"] == 2
+    assert servicio.stats()["pendientes"] == 0
+
+
+def test_estado_audit_log(client):
+    resp = client.get("/api/audit-log/estado")
+    assert resp.status_code == 200
+    assert {"pendientes", "escritos", "descartados", "fallidos"} <= set(resp.json())
+
+
+def _sembrar_audit(db, n=7):
+    from datetime import datetime
+    fecha = datetime(2026, 1, 1, 12, 0, 0)
+    # Misma fecha para todos: el desempate por id debe mantener el orden estable
+    db.add_all([
+        AuditLog(accion="crear" if i % 2 else "login", entidad="personal", entidad_id=i,
+                 usuario="admin" if i < 3 else "operador", fecha=fecha)
+        for i in range(n)
+    ])
+    db.commit()
+
+
+def test_audit_log_paginacion_cursor(client, db):
+    """Recorrer el log con cursor no repite ni omite registros"""
+    _sembrar_audit(db)
+    vistos = []
+    cursor = None
+    while True:
+        url = "/api/audit-log?limit=3&total=ninguno" + (f"&cursor={cursor}" if cursor else "")
+        data = client.get(url).json()
+        vistos += [r["id"] for r in data["registros"]]
+        cursor = data["siguiente_cursor"]
+        if not cursor:
+            break
+    assert vistos == sorted(vistos, reverse=True)
+    assert len(vistos) == len(set(vistos)) == 7
+    assert data["total"] is None
+
+
+def test_audit_log_filtros_y_total(client, db):
+    _sembrar_audit(db)
+    data = client.get("/api/audit-log?accion=crear&total=exacto").json()
+    assert data["total"] == 3
+    assert all(r["accion"] == "crear" for r in data["registros"])
+
+    data = client.get("/api/audit-log?usuario=admin&accion=login").json()
+    assert data["total_tipo"] == "aprox"
+    assert [r["entidad_id"] for r in data["registros"]] == [2, 0]
+
+
+def test_audit_log_cursor_invalido(client):
+    resp = client.get("/api/audit-log?cursor=no-es-un-cursor")
+    assert resp.status_code == 400
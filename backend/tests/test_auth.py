@@ -104,8 +104,8 @@ def test_registro_password_largo(client):
 
 def test_rate_limit_login(client, usuario_data):
     """Bloquear IP despues de 5 intentos fallidos"""
-    from app.routes.auth import _login_attempts
-    _login_attempts.clear()
+    from app.routes.auth import _login_limiter
+    _login_limiter.reiniciar()
 
     for i in range(5):
         client.post("/api/auth/login", json={
@@ -120,4 +120,82 @@ def test_rate_limit_login(client, usuario_data):
     })
     assert resp.status_code == 429
     assert "Demasiados intentos" in resp.json()["detail"]
-    _login_attempts.clear()
+    _login_limiter.reiniciar()
+
+
+def test_rate_limit_memoria_acotada():
+    """El backend en memoria desaloja las claves menos recientes (LRU)"""
+    from app.services.rate_limiter import MemoriaBackend, SlidingWindowLimiter
+    backend = MemoriaBackend(max_claves=100)
+    limiter = SlidingWindowLimiter(5, 60, backend)
+    for i in range(1000):
+        limiter.registrar(f"login:10.0.{i // 256}.{i % 256}")
+    assert len(backend._datos) == 100
+    assert "login:10.0.3.231" in backend._datos  # la ultima clave sigue presente
+
+
+def test_rate_limit_ventana_deslizante(monkeypatch):
+    """Los intentos de la ventana previa cuentan en proporcion al solape"""
+    from app.services.rate_limiter import MemoriaBackend, SlidingWindowLimiter
+    import time
+    limiter = SlidingWindowLimiter(5, 60, MemoriaBackend())
+    reloj = [6000.0]  # inicio exacto de una ventana
+    monkeypatch.setattr(time, "time", lambda: reloj[0])
+    for _ in range(5):
+        limiter.registrar("ip")
+    assert limiter.excedido("ip")
+    reloj[0] = 6000.0 + 60 + 30  # mitad de la siguiente ventana: 5 * 0.5 = 2.5
+    assert not limiter.excedido("ip")
+    reloj[0] = 6000.0 + 180  # dos ventanas despues ya no cuenta
+    assert not limiter.excedido("ip")
+
+
+def test_rate_limit_backend_db(db, monkeypatch):
+    """El backend SQL comparte los contadores via la tabla rate_limit"""
+    from app.services.rate_limiter import SQLBackend, SlidingWindowLimiter
+    from tests.conftest import TestSessionLocal
+    import time
+    monkeypatch.setattr(time, "time", lambda: 6000.0)
+    worker_a = SlidingWindowLimiter(3, 60, SQLBackend(TestSessionLocal))
+    worker_b = SlidingWindowLimiter(3, 60, SQLBackend(TestSessionLocal))
+    worker_a.registrar("login:1.2.3.4")
+    worker_b.registrar("login:1.2.3.4")
+    assert not worker_a.excedido("login:1.2.3.4")
+    worker_a.registrar("login:1.2.3.4")
+    assert worker_b.excedido("login:1.2.3.4")
+
+
+def test_login_migra_hash_legado(client, db):
+    """Un hash SHA-256+salt legado se reemplaza por bcrypt tras un login correcto"""
+    import hashlib
+    from app.models.usuario import Usuario
+    salt = "abcd1234"
+    legado = f"{salt}:{hashlib.sha256(f'{salt}password1234'.encode()).hexdigest()}"
+    db.add(Usuario(username="legado", password_hash=legado, nombre="Legado", rol="admin"))
+    db.commit()
+
+    resp = client.post("/api/auth/login", json={"username": "legado", "password": "password1234"})
+    assert resp.status_code == 200
+
+    db.expire_all()
+    usuario = db.query(Usuario).filter(Usuario.username == "legado").first()
+    assert usuario.password_hash.startswith("$2b$")
+    # El hash nuevo sigue aceptando el mismo password
+    resp = client.post("/api/auth/login", json={"username": "legado", "password": "password1234"})
+    assert resp.status_code == 200
+
+
+def test_hash_sobrecargado_responde_503(client, usuario_data, monkeypatch):
+    """Con la cola de hashing llena el login responde 503 en vez de encolar sin limite"""
+    from app.services.password_service import password_service
+    client.post("/api/auth/registro", json=usuario_data)
+    monkeypatch.setattr(password_service, "max_pendientes", 0)
+    resp = client.post("/api/auth/login", json={
+        "username": usuario_data["username"],
+        "password": usuario_data["password"],
+    })
+    assert resp.status_code == 503
+
+    stats = client.get("/api/auth/stats/hash").json()
+    assert stats["rechazados"] >= 1
+    assert stats["latencia"]["hash"]["count"] >= 1
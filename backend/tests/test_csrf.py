@@ -10,7 +10,8 @@ def test_csrf_token_endpoint(client):
     assert resp.status_code == 200
     data = resp.json()
     assert "csrf_token" in data
-    assert len(data["csrf_token"]) == 64  # hex de 32 bytes
+    ts, nonce, firma = data["csrf_token"].split(".")
+    assert len(firma) == 64  # HMAC-SHA256 en hex
 
 
 def test_post_sin_csrf_rechazado(client, personal_data):
@@ -49,3 +50,56 @@ def test_registro_sin_csrf_permitido(client):
         "nombre": "New User",
     })
     assert resp.status_code == 200
+
+
+def test_csrf_token_emitido_funciona_sin_estado():
+    """Un token recien emitido es aceptado por cualquier instancia con la misma clave"""
+    from app.services.csrf_service import CsrfService
+    otro_worker = CsrfService("clave-compartida")
+    token = CsrfService("clave-compartida").generar()
+    assert otro_worker.verificar(token) is None
+    assert CsrfService("otra-clave").verificar(token) is not None
+
+
+def test_csrf_token_manipulado_rechazado(client, personal_data):
+    token = client.get("/api/csrf-token").json()["csrf_token"]
+    ts, nonce, firma = token.split(".")
+    client.headers["X-CSRF-Token"] = f"{ts}.{'0' * len(nonce)}.{firma}"
+    resp = client.post("/api/personal/", json=personal_data)
+    assert resp.status_code == 403
+
+
+def test_csrf_token_expirado_rechazado(monkeypatch):
+    from app.services.csrf_service import csrf_service
+    import time
+    token = csrf_service.generar()
+    ahora = time.time()
+    monkeypatch.setattr(time, "time", lambda: ahora + csrf_service.max_edad + 1)
+    assert csrf_service.verificar(token) == "CSRF token expirado"
+
+
+def test_csrf_token_revocado_rechazado(client, personal_data):
+    from app.services.csrf_service import csrf_service
+    token = csrf_service.generar()
+    csrf_service.revocar(token)
+    client.headers["X-CSRF-Token"] = token
+    resp = client.post("/api/personal/", json=personal_data)
+    assert resp.status_code == 403
+    assert "revocado" in resp.json()["detail"]
+
+
+def test_csrf_token_no_ascii_rechazado(client, personal_data):
+    token = client.get("/api/csrf-token").json()["csrf_token"]
+    resp = client.post("/api/personal/", json=personal_data,
+                       headers={"X-CSRF-Token": token.encode() + b"\xe9\xe9"})
+    assert resp.status_code == 403
+    assert resp.json()["detail"] == "CSRF token invalido o faltante"
+
+
+def test_csrf_revocados_llenos_no_reactiva_tokens():
+    from app.services.csrf_service import CsrfService
+    servicio = CsrfService("clave", max_revocados=2)
+    tokens = [servicio.generar() for _ in range(3)]
+    assert servicio.revocar(tokens[0]) and servicio.revocar(tokens[1])
+    assert servicio.revocar(tokens[2]) is False
+    assert servicio.verificar(tokens[0]) == "CSRF token revocado"
@@ -0,0 +1,86 @@
+"""
+Tests para el estado de runtime compartido entre workers
+"""
+import pytest
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.services.estado_compartido import EstadoCompartido, estado_compartido
+from app.services.roster_cache import roster_cache
+from app.services.zkteco_service import zkteco_service
+from tests.conftest import TestSessionLocal
+
+
+def _worker():
+    """Otra instancia del servicio, como la tendria un segundo worker"""
+    estado = EstadoCompartido()
+    estado.session_factory = TestSessionLocal
+    return estado
+
+
+def test_cambio_visible_en_otro_worker(db):
+    """Lo que guarda un worker lo recibe otro en su refresco, con callback"""
+    worker_a, worker_b = _worker(), _worker()
+    recibidos = []
+    worker_b.al_cambiar("prueba", recibidos.append)
+    worker_b.refrescar()
+
+    worker_a.guardar("prueba", {"x": 1})
+    assert worker_b.obtener("prueba") is None  # todavia no refresco
+    assert worker_b.refrescar() == ["prueba"]
+    assert worker_b.obtener("prueba") == {"x": 1}
+    assert recibidos == [{"x": 1}]
+    # Sin cambios nuevos no se vuelve a leer el valor
+    assert worker_b.refrescar() == []
+
+
+def test_escritura_propia_no_es_cambio_remoto(db):
+    worker = _worker()
+    llamadas = []
+    worker.al_cambiar("prueba", llamadas.append)
+    worker.guardar("prueba", 5)
+    assert worker.refrescar() == []
+    assert llamadas == []
+
+
+def test_configurar_ip_compartido(client, monkeypatch):
+    """La config del dispositivo se guarda en la BD y la aplica otro worker"""
+    ip_original = (zkteco_service.ip, zkteco_service.port, zkteco_service.password)
+    try:
+        resp = client.post("/api/zkteco/configurar-ip", json={"ip": "10.0.0.9", "puerto": 4370, "password": 0})
+        assert resp.status_code == 200
+        otro = _worker()
+        otro.refrescar()
+        assert otro.obtener("zkteco_config")["ip"] == "10.0.0.9"
+
+        # Otro worker la cambia: este proceso la aplica al refrescar
+        otro.guardar("zkteco_config", {"ip": "10.0.0.10", "puerto": 4371, "password": 0})
+        estado_compartido.refrescar()
+        assert (zkteco_service.ip, zkteco_service.port) == ("10.0.0.10", 4371)
+    finally:
+        zkteco_service.ip, zkteco_service.port, zkteco_service.password = ip_original
+
+
+def test_invalidacion_roster_remota(db):
+    """Un alta en otro worker invalida el roster de este proceso"""
+    estado_compartido.refrescar()
+    version = roster_cache.version
+    otro = _worker()
+    otro.tocar("roster")
+    estado_compartido.refrescar()
+    assert roster_cache.version == version  # el otro worker aun no publico
+    otro.refrescar()  # el hilo de refresco publica lo tocado
+    estado_compartido.refrescar()
+    assert roster_cache.version == version + 1
+
+
+def test_guardar_falla_si_el_reintento_tambien_falla(db, monkeypatch):
+    """Si las dos escrituras chocan, guardar lanza excepcion y no cachea una version falsa"""
+    worker = _worker()
+
+    def commit_falla(self):
+        raise IntegrityError("INSERT", {}, Exception("UNIQUE constraint failed"))
+    monkeypatch.setattr(Session, "commit", commit_falla)
+    with pytest.raises(IntegrityError):
+        worker.guardar("prueba", 1)
+    assert worker.obtener("prueba") is None
@@ -0,0 +1,135 @@
+"""
+Tests para los eventos en vivo (SSE) de asistencia
+"""
+import asyncio
+import json
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.asistencia import Asistencia  # noqa: F401 (tabla para create_all)
+from app.services.eventos import BrokerEventos, ClienteEventos, broker_eventos
+from app.services.zkteco_service import zkteco_service
+from tests.conftest import TestSessionLocal
+
+
+def _eventos(cliente: ClienteEventos) -> list[tuple[str, dict]]:
+    """Procesa lo encolado con call_soon_threadsafe y retorna (tipo, datos) de cada evento"""
+    cliente.loop.run_until_complete(asyncio.sleep(0))
+    eventos = []
+    while not cliente.cola.empty():
+        lineas = dict(l.split(": ", 1) for l in cliente.cola.get_nowait().decode().strip().split("\n"))
+        eventos.append((lineas["event"], json.loads(lineas["data"])))
+    return eventos
+
+
+@pytest.fixture
+def oyente():
+    """Cliente registrado en el broker global con un loop propio (sin conexion HTTP)"""
+    loop = asyncio.new_event_loop()
+    cliente = ClienteEventos(loop, 256)
+    broker_eventos._clientes.add(cliente)
+    yield cliente
+    broker_eventos.desuscribir(cliente)
+    loop.close()
+
+
+def test_flujo_sse_heartbeat_y_cola_acotada():
+    async def escenario():
+        broker = BrokerEventos(buffer=2, heartbeat=0.05)
+        flujo = broker.flujo()
+        assert await flujo.__anext__() == b"retry: 5000\n\n"
+        assert broker.clientes == 1
+        assert await flujo.__anext__() == b": ping\n\n"
+
+        # Publicado desde otro hilo (como la ingesta, que corre en el threadpool)
+        hilo = threading.Thread(target=broker.publicar, args=("asistencia", {"registros": [1]}))
+        hilo.start()
+        hilo.join()
+        evento = await flujo.__anext__()
+        assert b"event: asistencia\n" in evento and b'data: {"registros":[1]}' in evento
+
+        for i in range(5):  # cliente lento: la cola de 2 desborda
+            broker.publicar("asistencia", {"registros": [i]})
+        await asyncio.sleep(0)
+        assert b"event: resync\n" in await flujo.__anext__()
+        # Desborda en el 3er evento (queda resync) y otra vez en el 5to
+        assert broker.stats()["desbordes"] == 2
+
+        await flujo.aclose()
+        assert broker.clientes == 0
+        assert broker.publicar("asistencia", {}) == 0
+
+    asyncio.run(escenario())
+
+
+def test_sincronizacion_publica_marcajes_y_resumen(client, personal_data, monkeypatch, oyente):
+    pid = client.post("/api/personal/", json=personal_data).json()["id"]
+    ayer = datetime.now().replace(second=0, microsecond=0) - timedelta(days=1)
+    marcajes = [
+        {"user_id": str(pid), "timestamp": ayer.replace(hour=8), "status": 0, "punch": 0},
+        {"user_id": str(pid), "timestamp": ayer.replace(hour=17), "status": 0, "punch": 0},
+    ]
+    monkeypatch.setattr(zkteco_service, "obtener_registros_asistencia", lambda: marcajes)
+    assert client.post("/api/zkteco/sincronizar-registros").json()["total_sincronizados"] == 2
+
+    eventos = _eventos(oyente)
+    assert [tipo for tipo, _ in eventos] == ["asistencia", "resumen_dia"]
+    registros = eventos[0][1]["registros"]
+    assert [(r["personal_id"], r["tipo"]) for r in registros] == [(pid, "entrada"), (pid, "salida")]
+    assert eventos[1][1] == {"fecha": ayer.date().isoformat(), "marcajes": 2, "presentes": 1}
+
+    # Otro worker recibe el aviso por el estado compartido y difunde las mismas filas,
+    # aunque este worker ya haya difundido ids mayores de su propia ingesta
+    monkeypatch.setattr(broker_eventos, "session_factory", TestSessionLocal)
+    db = TestSessionLocal()
+    broker_eventos.nuevos_marcajes(db, [{**registros[-1], "id": max(r["id"] for r in registros) + 10}])
+    db.close()
+    _eventos(oyente)
+    ids = [r["id"] for r in registros]
+    broker_eventos.cambio_remoto({"desde": min(ids), "hasta": max(ids)})
+    assert [r["id"] for r in _eventos(oyente)[0][1]["registros"]] == ids
+
+
+def test_avisos_sobreescritos_entre_refrescos_envian_resync(client, oyente):
+    """La clave guarda solo el ultimo aviso: si se saltaron versiones, resync"""
+    from app.services.estado_compartido import EstadoCompartido, estado_compartido
+
+    otro_worker = EstadoCompartido()
+    otro_worker.session_factory = TestSessionLocal
+    estado_compartido.refrescar()
+    otro_worker.guardar("asistencia", {"desde": 1, "hasta": 2})
+    estado_compartido.refrescar()  # un aviso: se difunde normalmente (sin filas)
+    assert _eventos(oyente) == []
+
+    otro_worker.guardar("asistencia", {"desde": 3, "hasta": 4})
+    otro_worker.guardar("asistencia", {"editados": [[1, "2026-03-02"]]})
+    estado_compartido.refrescar()
+    assert [tipo for tipo, _ in _eventos(oyente)] == ["resync"]
+
+    # Un aviso propio que tapa uno remoto todavia no leido tambien
+    otro_worker.guardar("asistencia", {"desde": 5, "hasta": 6})
+    estado_compartido.guardar("asistencia", {"desde": 7, "hasta": 8})
+    assert [tipo for tipo, _ in _eventos(oyente)] == ["resync"]
+
+
+def test_asistencia_manual_publica_dias_editados(client, personal_data, oyente):
+    pid = client.post("/api/personal/", json=personal_data).json()["id"]
+    client.post("/api/personal/asistencia-manual/lote", json={"registros": [
+        {"personal_id": pid, "fecha": "2026-03-02", "hora_ingreso": "08:00"},
+        {"personal_id": pid, "fecha": "2026-03-03"},
+    ]})
+    eventos = _eventos(oyente)
+    assert eventos[0] == ("asistencia_editada", {"dias": [
+        {"personal_id": pid, "fecha": "2026-03-02"}, {"personal_id": pid, "fecha": "2026-03-03"},
+    ]})
+    assert eventos[1:] == [
+        ("resumen_dia", {"fecha": "2026-03-02", "marcajes": 1, "presentes": 1}),
+        ("resumen_dia", {"fecha": "2026-03-03", "marcajes": 0, "presentes": 0}),
+    ]
+
+
+def test_eventos_rechaza_si_hay_demasiados_clientes(client, monkeypatch):
+    monkeypatch.setattr(broker_eventos, "max_clientes", 0)
+    assert client.get("/api/eventos/asistencia").status_code == 503
@@ -0,0 +1,83 @@
+"""
+Tests para la importacion masiva de personal (CSV/XLSX)
+"""
+import io
+
+from openpyxl import Workbook
+
+from app.routes import personal as rutas_personal
+from app.services.zkteco_service import zkteco_service
+
+
+def _csv(*lineas: str) -> tuple:
+    return ("personal.csv", "\n".join(lineas).encode("utf-8"), "text/csv")
+
+
+def test_importar_csv_reporta_errores_por_fila(client, personal_data, presupuesto_consultas):
+    client.post("/api/personal/", json=personal_data)  # documento 12345678 ya registrado
+    archivo = _csv(
+        "nombre,apellido,documento,puesto,turno,fecha_inicio",
+        "Ana,Lopez,1001,Cajero,Manana,2026-01-05",
+        "Luis,Rojas,1002,astronauta,tarde,",
+        "Eva,Mamani,1001,mesero,tarde,",
+        "Juan,Perez,12345678,cajero,tarde,",
+        ",,,,,",
+        "Rosa,Quispe,1003,,,",
+    )
+    # duplicados + un INSERT multi-fila + user_id (la invalidacion del roster no consulta la BD)
+    with presupuesto_consultas(3):
+        resp = client.post("/api/personal/importar", files={"archivo": archivo})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert (data["total_filas"], data["creados"], data["omitidos"]) == (5, 2, 3)
+    assert data["dispositivo"] is None
+    errores = {e["fila"]: e for e in data["errores"]}
+    assert set(errores) == {3, 4, 5}
+    assert errores[3]["errores"][0].startswith("puesto:")
+    assert errores[4]["errores"] == ["Documento repetido en el archivo"]
+    assert errores[5]["errores"] == ["El documento ya existe"]
+
+    ana = client.get(f"/api/personal/{data['ids'][0]}").json()
+    assert ana["user_id"] == ana["id"]
+    assert (ana["puesto"], ana["turno"], ana["fecha_fin"]) == ("cajero", "mañana", "2026-03-31")
+    rosa = client.get("/api/personal/documento/1003").json()
+    assert (rosa["turno"], rosa["hora_entrada"], rosa["activo"]) == ("mañana", "08:00", True)
+
+
+def test_importar_xlsx_con_encabezados_de_exportacion(client, monkeypatch):
+    monkeypatch.setattr(rutas_personal, "LOTE_IMPORTACION", 2)
+    libro = Workbook()
+    hoja = libro.active
+    hoja.append(["Nombre", "Apellido", "Documento", "Puesto", "Hora Entrada", "Dia Libre"])
+    for i in range(5):
+        hoja.append([f"Nombre{i}", f"Apellido{i}", 7000 + i, "Mesero", "07:30", "Sábado"])
+    salida = io.BytesIO()
+    libro.save(salida)
+
+    resp = client.post("/api/personal/importar", files={
+        "archivo": ("personal.xlsx", salida.getvalue(),
+                    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    })
+    assert resp.status_code == 200
+    assert resp.json()["creados"] == 5
+    p = client.get("/api/personal/documento/7004").json()
+    assert (p["puesto"], p["hora_entrada"], p["dia_libre"]) == ("mesero", "07:30", "sabado")
+
+
+def test_importar_exporta_al_dispositivo_con_una_conexion(client, monkeypatch):
+    llamadas = []
+    monkeypatch.setattr(zkteco_service, "registrar_usuarios",
+                        lambda usuarios: llamadas.append(usuarios) or [])
+    archivo = _csv("nombre;apellido;documento", "Ana;Lopez;2001", "Luis;Rojas;2002")
+    resp = client.post("/api/personal/importar?exportar_dispositivo=true", files={"archivo": archivo})
+    assert resp.json()["dispositivo"] == {"exportados": 2, "errores": []}
+    ids = resp.json()["ids"]
+    assert llamadas == [[(ids[0], "Ana Lopez"), (ids[1], "Luis Rojas")]]
+
+
+def test_importar_archivo_invalido(client):
+    resp = client.post("/api/personal/importar", files={"archivo": _csv("nombre,documento", "Ana,1")})
+    assert resp.status_code == 400
+    assert "apellido" in resp.json()["detail"]
+    resp = client.post("/api/personal/importar", files={"archivo": ("x.txt", b"a", "text/plain")})
+    assert resp.status_code == 400
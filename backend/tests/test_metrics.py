@@ -0,0 +1,87 @@
+"""
+Tests para el endpoint /metrics (formato de texto de Prometheus)
+"""
+from app.services.metrics import RegistroMetricas, zkteco_duracion
+from app.services.zkteco_service import zkteco_service
+
+
+def test_metrics_formato_y_rutas(client, personal_data):
+    """Latencias por plantilla de ruta, pool de BD y caches en formato de texto"""
+    from app.database.db import get_engine
+    get_engine()  # el engine de la app es lazy; el gauge del pool aparece una vez creado
+    resp = client.post("/api/personal/", json=personal_data)
+    personal_id = resp.json()["id"]
+    client.get(f"/api/personal/{personal_id}")
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    texto = resp.text
+    # Plantilla, no el id concreto
+    assert 'route="/api/personal/{personal_id}"' in texto
+    assert f"/api/personal/{personal_id}\"" not in texto
+    assert 'http_requests_total{method="POST",route="/api/personal/",status="200"}' in texto
+    assert "db_pool_checked_out" in texto
+    assert 'cache_hits_total{cache="roster"}' in texto
+    # Cada familia declara HELP/TYPE una sola vez
+    tipos = [l.split()[2] for l in texto.splitlines() if l.startswith("# TYPE")]
+    assert len(tipos) == len(set(tipos))
+
+
+def test_metrics_token(client, monkeypatch):
+    """Con metrics_token configurado el scrape exige Bearer"""
+    from app.config import settings
+    monkeypatch.setattr(settings, "metrics_token", "scrape")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer scrape"}).status_code == 200
+
+
+def test_histograma_buckets_acumulativos():
+    registro = RegistroMetricas()
+    h = registro.histograma("prueba_seconds", "Prueba", ("op",), buckets=(0.1, 1.0))
+    h.observar(0.05, op="a")
+    h.observar(0.5, op="a")
+    h.observar(5, op="a")
+    texto = registro.exponer()
+    assert 'prueba_seconds_bucket{op="a",le="0.1"} 1' in texto
+    assert 'prueba_seconds_bucket{op="a",le="1"} 2' in texto
+    assert 'prueba_seconds_bucket{op="a",le="+Inf"} 3' in texto
+    assert 'prueba_seconds_count{op="a"} 3' in texto
+
+
+def test_fases_dispositivo(monkeypatch):
+    """Las operaciones con el dispositivo registran conexion, lectura y desconexion"""
+    class ConexionFalsa:
+        def disable_device(self): pass
+        def enable_device(self): pass
+        def get_users(self): return []
+
+    monkeypatch.setattr(zkteco_service, "conectar", lambda: ConexionFalsa())
+    antes = zkteco_duracion.conteo(operacion="usuarios", fase="lectura")
+    assert zkteco_service.obtener_usuarios() == []
+    assert zkteco_duracion.conteo(operacion="usuarios", fase="lectura") == antes + 1
+    assert zkteco_duracion.conteo(operacion="usuarios", fase="conexion") >= 1
+
+
+def test_checkout_lento_registra_ruta(monkeypatch, caplog):
+    """Los eventos del pool miden cuanto se retiene la conexion y logean la ruta si es lento"""
+    from sqlalchemy import create_engine, text
+    from app.config import settings
+    from app.database.db import PoolInstrumentado, _observar_checkouts
+    from app.services import sql_profiler
+    from app.services.metrics import db_pool_retencion
+
+    engine = create_engine("sqlite://", poolclass=PoolInstrumentado)
+    _observar_checkouts(engine, "prueba")
+    monkeypatch.setattr(settings, "db_checkout_lento_ms", 0)
+    perfil, token = sql_profiler.iniciar("/api/personal/stats/dashboard")
+    try:
+        with caplog.at_level("WARNING", logger="app.database.db"):
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+    finally:
+        sql_profiler.terminar(perfil, token)
+        engine.dispose()
+
+    assert db_pool_retencion.conteo(engine="prueba") == 1
+    assert "/api/personal/stats/dashboard" in caplog.text
@@ -0,0 +1,41 @@
+"""
+Tests para el middleware ASGI unico
+"""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.config import settings
+from app.middleware import MiddlewareApi
+
+
+def _app_de_prueba():
+    app = FastAPI()
+    app.add_middleware(MiddlewareApi)
+
+    @app.get("/api/falla")
+    def falla():
+        raise RuntimeError("boom")
+
+    @app.get("/api/ok")
+    def ok():
+        return {"ok": True}
+
+    return app
+
+
+def test_error_no_manejado_responde_500(caplog):
+    """Las excepciones de las rutas se traducen a 500 JSON y se registran"""
+    client = TestClient(_app_de_prueba())
+    with caplog.at_level("INFO", logger="app.middleware"):
+        resp = client.get("/api/falla")
+    assert resp.status_code == 500
+    assert resp.json() == {"detail": "Error interno del servidor"}
+    assert any("GET /api/falla -> 500" in r.getMessage() for r in caplog.records)
+
+
+def test_api_key_requerida_en_rutas_privadas(monkeypatch):
+    """Con API key configurada las rutas privadas la exigen y las publicas no"""
+    monkeypatch.setattr(settings, "api_key", "clave-test")
+    client = TestClient(_app_de_prueba())
+    assert client.get("/api/ok").status_code == 401
+    assert client.get("/api/ok", headers={"X-API-Key": "clave-test"}).status_code == 200
+    assert client.get("/openapi.json").status_code == 200
@@ -1,6 +1,7 @@
 """
 Tests para endpoints CRUD de personal
 """
+from datetime import date
 
 
 def test_crear_personal(client, personal_data):
@@ -125,3 +126,146 @@ def test_dashboard(client, personal_data):
     assert "por_puesto" in data
     assert "top_retrasos" in data
     assert "top_faltas" in data
+
+
+def _crear_varios(client, personal_data, n):
+    for i in range(n):
+        client.post("/api/personal/", json={**personal_data, "documento": f"DOC{i}", "nombre": f"Nombre{i}"})
+
+
+def test_listar_personal_cursor(client, personal_data):
+    """Paginacion por cursor recorre todo el roster sin repetir"""
+    _crear_varios(client, personal_data, 5)
+    ids = []
+    cursor = None
+    while True:
+        url = "/api/personal/?limit=2" + (f"&cursor={cursor}" if cursor else "")
+        resp = client.get(url)
+        ids += [p["id"] for p in resp.json()]
+        cursor = resp.headers.get("X-Siguiente-Cursor")
+        if not cursor:
+            break
+    assert ids == sorted(ids)
+    assert len(ids) == 5
+
+
+def test_listar_personal_fields(client, personal_data):
+    """Proyeccion de campos: solo devuelve lo pedido"""
+    _crear_varios(client, personal_data, 2)
+    resp = client.get("/api/personal/?fields=nombre,apellido")
+    assert resp.status_code == 200
+    assert resp.json()[0] == {"nombre": "Nombre0", "apellido": "Perez"}
+
+    resp = client.get("/api/personal/?fields=nombre,password_hash")
+    assert resp.status_code == 400
+
+
+def test_listar_personal_etag(client, personal_data):
+    """Roster sin cambios responde 304; tras una edicion cambia el ETag"""
+    create_resp = client.post("/api/personal/", json=personal_data)
+    resp = client.get("/api/personal/")
+    etag = resp.headers["ETag"]
+
+    resp = client.get("/api/personal/", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.content == b""
+
+    client.put(f"/api/personal/{create_resp.json()['id']}", json={"nombre": "Carlos"})
+    resp = client.get("/api/personal/", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+
+
+def test_buscar_personal(client, personal_data):
+    """Busqueda por prefijo de nombre, apellido y documento con ranking"""
+    client.post("/api/personal/", json=personal_data)
+    client.post("/api/personal/", json={**personal_data, "nombre": "Maria", "apellido": "Juarez", "documento": "99123"})
+    client.post("/api/personal/", json={**personal_data, "nombre": "Pedro", "apellido": "Lopez", "documento": "55555"})
+
+    data = client.get("/api/personal/buscar?q=ju").json()
+    nombres = [r["nombre"] for r in data["resultados"]]
+    assert sorted(nombres) == ["Juan", "Maria"]  # prefijo de nombre y de apellido
+
+    data = client.get("/api/personal/buscar?q=12345678").json()
+    assert data["resultados"][0]["documento"] == "12345678"
+    assert data["resultados"][0]["puntaje"] >= 3
+
+    data = client.get("/api/personal/buscar?q=%25").json()
+    assert data["resultados"] == []  # comodines escapados
+
+
+def test_buscar_personal_vacio(client):
+    resp = client.get("/api/personal/buscar?q=%20")
+    assert resp.status_code == 400
+
+
+def test_dashboard_y_reporte_etag_por_version_de_datos(client, personal_data, presupuesto_consultas):
+    """Mismos datos -> 304 sin recalcular; una asistencia manual cambia la version"""
+    pid = client.post("/api/personal/", json=personal_data).json()["id"]
+    hoy = date.today()
+    for url in ("/api/personal/stats/dashboard", f"/api/personal/{pid}/reporte-mensual"):
+        resp = client.get(url)
+        assert resp.status_code == 200
+        etag = resp.headers["etag"]
+        assert not etag.startswith("W/")
+
+        with presupuesto_consultas(2):  # solo las consultas de version
+            assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+        client.post("/api/personal/asistencia-manual", json={
+            "personal_id": pid, "fecha": hoy.isoformat(), "hora_ingreso": "08:05",
+        })
+        resp = client.get(url, headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert resp.headers["etag"] != etag
+
+
+def test_respuestas_api_grandes_se_comprimen(client, personal_data, monkeypatch):
+    from app.config import settings
+    pid = client.post("/api/personal/", json=personal_data).json()["id"]
+    url = f"/api/personal/{pid}/reporte-mensual"
+
+    resp = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip"
+    assert resp.headers["etag"].endswith('-gzip"')
+    assert resp.json()["personal_id"] == pid
+    # La variante gzip del ETag tambien valida
+    assert client.get(url, headers={"If-None-Match": resp.headers["etag"]}).status_code == 304
+
+    monkeypatch.setattr(settings, "gzip_minimo_bytes", 10 ** 6)
+    assert "content-encoding" not in client.get(url, headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get(url, headers={"Accept-Encoding": "identity"}).headers
+
+
+def test_asistencia_manual_por_lote(client, personal_data, presupuesto_consultas):
+    """Un lote reemplaza los dias indicados en una transaccion con consultas constantes"""
+    pid = client.post("/api/personal/", json=personal_data).json()["id"]
+    client.post("/api/personal/asistencia-manual", json={
+        "personal_id": pid, "fecha": "2026-03-02", "hora_ingreso": "09:00", "hora_salida": "18:00",
+    })
+    registros = [
+        {"personal_id": pid, "fecha": f"2026-03-{d:02d}", "hora_ingreso": "08:00", "hora_salida": "17:00"}
+        for d in range(2, 28)
+    ]
+    registros[0]["hora_salida"] = None
+    # roster (cache) + DELETE + INSERT multi-fila, y 2 del aviso a otros workers (eventos en vivo)
+    with presupuesto_consultas(5):
+        resp = client.post("/api/personal/asistencia-manual/lote", json={"registros": registros})
+    assert resp.status_code == 200
+    assert resp.json()["dias_actualizados"] == 26
+    assert resp.json()["registros_creados"] == 51
+
+    dias = {d["fecha"]: d for d in client.get(f"/api/personal/{pid}/reporte-mensual?mes=3&anio=2026").json()["dias"]}
+    assert (dias["2026-03-02"]["hora_ingreso"], dias["2026-03-02"]["hora_salida"]) == ("08:00", None)
+    assert dias["2026-03-27"]["hora_salida"] == "17:00"
+
+    # Un empleado inexistente rechaza el lote entero
+    resp = client.post("/api/personal/asistencia-manual/lote", json={"registros": [
+        {"personal_id": pid, "fecha": "2026-03-02"}, {"personal_id": 99999, "fecha": "2026-03-02"},
+    ]})
+    assert resp.status_code == 404
+    dias = {d["fecha"]: d for d in client.get(f"/api/personal/{pid}/reporte-mensual?mes=3&anio=2026").json()["dias"]}
+    assert dias["2026-03-02"]["hora_ingreso"] == "08:00"
+
+    resp = client.post("/api/personal/asistencia-manual/lote", json={"registros": registros[:1] * 2})
+    assert resp.status_code == 422
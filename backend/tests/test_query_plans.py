@@ -0,0 +1,115 @@
+"""
+Tests de regresion de planes de consulta: las consultas calientes sobre
+asistencia (personal_id + rango de fecha_hora) deben usar el indice compuesto.
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.models.asistencia import Asistencia
+from app.models.personal import Personal
+from tests.conftest import engine, async_engine
+
+INDICE = "ix_asistencia_personal_fecha"
+
+
+@pytest.fixture
+def dataset(db):
+    """Siembra 30 empleados con ~2 marcajes diarios durante 60 dias"""
+    inicio = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=59)
+    personal = []
+    for i in range(1, 31):
+        p = Personal(id=i, user_id=i, nombre=f"Nombre{i}", apellido=f"Apellido{i}",
+                     documento=f"DOC{i:04d}", puesto="cajero")
+        personal.append(p)
+    db.add_all(personal)
+    registros = []
+    for p in personal:
+        for d in range(60):
+            dia = inicio + timedelta(days=d)
+            registros.append(Asistencia(personal_id=p.id, user_id=p.user_id, tipo="entrada",
+                                        fecha_hora=dia.replace(hour=8, minute=p.id % 20)))
+            registros.append(Asistencia(personal_id=p.id, user_id=p.user_id, tipo="salida",
+                                        fecha_hora=dia.replace(hour=17, minute=p.id % 20)))
+    db.add_all(registros)
+    db.commit()
+    return personal
+
+
+@contextmanager
+def capturar_sql():
+    """Captura las sentencias SELECT (y sus parametros) que filtran asistencia"""
+    capturadas = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("SELECT") and "FROM asistencia" in statement and "WHERE" in statement:
+            capturadas.append((statement, parameters))
+
+    # Las rutas async consultan por el engine async (mismo archivo de BD)
+    engines = (engine, async_engine.sync_engine)
+    for eng in engines:
+        event.listen(eng, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield capturadas
+    finally:
+        for eng in engines:
+            event.remove(eng, "before_cursor_execute", before_cursor_execute)
+
+
+def _planes(capturadas):
+    planes = []
+    with engine.connect() as conn:
+        for statement, parameters in capturadas:
+            filas = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+            planes.append(" | ".join(f[-1] for f in filas))
+    return planes
+
+
+def _assert_usa_indice(capturadas):
+    assert capturadas, "No se capturo ninguna consulta sobre asistencia"
+    for (statement, _), plan in zip(capturadas, _planes(capturadas)):
+        if "fecha_hora" in statement.split("WHERE", 1)[1]:
+            assert INDICE in plan, f"Plan sin indice compuesto: {plan}"
+        assert "INDEX" in plan, f"Plan sin indice: {plan}"
+        assert "SCAN asistencia" not in plan, f"Full scan de asistencia: {plan}"
+        assert "TEMP B-TREE" not in plan, f"Ordenamiento sin indice: {plan}"
+
+
+def test_reporte_mensual_usa_indice(client, dataset):
+    ahora = datetime.now()
+    with capturar_sql() as capturadas:
+        resp = client.get(f"/api/personal/5/reporte-mensual?mes={ahora.month}&anio={ahora.year}")
+    assert resp.status_code == 200
+    _assert_usa_indice(capturadas)
+
+
+def test_dashboard_usa_indice(client, dataset):
+    ahora = datetime.now()
+    with capturar_sql() as capturadas:
+        resp = client.get(f"/api/personal/stats/dashboard?mes={ahora.month}&anio={ahora.year}")
+    assert resp.status_code == 200
+    _assert_usa_indice(capturadas)
+
+
+def test_asistencia_personal_usa_indice(client, dataset):
+    with capturar_sql() as capturadas:
+        resp = client.get("/api/personal/5/asistencia?limit=500")
+    assert resp.status_code == 200
+    _assert_usa_indice(capturadas)
+
+
+def test_sync_check_existencia_usa_indice(client, dataset, monkeypatch):
+    from app.services.zkteco_service import zkteco_service
+    ayer = datetime.now().replace(second=0, microsecond=0) - timedelta(days=1)
+    marcajes = [
+        {"user_id": str(uid), "timestamp": ayer.replace(hour=9, minute=uid), "status": 0, "punch": 0}
+        for uid in (1, 2, 3)
+    ]
+    monkeypatch.setattr(zkteco_service, "obtener_registros_asistencia", lambda: marcajes)
+
+    with capturar_sql() as capturadas:
+        resp = client.post("/api/zkteco/sincronizar-registros")
+    assert resp.status_code == 200
+    _assert_usa_indice(capturadas)
@@ -0,0 +1,79 @@
+"""
+Tests para el ruteo de lecturas a la replica (con fallback a la primaria)
+"""
+import asyncio
+import time
+
+import pytest
+from starlette.requests import Request
+
+from app.config import settings
+from app.database import db as bd
+from tests.conftest import TEST_DATABASE_URL
+
+
+def _request(cookie: str = "", **headers) -> Request:
+    lista = [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()]
+    if cookie:
+        lista.append((b"cookie", cookie.encode()))
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": lista})
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    """Configura una URL de replica y descarta sus engines al terminar"""
+    def _configurar(url: str):
+        monkeypatch.setattr(settings, "database_replica_url", url)
+    monkeypatch.setattr(bd, "_replica_caida_hasta", 0.0)
+    yield _configurar
+    if bd._replica is not None:
+        bd._replica.dispose()
+    if bd._async_replica is not None:
+        asyncio.run(bd._async_replica.dispose())
+    bd._replica = None
+    bd._async_replica = None
+
+
+def _sesion(request: Request):
+    dependencia = bd.get_db_lectura(request)
+    sesion = next(dependencia)
+    dependencia.close()
+    return sesion
+
+
+def test_lectura_va_a_la_replica(replica):
+    replica(TEST_DATABASE_URL)
+    antes = bd.db_lecturas.valor(destino="replica", motivo="")
+    assert _sesion(_request()).info.get("replica") is True
+    assert bd.db_lecturas.valor(destino="replica", motivo="") == antes + 1
+
+
+def test_escritura_reciente_lee_de_la_primaria(replica):
+    replica(TEST_DATABASE_URL)
+    assert "replica" not in _sesion(_request(cookie=f"{bd.COOKIE_ESCRITURA}=1")).info
+    assert "replica" not in _sesion(_request(x_consistencia="primaria")).info
+
+
+def test_replica_caida_usa_la_primaria_y_espera_para_reintentar(replica):
+    replica("sqlite:////directorio/inexistente/replica.db")
+    assert "replica" not in _sesion(_request()).info
+    assert bd._replica_caida_hasta > time.monotonic()
+    # Mientras dura la espera no se vuelve a intentar la replica
+    assert bd._motivo_primaria(_request()) == "replica_caida"
+
+    async def leer():
+        dependencia = bd.get_async_db_lectura(_request())
+        sesion = await dependencia.__anext__()
+        await dependencia.aclose()
+        return sesion
+    assert "replica" not in asyncio.run(leer()).info
+
+
+def test_mutacion_marca_lectura_propia(client, personal_data, monkeypatch):
+    """Con replica configurada, las escrituras exitosas dejan la cookie de lectura propia"""
+    monkeypatch.setattr(settings, "database_replica_url", TEST_DATABASE_URL)
+    resp = client.post("/api/personal/", json=personal_data)
+    assert resp.status_code == 200
+    assert bd.COOKIE_ESCRITURA in resp.cookies
+    assert "max-age=10" in resp.headers["set-cookie"].lower()
+    assert "set-cookie" not in client.get("/api/personal/stats/total").headers
@@ -0,0 +1,63 @@
+"""
+Tests para el cache de roster (user_id -> id, id -> horario)
+"""
+from datetime import datetime
+
+from sqlalchemy import event
+
+from app.models.asistencia import Asistencia
+from app.services.roster_cache import RosterCache, roster_cache
+from tests.conftest import engine
+
+
+def test_sync_resuelve_user_id_desde_cache(client, db, personal_data, monkeypatch):
+    """Sincronizar N marcajes no consulta personal por cada marcaje"""
+    from app.services.zkteco_service import zkteco_service
+    pid = client.post("/api/personal/", json=personal_data).json()["id"]
+    marcajes = [
+        {"user_id": str(pid), "timestamp": datetime(2026, 3, d, 8, 0), "status": 0, "punch": 0}
+        for d in range(1, 21)
+    ]
+    monkeypatch.setattr(zkteco_service, "obtener_registros_asistencia", lambda: marcajes)
+
+    consultas_personal = []
+
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        if "FROM personal" in statement:
+            consultas_personal.append(statement)
+
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        resp = client.post("/api/zkteco/sincronizar-registros")
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+
+    assert resp.json()["total_sincronizados"] == 20
+    assert len(consultas_personal) <= 1
+    assert db.query(Asistencia).filter(Asistencia.personal_id == pid).count() == 20
+
+
+def test_actualizar_personal_invalida_cache(client, personal_data):
+    """El reporte usa el horario nuevo inmediatamente despues de editar"""
+    pid = client.post("/api/personal/", json=personal_data).json()["id"]
+    assert client.get(f"/api/personal/{pid}/reporte-mensual").json()["hora_entrada"] == "08:00"
+
+    client.put(f"/api/personal/{pid}", json={"hora_entrada": "09:30"})
+    assert client.get(f"/api/personal/{pid}/reporte-mensual").json()["hora_entrada"] == "09:30"
+
+
+def test_estadisticas_cache_roster(client, personal_data):
+    pid = client.post("/api/personal/", json=personal_data).json()["id"]
+    client.get(f"/api/personal/{pid}/reporte-mensual")
+    client.get(f"/api/personal/{pid}/reporte-mensual")
+    data = client.get("/api/personal/stats/cache-roster").json()
+    assert data["hits"] >= 2
+    assert data["empleados"] == 1
+
+
+def test_id_desconocido_no_recarga_en_cada_consulta(db):
+    cache = RosterCache(recarga_minima=60)
+    for _ in range(5):
+        assert cache.id_por_user_id(db, 12345) is None
+    assert cache.stats()["cargas"] == 1
+    assert cache.stats()["misses"] == 5
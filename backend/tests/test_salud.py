@@ -0,0 +1,95 @@
+"""
+Tests para los probes de salud (/health/live sin I/O, /health/ready desde la foto del monitor)
+"""
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
+from app.services.salud import MonitorSalud, monitor_salud
+from tests.conftest import TestSessionLocal, engine
+
+
+@pytest.fixture
+def monitor(monkeypatch):
+    """Monitor global apuntando a la BD de prueba, sin tocar el dispositivo real"""
+    monkeypatch.setattr(monitor_salud, "session_factory", TestSessionLocal)
+    monkeypatch.setattr(monitor_salud, "pools", lambda: [("sync", engine.pool)])
+    monkeypatch.setattr(monitor_salud, "_foto", None)
+    monkeypatch.setattr(MonitorSalud, "_medir_dispositivo",
+                        staticmethod(lambda: {"alcanzable": False, "verificado_en": time.time()}))
+    return monitor_salud
+
+
+def test_live_no_hace_io(client, monitor, presupuesto_consultas):
+    with presupuesto_consultas(0):
+        resp = client.get("/health/live")
+    assert resp.status_code == 200
+    assert resp.json() == {"status": "ok"}
+
+
+def test_ready_responde_desde_la_foto(client, monitor, presupuesto_consultas):
+    resp = client.get("/health/ready")
+    assert resp.status_code == 503
+    assert resp.json()["motivo"] == "iniciando"
+
+    monitor.refrescar()
+    with presupuesto_consultas(0):
+        resp = client.get("/health/ready")
+    assert resp.status_code == 200
+    cuerpo = resp.json()
+    assert cuerpo["bd"]["ok"] is True
+    assert cuerpo["pool"]["sync"]["en_uso"] == 0  # el SELECT 1 de la medicion no cuenta
+    # El dispositivo es informativo: caido no saca la instancia de rotacion
+    assert cuerpo["dispositivo"]["alcanzable"] is False
+    assert client.get("/health").json() == {"status": "ok", "database": "connected"}
+
+
+def test_ready_no_listo_si_bd_cae_o_pool_saturado(client, monitor, monkeypatch):
+    def _falla():
+        raise ConnectionError("sin conexion")
+    monkeypatch.setattr(monitor, "session_factory", _falla)
+    monitor.refrescar()
+    resp = client.get("/health/ready")
+    assert resp.status_code == 503
+    assert resp.json()["motivo"] == "bd_inalcanzable"
+    assert client.get("/health").status_code == 503
+
+    monkeypatch.setattr(monitor, "session_factory", TestSessionLocal)
+    capacidad = engine.pool.size() + max(engine.pool._max_overflow, 0)
+    conexiones = [engine.connect() for _ in range(capacidad)]
+    try:
+        inicio = time.monotonic()
+        monitor.refrescar()  # pool lleno: no espera pool_timeout por una conexion
+        assert time.monotonic() - inicio < 1
+    finally:
+        for conexion in conexiones:
+            conexion.close()
+    resp = client.get("/health/ready")
+    assert resp.status_code == 503
+    assert resp.json()["motivo"] == "pool_saturado"
+    assert resp.json()["bd"] == {"ok": None, "omitido": "pool_saturado"}
+
+
+def test_ready_mide_todos_los_pools(client, monitor, monkeypatch):
+    """Un pool lleno en otro engine (async, replica) tambien saca la instancia de rotacion"""
+    replica = create_engine("sqlite://", poolclass=QueuePool, pool_size=1, max_overflow=0)
+    monkeypatch.setattr(monitor, "pools", lambda: [("sync", engine.pool), ("replica", replica.pool)])
+    conexion = replica.connect()
+    try:
+        foto = monitor.refrescar()
+    finally:
+        conexion.close()
+        replica.dispose()
+    assert foto["bd"]["ok"] is True
+    assert foto["pool"]["replica"] == {"en_uso": 1, "capacidad": 1, "ocupacion": 1.0}
+    assert monitor.listo(foto) == (False, "pool_saturado")
+
+
+def test_foto_vencida_no_esta_lista():
+    monitor = MonitorSalud(intervalo=1.0)
+    foto = {"medido_en": time.time() - 10, "bd": {"ok": True}, "pool": {}}
+    assert monitor.listo(foto) == (False, "foto_vencida")
+    foto["medido_en"] = time.time()
+    assert monitor.listo(foto) == (True, "ok")
@@ -0,0 +1,80 @@
+"""
+Tests para tokens de sesion y cache de principales
+"""
+from app.config import settings
+from app.services.session_service import session_service
+
+
+def _login(client, username, password):
+    resp = client.post("/api/auth/login", json={"username": username, "password": password})
+    assert resp.status_code == 200
+    return resp.json()["token"]
+
+
+def test_login_emite_token(client, usuario_data, monkeypatch):
+    """Con requerir_sesion, un Bearer token valido abre las rutas protegidas"""
+    monkeypatch.setattr(settings, "requerir_sesion", True)
+    client.post("/api/auth/registro", json=usuario_data)
+    token = _login(client, usuario_data["username"], usuario_data["password"])
+
+    assert client.get("/api/auth/usuarios").status_code == 401
+    resp = client.get("/api/auth/usuarios", headers={"Authorization": f"Bearer {token}"})
+    assert resp.status_code == 200
+    resp = client.get("/api/auth/usuarios", headers={"Authorization": f"Bearer {token}x"})
+    assert resp.status_code == 401
+
+
+def test_principal_cacheado_sin_bd(client, usuario_data, monkeypatch):
+    """Un token con principal en cache se valida sin abrir sesion de BD"""
+    client.post("/api/auth/registro", json=usuario_data)
+    token = _login(client, usuario_data["username"], usuario_data["password"])
+
+    def sin_bd():
+        raise AssertionError("no deberia consultar la BD")
+    monkeypatch.setattr(session_service, "session_factory", sin_bd)
+    principal = session_service.autenticar(token)
+    assert principal is not None and principal.username == usuario_data["username"]
+
+
+def test_cambiar_password_invalida_token(client, usuario_data, monkeypatch):
+    """Los tokens emitidos antes del cambio de password se rechazan; el nuevo sirve"""
+    monkeypatch.setattr(settings, "requerir_sesion", True)
+    client.post("/api/auth/registro", json=usuario_data)
+    viejo = _login(client, usuario_data["username"], usuario_data["password"])
+
+    resp = client.put("/api/auth/cambiar-password", headers={"Authorization": f"Bearer {viejo}"}, json={
+        "username": usuario_data["username"],
+        "password_actual": usuario_data["password"],
+        "password_nuevo": "otropassword99",
+    })
+    assert resp.status_code == 200
+    nuevo = resp.json()["token"]
+
+    assert client.get("/api/auth/usuarios", headers={"Authorization": f"Bearer {viejo}"}).status_code == 401
+    assert client.get("/api/auth/usuarios", headers={"Authorization": f"Bearer {nuevo}"}).status_code == 200
+
+
+def test_desactivar_invalida_token_y_requiere_admin(client, usuario_data):
+    """Un operador no puede desactivar usuarios y el usuario desactivado pierde la sesion"""
+    client.post("/api/auth/registro", json=usuario_data)
+    client.post("/api/auth/registro", json={
+        "username": "operador1", "password": "password1234", "nombre": "Op", "rol": "operador",
+    })
+    token_admin = _login(client, usuario_data["username"], usuario_data["password"])
+    token_op = _login(client, "operador1", "password1234")
+    id_op = session_service.autenticar(token_op).id
+
+    resp = client.delete(f"/api/auth/usuarios/{id_op}", headers={"Authorization": f"Bearer {token_op}"})
+    assert resp.status_code == 403
+    # Sin token (solo API key o sin auth) no hay principal: tampoco es admin
+    assert client.delete(f"/api/auth/usuarios/{id_op}").status_code == 403
+
+    resp = client.delete(f"/api/auth/usuarios/{id_op}", headers={"Authorization": f"Bearer {token_admin}"})
+    assert resp.status_code == 200
+    assert session_service.autenticar(token_op) is None
+
+
+def test_token_no_ascii_rechazado(client, monkeypatch):
+    monkeypatch.setattr(settings, "requerir_sesion", True)
+    resp = client.get("/api/personal/", headers={"Authorization": b"Bearer 1.2.3.\xe9"})
+    assert resp.status_code == 401
@@ -0,0 +1,226 @@
+"""
+Tests para el spool local de ingesta (write-ahead log de marcajes)
+"""
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app.models.asistencia import Asistencia
+from app.services import spool as modulo_spool
+from app.services.metrics import metricas
+from app.services.spool import SpoolIngesta, spool_ingesta
+from app.services.zkteco_service import zkteco_service
+from tests.conftest import TestSessionLocal
+
+AYER = datetime.now().replace(second=0, microsecond=0) - timedelta(days=1)
+
+
+def _marcajes(user_id: int, cantidad: int, inicio: datetime = AYER.replace(hour=6)) -> list[dict]:
+    return [
+        {"user_id": user_id, "tipo": "entrada" if i % 2 == 0 else "salida",
+         "fecha_hora": (inicio + timedelta(minutes=i)).isoformat(), "dispositivo_ip": "10.0.0.1"}
+        for i in range(cantidad)
+    ]
+
+
+def _spool(tmp_path, **kwargs) -> SpoolIngesta:
+    spool = SpoolIngesta(tmp_path / "spool", espera_fsync=0, **kwargs)
+    spool.session_factory = TestSessionLocal
+    return spool
+
+
+def test_reproduccion_idempotente_tras_perder_el_checkpoint(client, personal_data, tmp_path):
+    pid = client.post("/api/personal/", json=personal_data).json()["id"]
+    spool = _spool(tmp_path, lote=3)
+    # Escritores concurrentes comparten el fsync; 999 no es empleado
+    hilos = [threading.Thread(target=spool.agregar, args=(_marcajes(pid, 4, AYER.replace(hour=h)),))
+             for h in (6, 9, 12)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    spool.agregar(_marcajes(999, 1))
+    assert spool.stats()["pendientes"] == 13
+
+    assert spool.reproducir() == {"insertados": 12, "existentes": 0, "sin_personal": 1, "descartados": 0, "rechazados": 0}
+    assert spool.stats() == {"pendientes": 0, "backlog_bytes": 0, "lag_segundos": 0.0}
+
+    # Caida entre el commit y el checkpoint: todo se vuelve a leer pero no se duplica nada
+    spool.cerrar()
+    (spool.directorio / "w0" / "checkpoint.json").unlink()
+    assert spool.reproducir() == {"insertados": 0, "existentes": 12, "sin_personal": 1, "descartados": 0, "rechazados": 0}
+    db = TestSessionLocal()
+    assert db.query(Asistencia).filter(Asistencia.personal_id == pid).count() == 12
+    db.close()
+
+
+def test_mismo_marcaje_con_otro_tipo_se_carga_una_vez(client, personal_data, tmp_path):
+    """La clave es (personal_id, fecha_hora): el tipo puede cambiar si cambio la alternancia"""
+    pid = client.post("/api/personal/", json=personal_data).json()["id"]
+    spool = _spool(tmp_path)
+    marcaje = _marcajes(pid, 1)[0]
+    spool.agregar([marcaje, {**marcaje, "tipo": "salida"}])
+    assert spool.reproducir() == {"insertados": 1, "existentes": 1, "sin_personal": 0, "descartados": 0, "rechazados": 0}
+
+
+def test_marcaje_sin_fecha_no_se_repite_al_reintentar(client, personal_data, tmp_path):
+    """Sin timestamp la clave es (personal_id, tipo, encolado_en): el reintento no lo duplica"""
+    pid = client.post("/api/personal/", json=personal_data).json()["id"]
+    spool = _spool(tmp_path)
+    sin_fecha = {"user_id": pid, "tipo": "entrada", "fecha_hora": None, "dispositivo_ip": "10.0.0.1"}
+    spool.agregar([sin_fecha, {**sin_fecha, "tipo": "salida"}])
+    assert spool.reproducir()["insertados"] == 2
+
+    # Caida entre el commit y el checkpoint (o a mitad de la carga uno a uno): se relee el lote
+    spool.cerrar()
+    (spool.directorio / "w0" / "checkpoint.json").unlink()
+    assert spool.reproducir() == {"insertados": 0, "existentes": 2, "sin_personal": 0, "descartados": 0, "rechazados": 0}
+    db = TestSessionLocal()
+    assert db.query(Asistencia).filter(Asistencia.fecha_hora.is_(None)).count() == 2
+    db.close()
+
+
+def test_re_sincronizacion_descarta_lo_encolado_antes(client, personal_data, monkeypatch):
+    """Un marcaje pendiente con el tipo viejo no le gana al re-importado"""
+    pid = client.post("/api/personal/", json=personal_data).json()["id"]
+    marcaje = _marcajes(pid, 1)[0]
+    spool_ingesta.agregar([{**marcaje, "tipo": "salida"}])  # quedo pendiente por una caida de la BD
+    monkeypatch.setattr(zkteco_service, "obtener_registros_asistencia", lambda: [
+        {"user_id": str(pid), "timestamp": datetime.fromisoformat(marcaje["fecha_hora"]), "status": 0, "punch": 0},
+    ])
+
+    resp = client.post("/api/zkteco/re-sincronizar-registros")
+    assert resp.status_code == 200 and resp.json()["total_sincronizados"] == 1
+    assert spool_ingesta.stats()["pendientes"] == 0
+    db = TestSessionLocal()
+    assert [a.tipo for a in db.query(Asistencia).filter(Asistencia.personal_id == pid)] == ["entrada"]
+    db.close()
+    assert 'spool_records_total{resultado="descartado"}' in metricas.exponer()
+
+
+def test_marcaje_invalido_va_a_cuarentena_sin_trabar_el_spool(client, personal_data, tmp_path):
+    pid = client.post("/api/personal/", json=personal_data).json()["id"]
+    spool = _spool(tmp_path)
+    marcajes = _marcajes(pid, 3)
+    marcajes[1]["fecha_hora"] = "no-es-fecha"
+    spool.agregar(marcajes)
+
+    assert spool.reproducir() == {"insertados": 2, "existentes": 0, "sin_personal": 0, "descartados": 0, "rechazados": 1}
+    assert spool.stats()["pendientes"] == 0
+    cuarentena = (spool.directorio / "w0" / "cuarentena.log").read_bytes().splitlines()
+    assert len(cuarentena) == 1 and b"no-es-fecha" in cuarentena[0]
+    assert spool.reproducir()["rechazados"] == 0  # el checkpoint avanzo
+    assert 'spool_records_total{resultado="rechazado"}' in metricas.exponer()
+
+
+def test_adopta_spool_de_worker_que_ya_no_existe(client, personal_data, tmp_path):
+    pid = client.post("/api/personal/", json=personal_data).json()["id"]
+    otro_worker = _spool(tmp_path)
+    otro_worker.agregar(_marcajes(pid, 1, AYER.replace(hour=7)))  # toma w0
+    worker_retirado = _spool(tmp_path)
+    worker_retirado.agregar(_marcajes(pid, 2, AYER.replace(hour=9)))  # w0 ocupado: toma w1
+    assert worker_retirado._dir.name == "w1"
+    worker_retirado.cerrar()
+    otro_worker.cerrar()
+
+    # Reinicio con un solo worker: toma w0 y adopta lo pendiente de w1
+    spool = _spool(tmp_path, intervalo=60)
+    spool.iniciar()
+    try:
+        assert spool.stats()["pendientes"] == 3
+        assert spool.reproducir()["insertados"] == 3
+    finally:
+        spool.detener()
+    assert not list((tmp_path / "spool" / "w1").glob("spool-*.log"))
+
+
+def test_recupera_escritura_incompleta_y_rota_segmentos(client, personal_data, tmp_path):
+    pid = client.post("/api/personal/", json=personal_data).json()["id"]
+    spool = _spool(tmp_path, max_segmento=200)
+    for i in range(3):
+        spool.agregar(_marcajes(pid, 2, AYER.replace(hour=8 + i)))
+    assert len(spool._segmentos()) == 3
+    ultimo = spool._ruta(3)
+    spool.cerrar()
+    with open(ultimo, "ab") as f:  # caida a mitad de una escritura
+        f.write(b"0badc0de {\"user_id\": ")
+
+    recuperado = _spool(tmp_path)
+    assert recuperado.reproducir()["insertados"] == 6
+    assert recuperado._segmentos() == [3]  # los segmentos ya reproducidos se borran
+    assert ultimo.read_bytes().endswith(b"\n")
+
+
+def test_bd_caida_conserva_marcajes_hasta_que_vuelve(client, personal_data, tmp_path):
+    pid = client.post("/api/personal/", json=personal_data).json()["id"]
+
+    def bd_caida():
+        raise OperationalError("SELECT 1", {}, Exception("connection refused"))
+
+    spool = _spool(tmp_path)
+    spool.agregar(_marcajes(pid, 5))
+    spool.session_factory = bd_caida
+    with pytest.raises(OperationalError):
+        spool.reproducir()
+    stats = spool.stats()
+    assert stats["pendientes"] == 5 and stats["backlog_bytes"] > 0 and stats["lag_segundos"] >= 0
+
+    # Reinicio del proceso con la BD de vuelta: el hilo de fondo carga lo pendiente
+    spool.cerrar()
+    spool = _spool(tmp_path, intervalo=0.01)
+    spool.iniciar()
+    try:
+        for _ in range(200):
+            if not spool.stats()["pendientes"]:
+                break
+            threading.Event().wait(0.01)
+    finally:
+        spool.detener()
+    db = TestSessionLocal()
+    assert db.query(Asistencia).filter(Asistencia.personal_id == pid).count() == 5
+    db.close()
+
+
+def test_sincronizacion_responde_202_si_la_bd_falla(client, personal_data, monkeypatch):
+    pid = client.post("/api/personal/", json=personal_data).json()["id"]
+    marcajes = [
+        {"user_id": str(pid), "timestamp": AYER.replace(hour=8), "status": 0, "punch": 0},
+        {"user_id": str(pid), "timestamp": AYER.replace(hour=17), "status": 0, "punch": 0},
+    ]
+    monkeypatch.setattr(zkteco_service, "obtener_registros_asistencia", lambda: marcajes)
+
+    def insert_falla(*args):
+        raise OperationalError("INSERT", {}, Exception("server closed the connection"))
+
+    with monkeypatch.context() as m:
+        m.setattr(spool_ingesta, "_cargar", insert_falla)
+        resp = client.post("/api/zkteco/sincronizar-registros")
+    assert resp.status_code == 202
+    assert (resp.json()["encolados"], resp.json()["pendientes_spool"]) == (2, 2)
+    texto = metricas.exponer()
+    assert "spool_backlog_records 2" in texto and 'spool_records_total{resultado="escrito"}' in texto
+
+    # Siguiente sincronizacion: lo del spool entra una sola vez
+    resp = client.post("/api/zkteco/sincronizar-registros")
+    assert resp.status_code == 200 and resp.json()["total_sincronizados"] == 2
+    assert spool_ingesta.stats()["pendientes"] == 0
+    assert modulo_spool.spool_fsync.conteo() > 0
+
+
+def test_sincronizacion_no_trabada_por_error_de_datos(client, personal_data, monkeypatch):
+    """Un error que no es de conexion no deja el spool pendiente ni responde 202"""
+    pid = client.post("/api/personal/", json=personal_data).json()["id"]
+    marcajes = [{"user_id": str(pid), "timestamp": AYER.replace(hour=8), "status": 0, "punch": 0}]
+    monkeypatch.setattr(zkteco_service, "obtener_registros_asistencia", lambda: marcajes)
+
+    def restriccion(*args):
+        raise IntegrityError("INSERT", {}, Exception("violates check constraint"))
+
+    with monkeypatch.context() as m:
+        m.setattr(spool_ingesta, "_cargar", restriccion)
+        resp = client.post("/api/zkteco/sincronizar-registros")
+    assert resp.status_code == 200
+    assert (resp.json()["total_sincronizados"], resp.json()["rechazados"]) == (0, 1)
+    assert spool_ingesta.stats()["pendientes"] == 0
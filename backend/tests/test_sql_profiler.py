@@ -0,0 +1,74 @@
+"""
+Tests para el perfil SQL por request y el detector de N+1
+"""
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.services import sql_profiler
+from app.services.zkteco_service import zkteco_service
+from tests.conftest import engine
+
+
+def _login_admin(client, usuario_data):
+    client.post("/api/auth/registro", json=usuario_data)
+    resp = client.post("/api/auth/login", json={
+        "username": usuario_data["username"], "password": usuario_data["password"],
+    })
+    return resp.json()["token"]
+
+
+def test_header_perfil_solo_admin(client, usuario_data, personal_data):
+    """X-SQL-Profile es opt-in y solo se responde a sesiones admin"""
+    personal_id = client.post("/api/personal/", json=personal_data).json()["id"]
+    token = _login_admin(client, usuario_data)
+
+    resp = client.get(f"/api/personal/{personal_id}", headers={
+        "Authorization": f"Bearer {token}", "X-SQL-Profile": "1",
+    })
+    assert resp.status_code == 200
+    assert resp.headers["x-sql-profile"].startswith("consultas=")
+
+    assert "x-sql-profile" not in client.get(f"/api/personal/{personal_id}", headers={
+        "Authorization": f"Bearer {token}"}).headers
+    assert "x-sql-profile" not in client.get(f"/api/personal/{personal_id}", headers={
+        "X-SQL-Profile": "1"}).headers
+
+
+def test_presupuesto_consultas(client, personal_data, presupuesto_consultas):
+    """El detalle de un empleado se resuelve en pocas consultas"""
+    personal_id = client.post("/api/personal/", json=personal_data).json()["id"]
+    with presupuesto_consultas(3) as perfiles:
+        client.get(f"/api/personal/{personal_id}")
+    assert len(perfiles) == 1 and perfiles[0].consultas >= 1
+
+
+def test_detecta_n_mas_1(client, monkeypatch, caplog):
+    """Una consulta por usuario en la sincronizacion se reporta como posible N+1"""
+    usuarios = [
+        {"uid": i, "user_id": str(i), "nombre": f"Emp {i}", "privilegio": 0,
+         "password": "", "group_id": "", "card": 0}
+        for i in range(1, 13)
+    ]
+    monkeypatch.setattr(zkteco_service, "obtener_usuarios", lambda: usuarios)
+    with caplog.at_level("WARNING", logger="app.middleware"), sql_profiler.capturar() as perfiles:
+        resp = client.post("/api/zkteco/sincronizar-usuarios")
+    assert resp.status_code == 200
+    assert perfiles[0].max_repeticion() >= 12
+    assert any("posible N+1" in r.getMessage() for r in caplog.records)
+
+
+def test_sentencia_fallida_no_deja_inicio_en_la_conexion():
+    """Sin after_cursor_execute el inicio se descarta con el contexto de la sentencia"""
+    perfil, token = sql_profiler.iniciar("/prueba")
+    try:
+        with engine.connect() as conn:
+            for _ in range(3):
+                with pytest.raises(OperationalError):
+                    conn.execute(text("SELECT * FROM tabla_que_no_existe"))
+                conn.rollback()
+            conn.execute(text("SELECT 1"))
+            assert "perfil_inicio" not in conn.info
+    finally:
+        sql_profiler.terminar(perfil, token)
+    assert perfil.consultas == 1
@@ -12,7 +12,14 @@ async function cargarPartials() {
         { id: 'configuracion',  file: 'configuracion' },
         { id: 'rol-libres',     file: 'rol-libres' },
     ];
+    // Con el bundle de /assets los partials ya vienen incluidos en el JS
+    const empaquetados = window.PARTIALS_EMPAQUETADOS || {};
     await Promise.all(partials.map(async ({ id, file }) => {
+        if (file in empaquetados) {
+            const el = document.getElementById(id);
+            if (el) el.innerHTML = empaquetados[file];
+            return;
+        }
         try {
             const resp = await fetch(`/static/partials/${file}.html`);
             if (!resp.ok) {
@@ -43,6 +50,19 @@ window.addEventListener('load', async () => {
     await verificarAuth();
 });
 
+// Vistas en vivo: dashboard y reporte se actualizan con los eventos de asistencia
+function iniciarVistasEnVivo() {
+    const alCambiar = (cambios) => {
+        dashboardAlCambiarAsistencia(cambios && cambios.map(([, fecha]) => fecha));
+        reporteAlCambiarAsistencia(cambios);
+    };
+    iniciarEventos({
+        asistencia: (d) => alCambiar(d.registros.map(r => [r.personal_id, String(r.fecha_hora).slice(0, 10)])),
+        asistencia_editada: (d) => alCambiar(d.dias.map(x => [x.personal_id, x.fecha])),
+        resync: () => alCambiar(null),
+    });
+}
+
 async function verificarAuth() {
     try {
         const resp = await apiFetch(`${API_URL}/api/auth/check`);
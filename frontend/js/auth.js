@@ -48,6 +48,7 @@ async function loginUsuario() {
 
         if (resp.ok) {
             usuarioActual = data.usuario;
+            guardarSessionToken(data.token);
             statusDiv.className = 'login-status success';
             statusDiv.textContent = `Bienvenido, ${data.usuario.nombre}!`;
             setTimeout(() => {
@@ -121,7 +122,11 @@ function mostrarUsuarioNavbar() {
 }
 
 function cerrarSesion() {
+    // Antes de borrar el token: apiFetch arma las cabeceras de forma sincronica
+    enviarEdiciones(false);
     usuarioActual = null;
+    detenerEventos();
+    guardarSessionToken('');
     document.getElementById('mainApp').classList.remove('visible');
     document.getElementById('loginScreen').style.display = 'none';
     document.getElementById('authScreen').style.display = 'flex';
@@ -157,6 +162,8 @@ async function cambiarPassword() {
         const data = await resp.json();
         if (resp.ok) {
             statusDiv.className = 'connection-status success'; statusDiv.textContent = 'Password cambiado correctamente';
+            // El token anterior queda invalidado: usar el nuevo si el cambio fue del usuario en sesion
+            if (data.token && usuarioActual && usuarioActual.username === username) guardarSessionToken(data.token);
             document.getElementById('cpActual').value = '';
             document.getElementById('cpNuevo').value = '';
         } else {
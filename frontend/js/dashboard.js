@@ -158,6 +158,20 @@ function renderChartFaltas(topFaltas) {
     });
 }
 
+// En vivo: recargar (agrupado) si cambian marcajes del mes que se esta mirando
+let _timerDashboardVivo = null;
+
+function dashboardAlCambiarAsistencia(fechas) {
+    const seccion = document.getElementById('dashboard');
+    const mesEl  = document.getElementById('dashMes');
+    const anioEl = document.getElementById('dashAnio');
+    if (!seccion || !seccion.classList.contains('active') || !mesEl || !anioEl) return;
+    const prefijo = `${anioEl.value}-${String(parseInt(mesEl.value) + 1).padStart(2, '0')}`;
+    if (fechas && !fechas.some(f => f.startsWith(prefijo))) return;
+    clearTimeout(_timerDashboardVivo);
+    _timerDashboardVivo = setTimeout(cargarDashboard, 2000);
+}
+
 // Set dashboard month to current
 (function() {
     const now = new Date();
@@ -70,6 +70,7 @@ function entrarAlSistema() {
     cargarConfigGuardada();
     cargarPersonal();
     cargarEstadisticas();
+    iniciarVistasEnVivo();
     actualizarDevicePill();
     cargarNombreSucursal();
     mostrarUsuarioNavbar();
@@ -84,6 +85,7 @@ function entrarSinDispositivo() {
     cargarConfigGuardada();
     cargarPersonal();
     cargarEstadisticas();
+    iniciarVistasEnVivo();
     cargarNombreSucursal();
     mostrarUsuarioNavbar();
 }
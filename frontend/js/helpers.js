@@ -7,6 +7,7 @@ let infoDispositivo = null;
 let usuarioActual = null;
 let _modoRegistro = false;
 let _csrfToken = '';
+let _sessionToken = sessionStorage.getItem('session_token') || '';
 
 // ============ CONSTANTES ============
 const DURACION_DIAS = { '3_meses': 85, '6_meses': 180, '1_anio': 365 };
@@ -51,6 +52,7 @@ function apiHeaders(extra = {}) {
         'Content-Type': 'application/json',
         'X-API-Key': API_KEY,
         'X-CSRF-Token': _csrfToken,
+        ...(_sessionToken ? { 'Authorization': `Bearer ${_sessionToken}` } : {}),
         ...extra
     };
 }
@@ -58,6 +60,7 @@ function apiHeaders(extra = {}) {
 async function apiFetch(url, options = {}) {
     if (!options.headers) options.headers = {};
     options.headers['X-API-Key'] = API_KEY;
+    if (_sessionToken) options.headers['Authorization'] = `Bearer ${_sessionToken}`;
     if (options.method && ['POST', 'PUT', 'DELETE'].includes(options.method.toUpperCase())) {
         options.headers['X-CSRF-Token'] = _csrfToken;
     }
@@ -70,6 +73,87 @@ async function apiFetch(url, options = {}) {
     return resp;
 }
 
+function guardarSessionToken(token) {
+    _sessionToken = token || '';
+    if (_sessionToken) sessionStorage.setItem('session_token', _sessionToken);
+    else sessionStorage.removeItem('session_token');
+}
+
+// Recorre todas las paginas de /api/personal/ siguiendo X-Siguiente-Cursor.
+// fields limita las columnas (ej: 'id,nombre,apellido') para respuestas livianas.
+async function obtenerTodoPersonal(fields = '') {
+    const todos = [];
+    let cursor = '';
+    do {
+        const params = new URLSearchParams({ activos: 'true', limit: '500' });
+        if (fields) params.set('fields', fields);
+        if (cursor) params.set('cursor', cursor);
+        const resp = await apiFetch(`${API_URL}/api/personal/?${params}`);
+        if (!resp.ok) throw new Error(`HTTP ${resp.status}`);
+        todos.push(...await resp.json());
+        cursor = resp.headers.get('X-Siguiente-Cursor') || '';
+    } while (cursor);
+    return todos;
+}
+
+// ============ EVENTOS EN VIVO (SSE) ============
+// fetch + ReadableStream en vez de EventSource: EventSource no permite enviar los
+// headers de autenticacion (X-API-Key, Authorization).
+let _eventosControl = null;
+
+function iniciarEventos(manejadores) {
+    detenerEventos();
+    const control = new AbortController();
+    _eventosControl = control;
+    (async () => {
+        let espera = 1000;
+        while (!control.signal.aborted) {
+            try {
+                const resp = await apiFetch(`${API_URL}/api/eventos/asistencia`, { signal: control.signal });
+                if (resp.status === 401) return;
+                if (resp.ok && resp.body) {
+                    await leerEventos(resp.body, manejadores, (ms) => { espera = ms; });
+                    // El stream se corto: lo perdido mientras tanto se recupera recargando
+                    if (manejadores.resync) manejadores.resync({});
+                }
+            } catch (e) {
+                if (control.signal.aborted) return;
+            }
+            await new Promise(r => setTimeout(r, espera));
+            espera = Math.min(espera * 2, 30000);
+        }
+    })();
+}
+
+function detenerEventos() {
+    if (_eventosControl) _eventosControl.abort();
+    _eventosControl = null;
+}
+
+async function leerEventos(cuerpo, manejadores, fijarReintento) {
+    const lector = cuerpo.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await lector.read();
+        if (done) return;
+        buffer += value;
+        let fin;
+        while ((fin = buffer.indexOf('\n\n')) >= 0) {
+            const bloque = buffer.slice(0, fin);
+            buffer = buffer.slice(fin + 2);
+            let tipo = 'message', datos = '';
+            for (const linea of bloque.split('\n')) {
+                if (linea.startsWith('event: ')) tipo = linea.slice(7);
+                else if (linea.startsWith('data: ')) datos += linea.slice(6);
+                else if (linea.startsWith('retry: ')) fijarReintento(parseInt(linea.slice(7)));
+            }
+            if (datos && manejadores[tipo]) {
+                try { manejadores[tipo](JSON.parse(datos)); } catch (e) { console.error('[eventos]', tipo, e); }
+            }
+        }
+    }
+}
+
 function mostrarAlerta(mensaje, tipo = 'info') {
     const container = document.getElementById('alerts');
     const alerta = document.createElement('div');
@@ -80,6 +164,7 @@ function mostrarAlerta(mensaje, tipo = 'info') {
 }
 
 function switchSection(sectionId, btn) {
+    enviarEdiciones(false);  // ediciones del reporte aun en espera
     document.querySelectorAll('.section').forEach(el => el.classList.remove('active'));
     document.querySelectorAll('.nav-item').forEach(el => el.classList.remove('active'));
     document.getElementById(sectionId).classList.add('active');
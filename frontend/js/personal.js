@@ -162,14 +162,20 @@ async function cargarPersonal(page) {
     if (page !== undefined) _currentPage = page;
 
     try {
-        const response = await apiFetch(`${API_URL}/api/personal/`);
-        if (!response.ok) throw new Error('Error al cargar personal');
-
-        const personal = await response.json();
+        const filtro = (document.getElementById('filtroNombre').value || '').trim();
+        let personal;
+        if (filtro) {
+            // Busqueda en el servidor (indices trigram) en vez de filtrar la lista completa
+            const resp = await apiFetch(`${API_URL}/api/personal/buscar?q=${encodeURIComponent(filtro)}&limit=100`);
+            if (!resp.ok) throw new Error('Error al buscar personal');
+            personal = (await resp.json()).resultados;
+        } else {
+            personal = await obtenerTodoPersonal();
+        }
         const container = document.getElementById('personnelContainer');
         const pagDiv = document.getElementById('paginationControls');
 
-        if (personal.length === 0) {
+        if (personal.length === 0 && !filtro) {
             container.innerHTML = `
                 <div class="empty-state" style="grid-column:1/-1;">
                     <div class="empty-icon">&#128100;</div>
@@ -180,13 +186,7 @@ async function cargarPersonal(page) {
             return;
         }
 
-        const filtro = (document.getElementById('filtroNombre').value || '').toLowerCase();
-        const filtered = filtro
-            ? personal.filter(p =>
-                `${p.nombre} ${p.apellido}`.toLowerCase().includes(filtro) ||
-                (p.documento || '').toLowerCase().includes(filtro)
-            )
-            : personal;
+        const filtered = personal;
 
         if (filtered.length === 0) {
             container.innerHTML = `
@@ -1,6 +1,10 @@
 // ============ REPORTE ASISTENCIA ============
 let _reporteData = null;
 const DIAS_LABEL_CORTO = {lunes:'Lun',martes:'Mar',miercoles:'Mie',jueves:'Jue',viernes:'Vie',sabado:'Sab',domingo:'Dom'};
+// Celdas editadas por "personal|fecha": se envian juntas a /asistencia-manual/lote
+const _edicionesPendientes = new Map();
+const ESPERA_EDICIONES_MS = 1500;
+let _timerEdiciones = null;
 
 async function cargarReporteInit() {
     const select  = document.getElementById('reportePersonal');
@@ -8,14 +12,11 @@ async function cargarReporteInit() {
     const anioEl  = document.getElementById('reporteAnio');
     if (!select || !mesEl || !anioEl) return;
     try {
-        const resp = await apiFetch(`${API_URL}/api/personal/?activos=true&limit=200`);
-        if (resp.ok) {
-            const personal = await resp.json();
-            select.innerHTML = '<option value="">-- Seleccionar --</option>';
-            personal.forEach(p => {
-                select.innerHTML += `<option value="${escapeHtml(p.id)}">${escapeHtml(p.nombre)} ${escapeHtml(p.apellido)} - ${escapeHtml(p.turno || '')}</option>`;
-            });
-        }
+        const personal = await obtenerTodoPersonal('id,nombre,apellido,turno');
+        select.innerHTML = '<option value="">-- Seleccionar --</option>';
+        personal.forEach(p => {
+            select.innerHTML += `<option value="${escapeHtml(p.id)}">${escapeHtml(p.nombre)} ${escapeHtml(p.apellido)} - ${escapeHtml(p.turno || '')}</option>`;
+        });
     } catch(e) { console.error(e); }
 
     const now = new Date();
@@ -24,6 +25,7 @@ async function cargarReporteInit() {
 }
 
 async function cargarReporte() {
+    if (_edicionesPendientes.size) await enviarEdiciones(false);
     const personalId = document.getElementById('reportePersonal').value;
     if (!personalId) return;
 
@@ -168,28 +170,13 @@ function editarCelda(td, fecha, tipo, valorActual) {
             hora_ingreso = (ingresoText && ingresoText !== '--:--') ? ingresoText : null;
         }
 
-        try {
-            const resp = await apiFetch(`${API_URL}/api/personal/asistencia-manual`, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    personal_id: parseInt(personalId),
-                    fecha: fecha,
-                    hora_ingreso: hora_ingreso,
-                    hora_salida: hora_salida,
-                })
-            });
-            if (resp.ok) {
-                mostrarAlerta('Asistencia actualizada', 'success');
-                cargarReporte();
-            } else {
-                mostrarAlerta('Error al guardar', 'error');
-                td.textContent = valorActual || '--:--';
-            }
-        } catch(e) {
-            mostrarAlerta('Error de conexion', 'error');
-            td.textContent = valorActual || '--:--';
-        }
+        td.textContent = nuevoValor || '--:--';
+        encolarEdicion({
+            personal_id: parseInt(personalId),
+            fecha: fecha,
+            hora_ingreso: hora_ingreso,
+            hora_salida: hora_salida,
+        });
     };
 
     input.addEventListener('blur', guardar);
@@ -201,6 +188,58 @@ function editarCelda(td, fecha, tipo, valorActual) {
     });
 }
 
+// En vivo: recargar si cambian marcajes del empleado y mes del reporte abierto
+let _timerReporteVivo = null;
+
+function reporteAlCambiarAsistencia(cambios) {
+    const seccion = document.getElementById('reporte');
+    const personalId = document.getElementById('reportePersonal')?.value;
+    if (!seccion || !seccion.classList.contains('active') || !personalId || !_reporteData) return;
+    const mes = parseInt(document.getElementById('reporteMes').value) + 1;
+    const prefijo = `${document.getElementById('reporteAnio').value}-${String(mes).padStart(2, '0')}`;
+    if (cambios && !cambios.some(([pid, fecha]) => String(pid) === personalId && fecha.startsWith(prefijo))) return;
+    clearTimeout(_timerReporteVivo);
+    _timerReporteVivo = setTimeout(() => {
+        // No pisar una celda en edicion ni cambios sin enviar (se recarga al enviarlos)
+        if (_edicionesPendientes.size || seccion.querySelector('td input')) return;
+        cargarReporte();
+    }, 1000);
+}
+
+function encolarEdicion(registro) {
+    _edicionesPendientes.set(`${registro.personal_id}|${registro.fecha}`, registro);
+    clearTimeout(_timerEdiciones);
+    _timerEdiciones = setTimeout(enviarEdiciones, ESPERA_EDICIONES_MS);
+}
+
+// keepalive: el envio sobrevive al cierre de la pestana (lotes pequenos, limite de 64 KB)
+async function enviarEdiciones(recargar = true, keepalive = false) {
+    clearTimeout(_timerEdiciones);
+    if (!_edicionesPendientes.size) return;
+    const registros = [..._edicionesPendientes.values()];
+    _edicionesPendientes.clear();
+    try {
+        const resp = await apiFetch(`${API_URL}/api/personal/asistencia-manual/lote`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ registros }),
+            keepalive,
+        });
+        if (resp.ok) {
+            mostrarAlerta(registros.length === 1 ? 'Asistencia actualizada' : `${registros.length} dias actualizados`, 'success');
+        } else {
+            mostrarAlerta('Error al guardar', 'error');
+        }
+    } catch(e) {
+        mostrarAlerta('Error de conexion', 'error');
+    }
+    // Recargar siempre: muestra lo guardado o restaura los valores si fallo
+    if (recargar) cargarReporte();
+}
+
+// Cerrar o recargar la pestana dentro de la espera no debe perder las ediciones
+window.addEventListener('pagehide', () => enviarEdiciones(false, true));
+
 // ============ EXPORTAR REPORTE ============
 async function exportarReporte(formato) {
     const personalId = document.getElementById('reportePersonal').value;
@@ -211,6 +250,7 @@ async function exportarReporte(formato) {
     const mes = parseInt(document.getElementById('reporteMes').value) + 1;
     const anio = parseInt(document.getElementById('reporteAnio').value);
     const url = `${API_URL}/api/personal/${personalId}/exportar-reporte?mes=${mes}&anio=${anio}&formato=${formato}`;
+    await enviarEdiciones(false);
 
     try {
         const resp = await apiFetch(url);
@@ -81,8 +81,7 @@ async function generarRolLibres() {
     const container = document.getElementById('rolCalendarContainer');
 
     try {
-        const resp = await apiFetch(`${API_URL}/api/personal/?activos=true&limit=200`);
-        if (resp.ok) _rolPersonal = await resp.json();
+        _rolPersonal = await obtenerTodoPersonal('id,nombre,apellido,puesto,dia_libre');
     } catch(e) { console.error(e); }
 
     // Pre-cargar asignaciones desde la BD (dia_libre guardado en cada persona)